@@ -0,0 +1,60 @@
+"""Benchmark rendering a program whose classes are frozen with an on-disk build cache (`BuildCache`).
+
+Usage: python -m benchmarks.bench_build_cache [--classes 50] [--methods 20] [--depth 4] [--vars 3] [--lang python]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+from benchmarks.suite import Config, build
+from codegen.models import Program
+from codegen.models.build_cache import BuildCache
+
+
+def render(prog: Program, lang: str, cache: BuildCache | None = None) -> tuple[float, str]:
+    start = time.perf_counter()
+    if lang == "python":
+        code = prog.to_python(cache=cache)
+    else:
+        code = prog.to_typescript(cache=cache)
+    return time.perf_counter() - start, code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=Config.n_classes)
+    parser.add_argument("--methods", type=int, default=Config.n_methods)
+    parser.add_argument("--depth", type=int, default=Config.depth)
+    parser.add_argument("--vars", type=int, default=Config.n_vars)
+    parser.add_argument("--lang", choices=["python", "typescript"], default="python")
+    args = parser.parse_args()
+
+    cfg = Config(args.classes, args.methods, args.depth, args.vars, args.lang)
+    prog, _ = build(cfg)
+    # freezing computes the structural hashes, which are the keys of the cache
+    start = time.perf_counter()
+    for ast in prog.root.children[1:]:
+        ast.freeze()
+    freeze = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        no_cache, expected = render(prog, args.lang)
+        cold, code = render(prog, args.lang, BuildCache(cache_dir))
+        assert code == expected
+
+        # a new build of the same program, as a code generator run again
+        prog, _ = build(cfg)
+        for ast in prog.root.children[1:]:
+            ast.freeze()
+        warm, code = render(prog, args.lang, BuildCache(cache_dir))
+        assert code == expected
+
+    print(f"{'freeze (s)':>12} {'no cache (s)':>14} {'cold (s)':>10} {'warm (s)':>10}")
+    print(f"{freeze:>12.4f} {no_cache:>14.4f} {cold:>10.4f} {warm:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark building large bodies one statement at a time versus with the bulk API (`AST.extend` and
+`AST.assign_many`): enums with many values and functions with many assignments.
+
+Usage: python -m benchmarks.bench_bulk [n_stmts] [n_bodies]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Callable
+
+from codegen.models import DeferredVar, Program
+from codegen.models.expr import ExprConstant
+from codegen.models.statement import DefEnumValueStatement
+
+
+def build_enums(bulk: bool, n_stmts: int, n_bodies: int) -> tuple[float, Program]:
+    """Build enums with many values, return the time of adding the values and the program"""
+    prog = Program()
+    elapsed = 0.0
+    for i in range(n_bodies):
+        enum = prog.root.class_like("enum", f"Enum{i}")
+        stmts = [DefEnumValueStatement(f"V{j}", ExprConstant(j)) for j in range(n_stmts)]
+        start = time.perf_counter()
+        if bulk:
+            enum.extend(stmts)
+        else:
+            for stmt in stmts:
+                enum(stmt)
+        elapsed += time.perf_counter() - start
+    return elapsed, prog
+
+
+def build_assignments(bulk: bool, n_stmts: int, n_bodies: int) -> tuple[float, Program]:
+    """Build functions with many assignments, return the time of adding the assignments and the program"""
+    prog = Program()
+    elapsed = 0.0
+    for i in range(n_bodies):
+        func = prog.root.func(f"table{i}", [])
+        pairs = [
+            (DeferredVar(f"v{j}", (f"v{j}",)), ExprConstant(j)) for j in range(n_stmts)
+        ]
+        start = time.perf_counter()
+        if bulk:
+            func.assign_many(pairs)
+        else:
+            for var, expr in pairs:
+                func.assign(var, expr)
+        elapsed += time.perf_counter() - start
+    return elapsed, prog
+
+
+def best_time(fn: Callable[[], tuple[float, Program]], repeat: int = 5) -> tuple[float, str]:
+    best = float("inf")
+    for _ in range(repeat):
+        elapsed, prog = fn()
+        best = min(best, elapsed)
+    return best, prog.to_typescript()
+
+
+if __name__ == "__main__":
+    n_stmts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_bodies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"n_stmts={n_stmts} n_bodies={n_bodies}")
+    print(f"{'body':>12} {'one by one (s)':>15} {'bulk (s)':>10} {'speedup':>8}")
+    for name, build in (("enum", build_enums), ("assignments", build_assignments)):
+        one, code = best_time(lambda: build(False, n_stmts, n_bodies))
+        bulk, bulk_code = best_time(lambda: build(True, n_stmts, n_bodies))
+        assert code == bulk_code
+        print(f"{name:>12} {one:>15.4f} {bulk:>10.4f} {one / bulk:>8.1f}x")
@@ -0,0 +1,64 @@
+"""Benchmark the memory and attribute access time of the instances of generated python classes with different
+layouts (see `AST.class_`): plain classes, `__slots__`, `@dataclass(slots=True)` and `NamedTuple`.
+
+Usage: python -m benchmarks.bench_class_layout [n_instances] [n_fields]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from typing import get_args
+
+from codegen.models import DeferredVar, Program
+from codegen.models.statement import CLASS_LAYOUT
+
+
+def build(layout: CLASS_LAYOUT, n_fields: int) -> str:
+    """Generate a class `Record` of the layout with n_fields integer fields"""
+    prog = Program(indent="    ")
+    cls = prog.root.class_("Record", layout=layout)
+    names = [f"f{i}" for i in range(n_fields)]
+    for name in names:
+        cls.class_var(name, "int")
+    if layout in ("plain", "slots"):
+        init = cls.func(
+            "__init__",
+            [DeferredVar.simple("self")] + [DeferredVar.simple(name) for name in names],
+        )
+        for name in names:
+            init.python_stmt(f"self.{name} = {name}")
+    return prog.to_python()
+
+
+def run(layout: CLASS_LAYOUT, n_instances: int, n_fields: int) -> tuple[float, float]:
+    """Return the memory (bytes) per instance and the time (ns) per attribute read"""
+    namespace: dict = {}
+    exec(build(layout, n_fields), namespace)
+    cls = namespace["Record"]
+    args = list(range(n_fields))
+
+    tracemalloc.start()
+    instances = [cls(*args) for _ in range(n_instances)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for obj in instances:
+            obj.f0
+            obj.f1
+        best = min(best, time.perf_counter() - start)
+    return size / n_instances, best / (2 * n_instances) * 1e9
+
+
+if __name__ == "__main__":
+    n_instances = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_fields = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"n_instances={n_instances} n_fields={n_fields}")
+    print(f"{'layout':>12} {'memory (B)':>11} {'access (ns)':>12}")
+    for layout in get_args(CLASS_LAYOUT):
+        memory, access = run(layout, n_instances, n_fields)
+        print(f"{layout:>12} {memory:>11.1f} {access:>12.1f}")
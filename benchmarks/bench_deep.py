@@ -0,0 +1,59 @@
+"""Benchmark rendering and freezing deeply nested programs: nested if-statements and blocks, and a long chain of
+`ExprLogicalAnd` built as a nested tree, which are deeper than the recursion limit of Python.
+
+Usage: python -m benchmarks.bench_deep [depth]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from codegen.models import Program
+from codegen.models.expr import Expr, ExprIdent, ExprLogicalAnd
+
+
+def build(depth: int, incremental_render: bool) -> Program:
+    prog = Program(incremental_render=incremental_render)
+    ast = prog.root
+    for i in range(depth):
+        ast = ast.if_(ExprIdent(f"c{i}"))
+        if i % 3 == 0:
+            ast = ast.block()
+
+    expr: Expr = ExprIdent("x")
+    for _ in range(depth):
+        expr = ExprLogicalAnd([expr, ExprIdent("y")])
+    ast.expr(expr)
+    return prog
+
+
+def run(depth: int, incremental_render: bool) -> tuple[float, float, float]:
+    prog = build(depth, incremental_render)
+
+    start = time.perf_counter()
+    code = prog.root.to_python()
+    python = time.perf_counter() - start
+    # the empty import area, a line per if-statement (python blocks have no lines) and the expression
+    assert code.count("\n") == depth + 1
+
+    start = time.perf_counter()
+    prog.root.to_typescript()
+    typescript = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prog.root.freeze()
+    freeze = time.perf_counter() - start
+    assert prog.root.to_python() == code
+    return python, typescript, freeze
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    print(f"depth={depth} recursion limit={sys.getrecursionlimit()}")
+    print(f"{'incremental':>12} {'python (s)':>12} {'typescript (s)':>15} {'freeze (s)':>11}")
+    for incremental_render in (False, True):
+        python, typescript, freeze = run(depth, incremental_render)
+        print(
+            f"{str(incremental_render):>12} {python:>12.4f} {typescript:>15.4f} {freeze:>11.4f}"
+        )
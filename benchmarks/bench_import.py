@@ -0,0 +1,59 @@
+"""Measure the import time of `codegen.models` with `python -X importtime` and check that it does not load
+modules that are only needed by optional features (e.g., multiprocessing for parallel rendering).
+
+Exits with an error if any of those modules is imported, so it can be used as a regression check.
+
+Usage: python -m benchmarks.bench_import [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from typing import Optional
+
+# modules that must not be imported by `import codegen.models`
+LAZY_MODULES = ["multiprocessing", "concurrent", "json", "pickle", "subprocess"]
+
+
+def import_times(module: str, cwd: Optional[str] = None) -> dict[str, int]:
+    """Import the module in a fresh interpreter (in the given working directory), returning the cumulative import
+    time (us) of every loaded module"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=cwd,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [import_times("codegen.models") for _ in range(args.repeat)]
+    best = min(run["codegen.models"] for run in runs)
+    print(f"import codegen.models: {best / 1000:.2f}ms (best of {args.repeat})")
+
+    unexpected = sorted(
+        name
+        for name in runs[0]
+        if any(name == mod or name.startswith(mod + ".") for mod in LAZY_MODULES)
+    )
+    if len(unexpected) > 0:
+        print(f"Unexpected modules imported: {', '.join(unexpected)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
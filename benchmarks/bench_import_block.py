@@ -0,0 +1,44 @@
+"""Benchmark adding many (repeated) imports to a program with `Program.import_` and
+`ImportHelper.python_import_for_hint`, and the size of the rendered import block.
+
+Usage: python -m benchmarks.bench_import_block [n_modules] [n_attrs] [n_repeats]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from codegen.models import ImportHelper, Program
+
+
+def build(n_modules: int, n_attrs: int, n_repeats: int) -> Program:
+    """Import every attribute of every module n_repeats times (e.g., once per generated function that uses it),
+    half of the modules are only imported for type checking"""
+    prog = Program()
+    helper = ImportHelper(prog)
+    for _ in range(n_repeats):
+        for i in range(n_modules):
+            for j in range(n_attrs):
+                if i % 2 == 0:
+                    prog.import_(f"pkg.mod{i}.Attr{j}", True)
+                else:
+                    helper.python_import_for_hint(f"pkg.mod{i}.Attr{j}", True)
+    return prog
+
+
+if __name__ == "__main__":
+    n_modules = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n_attrs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    n_repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        prog = build(n_modules, n_attrs, n_repeats)
+        best = min(best, time.perf_counter() - start)
+    code = prog.to_python()
+
+    print(f"n_modules={n_modules} n_attrs={n_attrs} n_repeats={n_repeats}")
+    print(f"import time (s): {best:.4f}")
+    print(f"rendered import lines: {code.count(chr(10)) + 1}")
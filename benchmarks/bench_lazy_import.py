@@ -0,0 +1,57 @@
+"""Benchmark the import time of a generated module whose functions use heavy modules, when the modules are imported
+at the top of the generated module or lazily in the functions that use them (`Program.import_(..., lazy=True)`).
+
+Usage: python -m benchmarks.bench_lazy_import [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.bench_import import import_times
+from codegen.models import DeferredVar, Program
+from codegen.models.expr import ExprFuncCall, ExprIdent
+
+# standard modules that are slow to import, and an attribute of each of them
+HEAVY_MODULES = [
+    ("asyncio", "run"),
+    ("decimal", "Decimal"),
+    ("email.mime.text", "MIMEText"),
+    ("http.client", "HTTPConnection"),
+    ("json", "dumps"),
+    ("sqlite3", "connect"),
+    ("xml.dom.minidom", "parseString"),
+    ("zipfile", "ZipFile"),
+]
+
+
+def build(lazy: bool) -> Program:
+    """A module with a function per heavy module that calls an attribute of it"""
+    prog = Program(indent="    ")
+    for module, attr in HEAVY_MODULES:
+        func = prog.root.func(f"use_{module.replace('.', '_')}", [DeferredVar.simple("x")])
+        prog.import_(f"{module}.{attr}", True, lazy=lazy, at=func)
+        func.return_(ExprFuncCall(ExprIdent(attr), [ExprIdent("x")]))
+    return prog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'imports':>8} {'import time (ms)':>17}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, lazy in (("eager", False), ("lazy", True)):
+            module = f"generated_{name}"
+            build(lazy).write_to_file(Path(directory) / f"{module}.py")
+            best = min(
+                import_times(module, directory)[module] for _ in range(args.repeat)
+            )
+            print(f"{name:>8} {best / 1000:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark memory usage per node of the (slotted) AST, statement and expression classes.
+
+Each class is compared against a subclass of itself that does not declare `__slots__` and hence
+carries a per-instance `__dict__` like a plain dataclass.
+
+The memory of a deep program is also compared with and without lazy AST ids (`Program(lazy_ids=True)`).
+
+Usage: python -m benchmarks.bench_memory [n_nodes]
+"""
+
+from __future__ import annotations
+
+import sys
+import tracemalloc
+from typing import Any, Callable
+
+from codegen.models import AST, Program
+from codegen.models.expr import ExprConstant, ExprFuncCall, ExprIdent
+from codegen.models.statement import AssignStatement, SingleExprStatement
+from codegen.models.var import Var, VarScope
+
+
+def with_dict(cls: type) -> type:
+    """Create a subclass of cls that has a per-instance __dict__"""
+    return type(cls.__name__ + "WithDict", (cls,), {})
+
+
+def measure(make: Callable[[int], Any], n: int) -> float:
+    """Measure the average number of bytes allocated per object created by make"""
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    objs = [make(i) for i in range(n)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # do not count the list holding the objects
+    return (end - start - sys.getsizeof(objs)) / n
+
+
+def run(n: int):
+    prog = Program()
+    scope = VarScope((), 0)
+    ident = ExprIdent("x")
+    const = ExprConstant(1)
+
+    cases: list[tuple[str, type, Callable[[type, int], Any]]] = [
+        ("ExprIdent", ExprIdent, lambda cls, i: cls("x")),
+        ("ExprFuncCall", ExprFuncCall, lambda cls, i: cls(ident, ())),
+        ("Var", Var, lambda cls, i: cls("x", ("x",), i, scope)),
+        ("AssignStatement", AssignStatement, lambda cls, i: cls(ident, const)),
+        ("SingleExprStatement", SingleExprStatement, lambda cls, i: cls(ident)),
+        ("AST", AST, lambda cls, i: cls((0, i), prog, None)),
+    ]
+
+    print(f"{'class':>20} {'slots (B)':>10} {'dict (B)':>10} {'saving':>8}")
+    for name, cls, make in cases:
+        slotted = measure(lambda i: make(cls, i), n)
+        unslotted = measure(lambda i, dcls=with_dict(cls): make(dcls, i), n)
+        print(
+            f"{name:>20} {slotted:>10.1f} {unslotted:>10.1f} {1 - slotted / unslotted:>8.1%}"
+        )
+
+
+def build_deep(lazy_ids: bool, depth: int, width: int) -> Program:
+    """Build a program of nested if-statements with `width` statements at each level"""
+    prog = Program(lazy_ids=lazy_ids)
+    ast = prog.root
+    ident = ExprIdent("x")
+    for _ in range(depth):
+        for _ in range(width):
+            ast.expr(ident)
+        ast = ast.if_(ident)
+    return prog
+
+
+def run_ids(depth: int, width: int):
+    """Compare the memory of programs whose ASTs store their full ids with the ones that derive them"""
+    print(f"\nprogram of depth={depth} width={width}")
+    print(f"{'ids':>20} {'memory (MB)':>12}")
+    for name, lazy_ids in (("stored", False), ("lazy", True)):
+        tracemalloc.start()
+        prog = build_deep(lazy_ids, depth, width)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>20} {size / 1e6:>12.2f}")
+        del prog
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
+    run_ids(500, 50)
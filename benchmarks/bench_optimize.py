@@ -0,0 +1,63 @@
+"""Benchmark the common subexpression elimination pass (`eliminate_common_subexprs`) on the synthetic program,
+where the method calls of the program are declared pure so that they are hoisted out of the loops.
+
+Usage: python -m benchmarks.bench_optimize [--classes 50] [--methods 20] [--depth 4] [--vars 3] [--calls 1000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from benchmarks.suite import Config, build
+from codegen.models import Program
+from codegen.models.expr import ExprFuncCall
+from codegen.models.optimize import DEFAULT_PURE_EXPRS, eliminate_common_subexprs
+
+
+class Base:
+    def __getattr__(self, name: str):
+        # fn0, fn1, ... of the synthetic program
+        return lambda level, arg: level + arg
+
+
+def run_methods(prog: Program, cfg: Config, n_calls: int) -> float:
+    """Execute the generated code and call its methods, return the time of the calls"""
+    env = {"Base": Base}
+    exec(compile(prog.to_python(), "<generated>", "exec"), env)
+    methods = [
+        getattr(env[f"Class{i}"](), f"method{j}")
+        for i in range(cfg.n_classes)
+        for j in range(cfg.n_methods)
+    ]
+    start = time.perf_counter()
+    for _ in range(n_calls // len(methods) + 1):
+        for method in methods:
+            method(1)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=Config.n_classes)
+    parser.add_argument("--methods", type=int, default=Config.n_methods)
+    parser.add_argument("--depth", type=int, default=Config.depth)
+    parser.add_argument("--vars", type=int, default=Config.n_vars)
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    cfg = Config(args.classes, args.methods, args.depth, args.vars, "python")
+    prog, _ = build(cfg)
+    before = run_methods(prog, cfg, args.calls)
+
+    start = time.perf_counter()
+    n_temps = eliminate_common_subexprs(prog, DEFAULT_PURE_EXPRS | {ExprFuncCall})
+    elapsed = time.perf_counter() - start
+    after = run_methods(prog, cfg, args.calls)
+
+    print(f"{'pass (s)':>10} {'temps':>8} {'calls before (s)':>18} {'calls after (s)':>17}")
+    print(f"{elapsed:>10.4f} {n_temps:>8} {before:>18.4f} {after:>17.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark writing a project of many modules (see `codegen.models.project.Project`) to a directory: sequentially,
+in a pool of processes, and again when no module has changed (every file is skipped).
+
+Usage: python -m benchmarks.bench_project [--modules 200] [--classes 5] [--methods 5] [--parallel N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.suite import Config, build
+from codegen.models.project import Project
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--methods", type=int, default=5)
+    parser.add_argument("--parallel", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    project = Project()
+    for i in range(args.modules):
+        prog, _ = build(Config(args.classes, args.methods))
+        project.add_module(f"pkg.mod{i}", prog)
+
+    print(f"modules={args.modules} parallel={args.parallel}")
+    print(f"{'write':>20} {'time (s)':>10} {'written':>8} {'skipped':>8}")
+    for name, parallel, fresh in (
+        ("sequential", 1, True),
+        ("parallel", args.parallel, True),
+        ("unchanged", args.parallel, False),
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            if not fresh:
+                project.write(directory, "python")
+            start = time.perf_counter()
+            report = project.write(directory, "python", parallel)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>20} {elapsed:>10.4f} {len(report.written):>8} {len(report.skipped):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark the rendering throughput (lines per second) of the synthetic program with different indentation
+styles, to a string (`to_python`) and streamed to a file-like object (`write_python`).
+
+Usage: python -m benchmarks.bench_render [--classes 50] [--methods 20] [--depth 4] [--vars 3] [--repeat 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import time
+from typing import Callable
+
+from benchmarks.suite import Config, build
+from codegen.models import Program
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=Config.n_classes)
+    parser.add_argument("--methods", type=int, default=Config.n_methods)
+    parser.add_argument("--depth", type=int, default=Config.depth)
+    parser.add_argument("--vars", type=int, default=Config.n_vars)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    cfg = Config(args.classes, args.methods, args.depth, args.vars, "python")
+    prog: Program
+    prog, _ = build(cfg)
+    n_lines = prog.root.to_python().count("\n") + 1
+
+    print(f"lines={n_lines}")
+    print(f"{'indent':>8} {'to_python (lines/s)':>20} {'write_python (lines/s)':>23}")
+    for name, indent in (("tab", "\t"), ("2 spaces", "  "), ("4 spaces", "    ")):
+        # the program is not rendered incrementally, so the indentation can be changed between renders
+        prog.indent = indent
+        to_python = best_time(prog.to_python, args.repeat)
+        write_python = best_time(lambda: prog.write_python(io.StringIO()), args.repeat)
+        print(f"{name:>8} {n_lines / to_python:>20,.0f} {n_lines / write_python:>23,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark rendering deeply nested expressions that share sub-expressions, with and without the render cache.
+
+Usage: python -m benchmarks.bench_render_cache [depth] [n_stmts]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from codegen.models import PredefinedFn, Program
+from codegen.models.expr import Expr, ExprConstant, ExprFuncCall, ExprIdent
+
+
+def build(prog: Program, depth: int) -> Expr:
+    """Build an expression of the given depth in which every level refers to the previous level twice"""
+    expr: Expr = ExprIdent("self")
+    for i in range(depth):
+        expr = prog.intern(
+            ExprFuncCall(
+                ExprIdent("f"),
+                [
+                    PredefinedFn.attr_getter(expr, ExprIdent(f"a{i}")),
+                    PredefinedFn.item_getter(expr, ExprConstant(i)),
+                ],
+            )
+        )
+    return expr
+
+
+def run(render_cache: bool, depth: int, n_stmts: int) -> tuple[float, int]:
+    prog = Program(render_cache=render_cache)
+    expr = build(prog, depth)
+    for _ in range(n_stmts):
+        prog.root.expr(expr)
+
+    start = time.perf_counter()
+    code = prog.root.to_python()
+    return time.perf_counter() - start, len(code)
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    n_stmts = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    no_cache, size = run(False, depth, n_stmts)
+    cache, cache_size = run(True, depth, n_stmts)
+    assert size == cache_size
+    print(f"depth={depth} n_stmts={n_stmts} output={size / 1e6:.1f}MB")
+    print(f"{'no cache (s)':>14} {'cache (s)':>14} {'speedup':>8}")
+    print(f"{no_cache:>14.4f} {cache:>14.4f} {no_cache / cache:>8.1f}x")
@@ -0,0 +1,84 @@
+"""Benchmark saving and loading a program with snapshots (`Program.dump`/`Program.load`) versus pickle.
+
+Usage: python -m benchmarks.bench_snapshot [--classes 50] [--methods 20] [--depth 4] [--vars 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import pickle
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.suite import Config, build
+from codegen.models import Program
+from codegen.models.snapshot import ProgramSnapshot
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=Config.n_classes)
+    parser.add_argument("--methods", type=int, default=Config.n_methods)
+    parser.add_argument("--depth", type=int, default=Config.depth)
+    parser.add_argument("--vars", type=int, default=Config.n_vars)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # pickle walks the tree recursively
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100_000))
+
+    prog, _ = build(Config(args.classes, args.methods, args.depth, args.vars))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot_file = os.path.join(tmpdir, "program.snap")
+        pickle_file = os.path.join(tmpdir, "program.pkl")
+
+        def dump_pickle():
+            with open(pickle_file, "wb") as f:
+                pickle.dump(prog, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        def load_pickle():
+            with open(pickle_file, "rb") as f:
+                return pickle.load(f)
+
+        def load_one_class():
+            with ProgramSnapshot(snapshot_file) as snapshot:
+                return snapshot.load_ast(len(snapshot) // 2)
+
+        results = [
+            (
+                "pickle",
+                best_time(dump_pickle, args.repeat),
+                best_time(load_pickle, args.repeat),
+                os.path.getsize(pickle_file),
+            ),
+            (
+                "snapshot",
+                best_time(lambda: prog.dump(snapshot_file), args.repeat),
+                best_time(lambda: Program.load(snapshot_file), args.repeat),
+                os.path.getsize(snapshot_file),
+            ),
+        ]
+        one_class = best_time(load_one_class, args.repeat)
+
+    print(f"{'format':>10} {'dump (s)':>10} {'load (s)':>10} {'size (MB)':>10}")
+    for name, dump_time, load_time, size in results:
+        print(f"{name:>10} {dump_time:>10.4f} {load_time:>10.4f} {size / 1e6:>10.2f}")
+    print(f"load a single class from the snapshot: {one_class:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
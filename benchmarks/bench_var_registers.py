@@ -0,0 +1,45 @@
+"""Benchmark registering and finding variables that share the same key in many functions.
+
+Usage: python -m benchmarks.bench_var_registers [n_funcs ...]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from codegen.models import DeferredVar, Program
+from codegen.models.expr import ExprConstant, ExprVar
+
+
+def run(n_funcs: int) -> tuple[float, float]:
+    """Create `n_funcs` methods in a class, each has its own `self` variable, then
+    look up `self` from the body of every method. Returns (build time, lookup time) in seconds.
+    """
+    prog = Program()
+    cls = prog.root.class_("A")
+
+    start = time.perf_counter()
+    funcs = []
+    for i in range(n_funcs):
+        self_ = DeferredVar.simple("self")
+        func = cls.func(f"method_{i}", [self_])
+        func.assign(DeferredVar("x", ("x",)), ExprVar(self_.get_var()))
+        funcs.append(func)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for func in funcs:
+        func.return_(ExprConstant(prog.get_var(key=("self",), at=func.next_child_id()).get_name()))
+    lookup_time = time.perf_counter() - start
+    return build_time, lookup_time
+
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"{'n_funcs':>10} {'build (s)':>12} {'lookup (s)':>12} {'us/lookup':>12}")
+    for size in sizes:
+        build_time, lookup_time = run(size)
+        print(
+            f"{size:>10} {build_time:>12.4f} {lookup_time:>12.4f} {lookup_time / size * 1e6:>12.2f}"
+        )
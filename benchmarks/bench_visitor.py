@@ -0,0 +1,92 @@
+"""Benchmark walking the synthetic program with several visitors, fused in a single walk or one walk per visitor.
+
+Usage: python -m benchmarks.bench_visitor [--classes 50] [--methods 20] [--depth 4] [--vars 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from benchmarks.suite import Config, build
+from codegen.models import Program
+from codegen.models.visitor import ASTVisitor, visit
+
+
+class CountCalls(ASTVisitor):
+    def __init__(self):
+        self.n = 0
+
+    def visit_ExprFuncCall(self, expr):
+        self.n += 1
+
+
+class CountIdents(ASTVisitor):
+    def __init__(self):
+        self.n = 0
+
+    def visit_ExprIdent(self, expr):
+        self.n += 1
+
+
+class CountStatements(ASTVisitor):
+    visit_statements_only = True
+
+    def __init__(self):
+        self.n = 0
+
+    def visit_Statement(self, stmt):
+        self.n += 1
+
+
+class MaxDepth(ASTVisitor):
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+
+    def visit_AST(self, ast):
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def leave_AST(self, ast):
+        self.depth -= 1
+
+
+def run(prog: Program, fused: bool) -> tuple[float, list[int]]:
+    visitors = [CountCalls(), CountIdents(), CountStatements(), MaxDepth()]
+    start = time.perf_counter()
+    if fused:
+        visit(prog.root, *visitors)
+    else:
+        for visitor in visitors:
+            visitor.visit(prog.root)
+    elapsed = time.perf_counter() - start
+    return elapsed, [
+        visitors[0].n,
+        visitors[1].n,
+        visitors[2].n,
+        visitors[3].max_depth,
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=Config.n_classes)
+    parser.add_argument("--methods", type=int, default=Config.n_methods)
+    parser.add_argument("--depth", type=int, default=Config.depth)
+    parser.add_argument("--vars", type=int, default=Config.n_vars)
+    args = parser.parse_args()
+
+    cfg = Config(args.classes, args.methods, args.depth, args.vars, "python")
+    prog, _ = build(cfg)
+    separate, counts = run(prog, fused=False)
+    fused, fused_counts = run(prog, fused=True)
+    assert counts == fused_counts
+
+    print(f"calls={counts[0]} idents={counts[1]} stmts={counts[2]} depth={counts[3]}")
+    print(f"{'separate (s)':>14} {'fused (s)':>14} {'speedup':>8}")
+    print(f"{separate:>14.4f} {fused:>14.4f} {separate / fused:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Benchmark suite of the hot paths of building and rendering a program.
+
+A synthetic program of configurable size is generated: classes with methods, each method has nested
+for-loops (or if-statements in Typescript) and assigns variables at every level. The suite measures the time
+(best of several repeats) and peak memory of each phase:
+
+- build: constructing the AST (`AST.func`, `AST.assign`, `AST.for_loop`, `AST._add_stmt`, ...)
+- resolve: de-referencing the variables from the innermost scopes (`Program.get_var`)
+- render: converting the program to code (`AST.to_python` or `AST.to_typescript`)
+
+Usage:
+    python -m benchmarks.suite --classes 50 --methods 20 --depth 4 --vars 3 --save baseline.json
+    python -m benchmarks.suite --classes 50 --methods 20 --depth 4 --vars 3 --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Literal
+
+from codegen.models import AST, DeferredVar, PredefinedFn, Program
+from codegen.models.expr import ExprConstant, ExprFuncCall, ExprIdent, ExprLogicalAnd
+
+
+@dataclass
+class Config:
+    n_classes: int = 50
+    n_methods: int = 20
+    # number of nested loops (or if-statements) in each method
+    depth: int = 4
+    # number of variables assigned at each level of a method
+    n_vars: int = 3
+    lang: Literal["python", "typescript"] = "python"
+
+
+@dataclass
+class PhaseResult:
+    # best time of the repeats in seconds
+    time: float
+    # peak traced memory in MB
+    peak_memory: float
+
+
+def build(cfg: Config) -> tuple[Program, list[AST]]:
+    """Build the synthetic program, returning it and the innermost ASTs of the methods"""
+    prog = Program()
+    prog.import_("typing.Optional", True)
+    innermost = []
+
+    for i in range(cfg.n_classes):
+        cls = prog.root.class_(f"Class{i}", [ExprIdent("Base")])
+        for j in range(cfg.n_methods):
+            self_ = DeferredVar.simple("self")
+            arg = DeferredVar("arg", ("arg",), type=ExprIdent("int"))
+            ast = cls.func(f"method{j}", [self_, arg], ExprIdent("int"))
+            for level in range(cfg.depth):
+                for k in range(cfg.n_vars):
+                    ast.assign(
+                        DeferredVar(f"v{k}", (f"v{k}", level)),
+                        ExprFuncCall(
+                            PredefinedFn.attr_getter(
+                                ExprIdent(self_.get_var().get_name()),
+                                ExprIdent(f"fn{k}"),
+                            ),
+                            [ExprConstant(level), ExprIdent(arg.get_var().get_name())],
+                        ),
+                    )
+                if cfg.lang == "python":
+                    ast = ast.for_loop(
+                        DeferredVar("item", ("item", level)),
+                        PredefinedFn.range(ExprConstant(0), ExprConstant(10)),
+                    )
+                else:
+                    ast = ast.if_(
+                        ExprLogicalAnd(
+                            [ExprIdent(f"v{k}") for k in range(cfg.n_vars)]
+                            or [ExprConstant(True)]
+                        )
+                    )
+            ast.return_(ExprIdent(arg.get_var().get_name()))
+            innermost.append(ast)
+    return prog, innermost
+
+
+def resolve(cfg: Config, prog: Program, innermost: list[AST]):
+    keys = [("self",), ("arg",)]
+    for level in range(cfg.depth):
+        keys.extend((f"v{k}", level) for k in range(cfg.n_vars))
+        if cfg.lang == "python":
+            keys.append(("item", level))
+    for ast in innermost:
+        at = ast.next_child_id()
+        for key in keys:
+            prog.get_var(key=key, at=at)
+
+
+def render(cfg: Config, prog: Program) -> str:
+    if cfg.lang == "python":
+        return prog.root.to_python()
+    return prog.root.to_typescript()
+
+
+def measure(fn: Callable[[], object], repeat: int) -> PhaseResult:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return PhaseResult(best, peak / 1024 / 1024)
+
+
+def run(cfg: Config, repeat: int) -> dict[str, PhaseResult]:
+    prog, innermost = build(cfg)
+    return {
+        "build": measure(lambda: build(cfg), repeat),
+        "resolve": measure(lambda: resolve(cfg, prog, innermost), repeat),
+        "render": measure(lambda: render(cfg, prog), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--classes", type=int, default=Config.n_classes)
+    parser.add_argument("--methods", type=int, default=Config.n_methods)
+    parser.add_argument("--depth", type=int, default=Config.depth)
+    parser.add_argument("--vars", type=int, default=Config.n_vars)
+    parser.add_argument(
+        "--lang", choices=["python", "typescript"], default=Config.lang
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="save the results to this file as a baseline")
+    parser.add_argument("--compare", help="compare the results to this baseline file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="exit with an error if a phase is this many times slower than the baseline",
+    )
+    args = parser.parse_args()
+
+    cfg = Config(args.classes, args.methods, args.depth, args.vars, args.lang)
+    results = run(cfg, args.repeat)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["config"] != asdict(cfg):
+            print(
+                f"WARNING: the baseline is measured with a different config: {baseline['config']}",
+                file=sys.stderr,
+            )
+
+    print(f"config: {asdict(cfg)}")
+    print(f"{'phase':>10} {'time (s)':>10} {'peak (MB)':>10} {'vs baseline':>12}")
+    regressions = []
+    for phase, res in results.items():
+        ratio = ""
+        if baseline is not None and phase in baseline["results"]:
+            base_time = baseline["results"][phase]["time"]
+            ratio = f"{res.time / base_time:.2f}x"
+            if res.time > base_time * args.threshold:
+                regressions.append(phase)
+        print(f"{phase:>10} {res.time:>10.4f} {res.peak_memory:>10.2f} {ratio:>12}")
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "config": asdict(cfg),
+                    "results": {phase: asdict(res) for phase, res in results.items()},
+                },
+                f,
+                indent=2,
+            )
+
+    if len(regressions) > 0:
+        print(f"Regressed phases: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,28 @@
 from __future__ import annotations
 
+import marshal
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Any, Callable, Literal, Optional, Sequence
+from io import StringIO
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    Sequence,
+    TextIO,
+)
 
-from codegen.models.expr import ExceptionExpr, Expr
+from codegen.models.expr import (
+    ExceptionExpr,
+    Expr,
+    render_iteratively,
+)
 from codegen.models.statement import (
+    CLASS_LAYOUT,
     AssignStatement,
     BlockStatement,
     CatchStatement,
@@ -26,30 +44,153 @@ from codegen.models.statement import (
     Statement,
     TryStatement,
 )
-from codegen.models.types import AST_ID
+from codegen.models.structural import ClassKinds, getstate, setstate, stable_tokens
+from codegen.models.types import AST_ID, KEY
+from codegen.models.utils import gc_paused
 from codegen.models.var import DeferredVar, Var, VarScope
 
 if TYPE_CHECKING:
     from codegen.models.program import Program
 
+# id of ASTs that are inserted directly into `AST.children` until `Program.update_ast_ids` is called
+NEW_AST_ID: AST_ID = (-1,)
 
-@dataclass
+
+@dataclass(slots=True, eq=False, init=False)
 class AST:
-    id: AST_ID
+    # id of this AST (see `AST.id`), or only its index in the children of its parent if the program derives the
+    # ids from the parents (see `Program.lazy_ids`) and the id has not been cached. It is passed as `id` to
+    # `__init__` (and `dataclasses.replace`), as the `id` property derives it from the parents if needed.
+    _id: AST_ID | int = field(init=False)
     prog: Program
     stmt: Statement
     children: list[AST] = field(default_factory=list)
     _is_frozen: bool = (
         False  # whether to freeze the AST and disallow further modification
     )
+    # the parent of this AST (None for the root), not part of the comparison to avoid cycles
+    parent: Optional[AST] = field(default=None, repr=False, compare=False)
+    # rendered lines of this AST by (language, level), None if the program does not render incrementally.
+    # it is cleared whenever this AST or any of its descendants is modified. See `_RenderedLines`.
+    _render_cache: Optional[dict[tuple[str, int], _RenderedLines]] = field(
+        default=None, repr=False, compare=False
+    )
+    # structural hash of the statements of this subtree, computed when the AST is frozen
+    _hash: Optional[int] = field(default=None, repr=False, compare=False)
+
+    def __init__(
+        self,
+        id: AST_ID | int,
+        prog: Program,
+        stmt: Statement,
+        children: Optional[list[AST]] = None,
+        _is_frozen: bool = False,
+        parent: Optional[AST] = None,
+        _render_cache: Optional[dict[tuple[str, int], _RenderedLines]] = None,
+        _hash: Optional[int] = None,
+    ):
+        self._id = id
+        self.prog = prog
+        self.stmt = stmt
+        self.children = [] if children is None else children
+        self._is_frozen = _is_frozen
+        self.parent = parent
+        self._render_cache = _render_cache
+        self._hash = _hash
 
     @staticmethod
     def root(prog: Program):
         return AST(tuple(), prog, BlockStatement(has_owned_env=False))
 
+    def structural_hash(self) -> int:
+        """Get the structural hash of the statements of this subtree, which is only available for frozen ASTs as
+        other ASTs can be modified. ASTs themselves are compared and hashed by identity, so that they can be found
+        in lists of children and used as keys.
+
+        The hash is stable: it is the same across processes (see `stable_tokens`), e.g., to be used as the key of
+        the code of the subtree in an on-disk cache (see `BuildCache`).
+        """
+        if self._hash is None:
+            if not self._is_frozen:
+                raise TypeError(
+                    "Only frozen ASTs have structural hashes as other ASTs can be modified"
+                )
+            # imported lazily as hashlib loads OpenSSL, which is slow to import
+            from hashlib import blake2b
+
+            # compute the hashes bottom-up, as the subtree may be deep
+            asts = []
+            stack = [self]
+            while len(stack) > 0:
+                ast = stack.pop()
+                asts.append(ast)
+                stack.extend(child for child in ast.children if child._hash is None)
+            for ast in reversed(asts):
+                tokens = stable_tokens(ast.stmt)
+                tokens.append([child._hash for child in ast.children])
+                digest = blake2b(marshal.dumps(tokens, 2), digest_size=20).digest()
+                ast._hash = int.from_bytes(digest, "big")
+        return self._hash  # type: ignore
+
+    def structurally_equal(self, other: AST) -> bool:
+        """Check if two ASTs have structurally equal statements, regardless of their positions in the programs"""
+        stack = [(self, other)]
+        while len(stack) > 0:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if a._hash is not None and b._hash is not None and a._hash != b._hash:
+                return False
+            if len(a.children) != len(b.children) or a.stmt != b.stmt:
+                return False
+            stack.extend(zip(a.children, b.children))
+        return True
+
+    def __getstate__(self):
+        # the parent is restored from the children of its parent, so that pickling a deep tree does not recurse
+        # through the parents (see `Program.__getstate__` for the children)
+        state = getstate(self)
+        del state["parent"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        setstate(self, state)
+        if not hasattr(self, "parent"):
+            # the parent may have been restored already, if it is unpickled before this AST
+            self.parent = None
+        for child in self.children:
+            child.parent = self
+
+    @property
+    def id(self) -> AST_ID:
+        """Get the id of this AST, which is the path of indices of children from the root to this AST"""
+        id = self._id
+        if id.__class__ is tuple:
+            return id  # type: ignore
+        # collect the indices up to the closest ancestor whose id is stored
+        indices = [id]
+        ast = self.parent
+        while ast._id.__class__ is not tuple:  # type: ignore
+            indices.append(ast._id)  # type: ignore
+            ast = ast.parent  # type: ignore
+        indices.reverse()
+        return ast._id + tuple(indices)  # type: ignore
+
+    @id.setter
+    def id(self, id: AST_ID):
+        self._id = id
+
+    def cache_id(self) -> AST_ID:
+        """Get the id of this AST and store it if it is derived from the parents, so that getting it again is O(1).
+        It is used for ASTs whose ids are needed repeatedly, e.g., the ones that hold variables."""
+        id = self._id
+        if id.__class__ is not tuple:
+            id = self._id = self.id
+        return id  # type: ignore
+
     def is_root(self) -> bool:
         """Check if this is the root AST"""
-        return len(self.id) == 0
+        return self._id == ()
 
     def __call__(
         self,
@@ -75,9 +216,13 @@ class AST:
         return return_val
 
     def freeze(self):
-        self._is_frozen = True
-        for child in self.children:
-            child.freeze()
+        """Freeze the subtree of this AST so that it cannot be modified anymore"""
+        stack = [self]
+        while len(stack) > 0:
+            ast = stack.pop()
+            ast._is_frozen = True
+            stack.extend(ast.children)
+        self.structural_hash()
 
     def import_(self, module: str, is_import_attr: bool, alias: Optional[str] = None):
         self._add_stmt(ImportStatement(module, is_import_attr, alias))
@@ -140,9 +285,72 @@ class AST:
             )
         )
 
-    def class_(self, name: str, parents: Optional[Sequence[Expr]] = None):
-        """Define a class."""
-        return self._add_stmt(DefClassStatement(name, parents or []))
+    def class_(
+        self,
+        name: str,
+        parents: Optional[Sequence[Expr]] = None,
+        layout: CLASS_LAYOUT = "plain",
+        frozen: bool = False,
+    ):
+        """Define a class.
+
+        Args:
+            name: name of the class
+            parents: the base classes
+            layout: how the instances of the class are represented in python. Instances of "plain" classes have a
+                `__dict__`, while "slots" classes (whose instance variables must be added with `AST.class_var`),
+                "dataclass" classes (`@dataclass(slots=True)`) and "namedtuple" classes (`NamedTuple`, which cannot
+                have parents) store their fields compactly and access them faster. Typescript classes are the same
+                for all layouts.
+            frozen: whether the instances of a "dataclass" class are immutable
+        """
+        if frozen and layout != "dataclass":
+            raise ValueError(f"Only dataclass classes can be frozen, got {layout} class {name}")
+        if layout == "namedtuple" and parents:
+            raise ValueError(f"NamedTuple class {name} cannot have other parents")
+        if layout == "dataclass":
+            self.prog.import_("dataclasses.dataclass", True, python_only=True)
+        elif layout == "namedtuple":
+            self.prog.import_("typing.NamedTuple", True, python_only=True)
+        return self._add_stmt(DefClassStatement(name, parents or [], layout, frozen))
+
+    def class_var(
+        self,
+        name: str,
+        type: Optional[str],
+        value: Optional[Expr] = None,
+        is_static: bool = False,
+    ) -> AST:
+        """Define a variable of the class of this AST. The instance variables of a "slots" class are added to its
+        `__slots__`, they cannot have values as the values of class variables would conflict with the slots. The
+        static variables of a "dataclass" class are annotated with `ClassVar` in python, so that they are not fields,
+        and "namedtuple" classes cannot have static variables."""
+        stmt = self.stmt
+        is_class_var = False
+        if isinstance(stmt, DefClassStatement) and is_static:
+            if stmt.layout == "namedtuple":
+                raise ValueError(
+                    f"NamedTuple class {stmt.name} cannot have static variable {name}"
+                )
+            if stmt.layout == "dataclass" and type is not None:
+                self.prog.import_("typing.ClassVar", True, python_only=True)
+                is_class_var = True
+        if (
+            isinstance(stmt, DefClassStatement)
+            and stmt.layout == "slots"
+            and not is_static
+        ):
+            if value is not None:
+                raise ValueError(
+                    f"Instance variable {name} of slots class {stmt.name} cannot have a value"
+                )
+            if self._is_frozen:
+                raise Exception("The AST is frozen and cannot be modified")
+            stmt.slot_names.append(name)
+            self.mark_dirty()
+        return self._add_stmt(
+            DefClassVarStatement(name, type, value, is_static, is_class_var)
+        )
 
     def class_like(
         self,
@@ -175,6 +383,35 @@ class AST:
 
         self._add_stmt(AssignStatement(var, expr))
 
+    def assign_many(self, assignments: Iterable[tuple[DeferredVar | Var, Expr]]) -> list[AST]:
+        """Assign expressions to variables at once, which is the same as calling `assign` for each pair but faster
+        for large bodies. The new variables are registered together, and nothing is registered if any of them
+        conflicts with an existing variable or the AST is frozen. Return the ASTs of the assignments."""
+        if self._is_frozen:
+            raise Exception("The AST is frozen and cannot be modified")
+        assignments = list(assignments)
+        parent_id = self.cache_id()
+        new_vars: list[tuple[str, KEY, int, Optional[str], None]] = []
+        for i, (var, _) in enumerate(assignments, len(self.children)):
+            if isinstance(var, DeferredVar):
+                if not var.has_not_been_created():
+                    raise ValueError("The variable has been created already")
+                new_vars.append((var.name, var.key, i, var.force_name, None))
+            else:
+                # the variable is reassigned, it must be accessible from the current scope
+                assert self.prog.is_within_scope(parent_id + (i,), var.scope)
+
+        with gc_paused():
+            real_vars = iter(self.prog.create_vars(parent_id, new_vars))
+            stmts = []
+            for var, expr in assignments:
+                if isinstance(var, DeferredVar):
+                    real_var = next(real_vars)
+                    var.set_var(real_var)
+                    var = real_var
+                stmts.append(AssignStatement(var, expr))
+            return self.extend(stmts)
+
     def for_loop(self, item: DeferredVar, iter: Expr):
         """When we construct a for-loop, the item (or var) is always declared. We don't allow reassigning the variable in the for-loop."""
         assert isinstance(item, DeferredVar) and item.has_not_been_created(), (
@@ -224,99 +461,330 @@ class AST:
 
     def has_statement_between_ast(self, stmtcls: type[Statement], end_ast_id: AST_ID):
         """Check if there is a statement of the given type the current AST and the end_ast (exclusive)"""
-        for ast in self.children:
-            for intermediate_ast in ast.find_ast_to(end_ast_id):
-                if (
-                    isinstance(intermediate_ast.stmt, stmtcls)
-                    and intermediate_ast.id != end_ast_id
-                ):
-                    return True
+        end_ast = self.find_ast(end_ast_id)
+        if end_ast is None or end_ast is self:
+            return False
+
+        ast = end_ast.parent
+        while ast is not self:
+            assert ast is not None
+            if isinstance(ast.stmt, stmtcls):
+                return True
+            ast = ast.parent
         return False
 
     def find_ast_to(self, id: AST_ID):
         """Iterate through ASTs that lead to the AST with the given id (inclusive)"""
-        if self.id == id:
-            yield self
-        else:
-            for ast in self.children:
-                if ast.find_ast(id) is not None:
-                    yield self
-                    yield from ast.find_ast_to(id)
-                    break
+        ast = self.find_ast(id)
+        if ast is None:
+            return
+
+        path = []
+        while ast is not self:
+            assert ast is not None
+            path.append(ast)
+            ast = ast.parent
+        yield self
+        yield from reversed(path)
 
     def find_ast(self, id: AST_ID) -> Optional[AST]:
         """Find the AST with the given id"""
-        if len(self.id) > len(id):
+        self_id = self.id
+        if len(self_id) > len(id):
             # the ast that we are looking for is not in the subtree of this ast
             return None
 
-        for i in range(len(self.id)):
-            if self.id[i] != id[i]:
+        for i in range(len(self_id)):
+            if self_id[i] != id[i]:
                 # the ast that we are looking for is not in the subtree of this ast
                 return None
 
-        if len(self.id) == len(id):
-            return self
-
         ast = self
-        for i in range(len(self.id), len(id)):
+        for i in range(len(self_id), len(id)):
+            if id[i] < 0 or id[i] >= len(ast.children):
+                return None
             ast = ast.children[id[i]]
         return ast
 
+    def iter_ancestors(self) -> Iterator[AST]:
+        """Iterate through the ancestors of this AST, from its parent to the root"""
+        ast = self.parent
+        while ast is not None:
+            yield ast
+            ast = ast.parent
+
+    def iter_path(self) -> Iterator[AST]:
+        """Iterate through ASTs from the root to this AST (inclusive)"""
+        path = [self]
+        path.extend(self.iter_ancestors())
+        return reversed(path)
+
     def next_child_id(self) -> AST_ID:
         """Get ID for the next child of this AST"""
-        return self.id + (len(self.children),)
+        return self.cache_id() + (len(self.children),)
 
     def next_grandchild_id(self) -> AST_ID:
         """Get ID for the next grandchild of this AST"""
-        return self.id + (len(self.children), 0)
+        return self.cache_id() + (len(self.children), 0)
 
     def next_var_scope(self) -> VarScope:
         """Get a scope for the next variable that will be have if it is assigned to this AST"""
-        return VarScope(self.id, len(self.children))
+        return VarScope(self.cache_id(), len(self.children))
 
     def _add_stmt(self, stmt: Statement):
         if self._is_frozen:
             raise Exception("The AST is frozen and cannot be modified")
-        ast = AST(self.next_child_id(), self.prog, stmt)
+        if self.prog.lazy_ids:
+            ast = AST(len(self.children), self.prog, stmt, parent=self)
+        else:
+            ast = AST(self.next_child_id(), self.prog, stmt, parent=self)
         self.children.append(ast)
+        if self._render_cache is not None:
+            ast._render_cache = {}
+            self.mark_dirty()
         return ast
 
+    def extend(self, stmts: Iterable[Statement]) -> list[AST]:
+        """Add statements as children of this AST at once, which is faster than adding them one by one for large
+        bodies (e.g., the values of an enum). Return the ASTs of the statements."""
+        if self._is_frozen:
+            raise Exception("The AST is frozen and cannot be modified")
+        prog = self.prog
+        with gc_paused():
+            if prog.lazy_ids:
+                asts = [
+                    AST(i, prog, stmt, [], False, self)
+                    for i, stmt in enumerate(stmts, len(self.children))
+                ]
+            else:
+                id = self.id
+                asts = [
+                    AST(id + (i,), prog, stmt, [], False, self)
+                    for i, stmt in enumerate(stmts, len(self.children))
+                ]
+        self.children.extend(asts)
+        if self._render_cache is not None and len(asts) > 0:
+            for ast in asts:
+                ast._render_cache = {}
+            self.mark_dirty()
+        return asts
+
     def to_python(self, level: int = 0):
         """Convert the AST to python code"""
-        if isinstance(self.stmt, BlockStatement):
-            # there is no direct statement and the level does not increase after this statement
-            return "\n".join([child.to_python(level) for child in self.children])
-
-        prog = ["\t" * level + line for line in self.stmt.to_python().split("\n")]
-        prog.extend((child.to_python(level + 1) for child in self.children))
-        return "\n".join(prog)
+        return _join_lines(self.iter_python_lines(level))
 
     def to_typescript(self, level: int = 0):
         """Convert the AST to typescript code"""
-        if isinstance(self.stmt, BlockStatement):
-            if not self.stmt.has_owned_env:
-                # the level does not increase after this statement because we do not need to create a new scope
-                content = "\n".join(
-                    [child.to_typescript(level) for child in self.children]
-                )
-                if self.is_root():
-                    return content.lstrip("\n")
-                return content
-
-            if len(self.children) == 0:
-                return ""
-
-            return (
-                ("\t" * level + "{")
-                + "\n".join([child.to_typescript(level + 1) for child in self.children])
-                + "\n"
-                + ("\t" * level + "}")
-            )
+        return _join_lines(self.iter_typescript_lines(level))
+
+    def write_python(self, fp: TextIO, level: int = 0):
+        """Write the python code of the AST to a file-like object, line by line. The written content is
+        the same as the output of `to_python`."""
+        _write_lines(fp, self.iter_python_lines(level))
+
+    def write_typescript(self, fp: TextIO, level: int = 0):
+        """Write the typescript code of the AST to a file-like object, line by line. The written content is
+        the same as the output of `to_typescript`."""
+        _write_lines(fp, self.iter_typescript_lines(level))
+
+    def mark_dirty(self):
+        """Mark this AST and its ancestors as modified so that they are re-rendered in the next render.
+
+        Adding statements marks the ASTs automatically, call this function if you modify a statement in place.
+        """
+        ast = self
+        # if the cache of an AST is empty, the caches of its ancestors are also empty
+        while ast is not None and ast._render_cache:
+            ast._render_cache.clear()
+            ast = ast.parent
+
+    def iter_python_lines(self, level: int = 0) -> Iterator[str]:
+        """Iterate over lines of the python code of the AST (without the line terminator)"""
+        return _iter_lines(self, "python", level)
+
+    def iter_typescript_lines(self, level: int = 0) -> Iterator[str]:
+        """Iterate over lines of the typescript code of the AST (without the line terminator)"""
+        lines = _iter_lines(self, "typescript", level)
+        if self.is_root() and _is_shared_env_block(self.stmt):
+            # skip the leading empty lines, but keep one if the whole content is empty
+            return _skip_leading_empty_lines(lines)
+        return lines
+
+
+# actions of the entries of the stack in `_iter_lines`
+_RENDER = 0
+_FINISH = 1
+_EMIT = 2
+# number of buffered lines that are yielded together when no AST needs them anymore
+_FLUSH_SIZE = 256
+# the cached lines of an AST are a range of the buffer of lines of the render that produced them, which is shared
+# by the ASTs of that render instead of copying the lines of the descendants into every ancestor:
+# (first line, buffer, start, end). The first line is stored separately as the first line in the buffer may be
+# changed by an ancestor afterwards (the opening bracket of a typescript block).
+_RenderedLines = tuple[str, list[str], int, int]
+# whether classes of statements are blocks
+_block_classes = ClassKinds(lambda cls: issubclass(cls, BlockStatement))
+
+
+def _iter_lines(
+    root: AST, lang: Literal["python", "typescript"], level: int
+) -> Iterator[str]:
+    """Iterate over lines of the code of an AST. The subtree is walked with an explicit stack, so ASTs of any depth
+    can be rendered, and each line is produced once instead of being passed up through a generator per level.
+
+    Lines are buffered only while an AST that needs all its lines is being rendered: to store them in its render
+    cache, or to attach the opening bracket of a typescript block to its first line.
+    """
+    is_python = lang == "python"
+    unit = root.prog.indent
+    # indentation prefixes by level, extended when deeper levels are reached
+    indents = [""]
+    # rendered lines that are not yielded yet
+    out: list[str] = []
+    # number of ASTs in the stack whose lines must stay in `out` until they are finished
+    n_pending = 0
+    # entries are (action, AST or line, level, index of the first line of the AST in `out`)
+    stack: list[tuple[int, Any, int, int]] = [(_RENDER, root, level, 0)]
+    while len(stack) > 0:
+        action, ast, level, start = stack.pop()
+        if action == _EMIT:
+            out.append(ast)
+            continue
+        if action == _FINISH:
+            n_pending -= 1
+            stmt = ast.stmt
+            if not is_python and isinstance(stmt, BlockStatement) and stmt.has_owned_env:
+                # the opening bracket is on the same line as the first line of the first child
+                indent = indents[level]
+                out[start] = indent + "{" + out[start]
+                out.append(indent + "}")
+            if ast._render_cache is not None:
+                end = len(out)
+                if not is_python and ast.is_root() and _is_shared_env_block(stmt):
+                    # skip the leading empty lines, but keep one if all lines are empty
+                    while start < end - 1 and out[start] == "":
+                        start += 1
+                ast._render_cache[(lang, level)] = (out[start], out, start, end)
+            if n_pending == 0 and len(out) >= _FLUSH_SIZE:
+                yield from out
+                # the buffer may be referred by render caches
+                out = []
+            continue
+
+        cache = ast._render_cache
+        if cache is not None:
+            cached = cache.get((lang, level))
+            if cached is not None:
+                first_line, buffer, start, end = cached
+                out.append(first_line)
+                out.extend(buffer[start + 1 : end])
+                continue
 
-        prog = ["\t" * level + line for line in self.stmt.to_typescript().split("\n")]
-        if len(self.children) > 0:
-            prog.append("\t" * level + "{")
-            prog.extend((child.to_typescript(level + 1) for child in self.children))
-            prog.append("\t" * level + "}")
-        return "\n".join(prog)
+        if level >= len(indents):
+            _add_indents(indents, unit, level + 1)
+        stmt = ast.stmt
+        children = ast.children
+        if _block_classes[stmt.__class__]:
+            if len(children) == 0:
+                out.append("")
+                if cache is not None:
+                    cache[(lang, level)] = ("", out, len(out) - 1, len(out))
+                continue
+            # the level does not increase after this statement if it is python code or if we do not need
+            # to create a new scope in typescript
+            owned_env = not is_python and stmt.has_owned_env
+            if cache is not None or owned_env:
+                n_pending += 1
+                stack.append((_FINISH, ast, level, len(out)))
+            if owned_env:
+                level += 1
+        else:
+            indent = indents[level]
+            if cache is not None:
+                n_pending += 1
+                stack.append((_FINISH, ast, level, len(out)))
+            try:
+                code = stmt.to_python() if is_python else stmt.to_typescript()
+            except RecursionError:
+                # expressions are rendered recursively, which is faster unless they are very deeply nested
+                code = render_iteratively(stmt, lang)
+            if "\n" in code:
+                _add_lines(out, code, level, indents, unit)
+            else:
+                out.append(indent + code)
+            if len(children) == 0:
+                if n_pending == 0 and len(out) >= _FLUSH_SIZE:
+                    yield from out
+                    out = []
+                continue
+            if not is_python:
+                out.append(indent + "{")
+                stack.append((_EMIT, indent + "}", level, 0))
+            level += 1
+
+        for i in range(len(children) - 1, -1, -1):
+            stack.append((_RENDER, children[i], level, 0))
+
+    yield from out
+
+
+def _add_indents(indents: list[str], unit: str, n: int):
+    """Extend the indentation prefixes to n levels"""
+    while len(indents) < n:
+        indents.append(indents[-1] + unit)
+
+
+def _add_lines(out: list[str], code: str, level: int, indents: list[str], unit: str):
+    """Add the lines of a multi-line statement, which are indented with tabs relative to the statement (e.g., the
+    docstring of a function), to the buffer"""
+    indent = indents[level]
+    if unit == "\t":
+        out.extend([indent + line for line in code.split("\n")])
+        return
+    for line in code.split("\n"):
+        n_tabs = len(line) - len(line.lstrip("\t"))
+        if n_tabs == 0:
+            out.append(indent + line)
+        else:
+            if level + n_tabs >= len(indents):
+                _add_indents(indents, unit, level + n_tabs + 1)
+            out.append(indents[level + n_tabs] + line[n_tabs:])
+
+
+def _is_shared_env_block(stmt: Statement) -> bool:
+    return isinstance(stmt, BlockStatement) and not stmt.has_owned_env
+
+
+def _skip_leading_empty_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Skip the leading empty lines, but keep one if all lines are empty"""
+    it = iter(lines)
+    for line in it:
+        if line != "":
+            yield line
+            break
+    else:
+        yield ""
+        return
+    yield from it
+
+
+def _join_lines(lines: Iterable[str]) -> str:
+    """Join lines with a newline. Unlike `str.join`, it does not collect all lines into a list first, so rendered
+    lines are freed once their chunk is written, and the peak memory is about the size of the joined code."""
+    fp = StringIO()
+    _write_lines(fp, lines)
+    return fp.getvalue()
+
+
+def _write_lines(fp: TextIO, lines: Iterable[str]):
+    """Write lines to a file-like object, separated by (but not terminated with) a newline. Lines are joined and
+    written in chunks, which is much faster than writing them one by one."""
+    it = iter(lines)
+    sep = ""
+    while True:
+        chunk = list(islice(it, _FLUSH_SIZE))
+        if len(chunk) == 0:
+            break
+        fp.write(sep)
+        fp.write("\n".join(chunk))
+        sep = "\n"
@@ -0,0 +1,148 @@
+"""On-disk cache of the rendered code of ASTs, so that unchanged parts of a program are not rendered again.
+
+Entries are addressed by the structural hashes of frozen ASTs (see `AST.structural_hash`), which are computed when
+the ASTs are frozen and are the same across processes: they cover the statements and expressions of the subtree, the
+names and types of its variables (`Var.get_name`) and the shape of the tree. As frozen ASTs cannot be modified, the
+same hash always means the same code, which is stored in a file named after the hash. The total size of the cache is
+bounded, the least recently used entries are evicted first.
+
+Usage:
+    cache = BuildCache(".codegen-cache")
+    program.root.children[1].freeze()
+    code = program.to_python(cache=cache)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Literal, Optional, Sequence, Union
+
+from codegen.models.ast import AST
+
+# bump this version whenever the rendered code of the same AST changes, to invalidate existing caches
+CACHE_VERSION = 3
+
+
+def get_key(ast: AST, lang: Literal["python", "typescript"]) -> str:
+    """Get the key of the code of a frozen AST rendered to the given language"""
+    indent = "t" if ast.prog.indent == "\t" else f"{len(ast.prog.indent)}s"
+    return f"{CACHE_VERSION}-{lang}-{indent}-{ast.structural_hash():040x}"
+
+
+class BuildCache:
+    """A directory of the rendered code of frozen ASTs, bounded to `max_size` bytes.
+
+    The cache can be shared by multiple builds (e.g., runs of a code generator), the recency of entries
+    is tracked by the modification time of their files.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_size: int = 256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        # mapping from keys to the sizes of their entries, from the least to the most recently used
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.size = 0
+
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                files.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.size += size
+        self._evict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: str):
+        return key in self.entries
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the code of an entry, None if it is not in the cache"""
+        if key not in self.entries:
+            return None
+        path = self.directory / key
+        try:
+            code = path.read_bytes().decode()
+            os.utime(path)
+        except FileNotFoundError:
+            # the entry has been evicted by another build
+            self.size -= self.entries.pop(key)
+            return None
+        self.entries.move_to_end(key)
+        return code
+
+    def put(self, key: str, code: str):
+        """Store the code of an entry, evicting the least recently used entries if the cache is full"""
+        data = code.encode()
+        if len(data) > self.max_size:
+            return
+
+        # write to a temporary file first so that other builds never read a partially written entry
+        # the name of the temporary file is unique across the processes and threads that share the cache
+        path = self.directory / key
+        tmp_path = self.directory / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        if key in self.entries:
+            self.size -= self.entries.pop(key)
+        self.entries[key] = len(data)
+        self.size += len(data)
+        self._evict()
+
+    def clear(self):
+        """Remove all entries"""
+        for key in self.entries:
+            (self.directory / key).unlink(missing_ok=True)
+        self.entries.clear()
+        self.size = 0
+
+    def render(
+        self,
+        asts: Sequence[AST],
+        lang: Literal["python", "typescript"],
+        render_missing: Optional[Callable[[list[AST]], list[str]]] = None,
+    ) -> list[str]:
+        """Render the ASTs (at level 0) to the given language. The code of frozen ASTs is read from the cache,
+        other ASTs and frozen ASTs that are not in the cache are rendered with `render_missing` (default to
+        rendering them one by one), and the code of the frozen ones is stored in the cache.
+        """
+        codes: list[Optional[str]] = []
+        keys: list[Optional[str]] = []
+        for ast in asts:
+            key = get_key(ast, lang) if ast._is_frozen else None
+            keys.append(key)
+            codes.append(self.get(key) if key is not None else None)
+
+        missing = [i for i, code in enumerate(codes) if code is None]
+        if len(missing) > 0:
+            missing_asts = [asts[i] for i in missing]
+            if render_missing is not None:
+                rendered = render_missing(missing_asts)
+            elif lang == "python":
+                rendered = [ast.to_python() for ast in missing_asts]
+            else:
+                rendered = [ast.to_typescript() for ast in missing_asts]
+            for i, code in zip(missing, rendered):
+                codes[i] = code
+                key = keys[i]
+                if key is not None:
+                    self.put(key, code)
+        return codes  # type: ignore
+
+    def _evict(self):
+        while self.size > self.max_size:
+            key, size = self.entries.popitem(last=False)
+            self.size -= size
+            (self.directory / key).unlink(missing_ok=True)
@@ -1,19 +1,77 @@
 from __future__ import annotations
 
-import json
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Any, Callable, Optional, Sequence
-
+from dataclasses import dataclass, field
+from dataclasses import fields as dataclass_fields
+from typing import Any, Callable, Literal, Optional, Sequence, TypeVar
+
+from codegen.models.structural import (
+    getstate,
+    iter_postorder,
+    setstate,
+    structural_fields,
+)
 from codegen.models.var import Var
 
 
+@dataclass(slots=True)
 class Expr(ABC):
+    """Base class of expressions. Expressions are compared structurally (see `codegen.models.structural`), so
+    subclasses must be declared with `eq=False` to inherit the comparison. The hashes of interned expressions are
+    cached as they are immutable, other expressions may be modified so their hashes are computed every time.
+    """
+
+    # rendered code of the expression by target language. It is None (i.e., no caching) unless the expression is
+    # interned by an ExprPool with render caching enabled, as only interned expressions are immutable.
+    _render_cache: Optional[dict[str, str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # cached structural hash of the expression, only set when it is interned (see `ExprPool.intern`)
+    _hash: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    def __hash__(self):
+        if self._hash is not None:
+            return self._hash
+        return hash((self.__class__, structural_fields(self)))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        # interned expressions have cached hashes, so most unequal ones are told apart in O(1)
+        if self._hash is not None and other._hash is not None and self._hash != other._hash:
+            return False
+        return structural_fields(self) == structural_fields(other)
+
+    def __getstate__(self):
+        return getstate(self)
+
+    def __setstate__(self, state: dict[str, Any]):
+        setstate(self, state)
+
+    def to_python(self) -> str:
+        if self._render_cache is None:
+            return self._to_python()
+        code = self._render_cache.get("python")
+        if code is None:
+            code = self._render_cache["python"] = self._to_python()
+        return code
+
+    def to_typescript(self) -> str:
+        if self._render_cache is None:
+            return self._to_typescript()
+        code = self._render_cache.get("typescript")
+        if code is None:
+            code = self._render_cache["typescript"] = self._to_typescript()
+        return code
+
     @abstractmethod
-    def to_python(self):
+    def _to_python(self) -> str:
+        """Render the expression in python; `to_python` looks up the render cache before calling it"""
         raise NotImplementedError(self.__class__)
 
-    def to_typescript(self):
+    def _to_typescript(self) -> str:
         raise NotImplementedError(self.__class__)
 
     def to_wrapped_python(self):
@@ -22,26 +80,53 @@ class Expr(ABC):
         return f"({self.to_python()})"
 
 
-class ExceptionExpr(Expr): ...
-
-
-@dataclass
+class ExceptionExpr(Expr):
+    __slots__ = ()
+
+
+def render_iteratively(obj: Any, lang: Literal["python", "typescript"]) -> str:
+    """Render an expression (or a statement) whose sub-expressions are too deeply nested to be rendered
+    recursively. The sub-expressions are rendered bottom-up with an explicit stack and their code is cached
+    until the object is rendered, so rendering an expression only looks up the code of its children.
+    """
+    method = f"to_{lang}"
+    # expressions whose code is cached only during this rendering
+    cached: list[Expr] = []
+    try:
+        for node in iter_postorder(obj):
+            if not isinstance(node, Expr):
+                continue
+            if node._render_cache is None:
+                node._render_cache = {}
+                cached.append(node)
+            try:
+                getattr(node, method)()
+            except NotImplementedError:
+                # the parent may not render this expression (e.g., `ExprIs` in `ExprNegation`)
+                pass
+        return getattr(obj, method)()
+    finally:
+        for node in cached:
+            node._render_cache = None
+
+
+@dataclass(slots=True, eq=False)
 class StandardExceptionExpr(ExceptionExpr):
     cls: Expr
     args: Sequence[Expr]
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.cls.to_python()}({', '.join([arg.to_python() for arg in self.args])})"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprConstant(Expr):
     constant: Any
 
-    def to_python(self):
+    def _to_python(self):
         return ExprConstant.constant_to_python(self.constant)
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return ExprConstant.constant_to_typescript(self.constant)
 
     @staticmethod
@@ -49,7 +134,7 @@ class ExprConstant(Expr):
         if isinstance(val, bool) or val is None:
             return str(val)
         if isinstance(val, (str, int, float)):
-            return json.dumps(val)
+            return _json_dumps(val)
         if isinstance(val, list):
             return (
                 "[" + ", ".join([ExprConstant.constant_to_python(v) for v in val]) + "]"
@@ -86,7 +171,7 @@ class ExprConstant(Expr):
         if val is None:
             return "null"
         if isinstance(val, (str, int, float)):
-            return json.dumps(val)
+            return _json_dumps(val)
         if isinstance(val, (list, tuple)):
             return (
                 "["
@@ -113,229 +198,236 @@ class ExprConstant(Expr):
         raise NotImplementedError(f"Cannot convert {val} to typescript")
 
 
-@dataclass
+def _json_dumps(val: str | int | float) -> str:
+    # json is imported lazily as it is only needed when rendering constants
+    import json
+
+    return json.dumps(val)
+
+
+@dataclass(slots=True, eq=False)
 class ExprIdent(Expr):
     ident: str
 
-    def to_python(self):
+    def _to_python(self):
         return self.ident
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return self.ident
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprRawPython(Expr):
     code: str
 
-    def to_python(self):
+    def _to_python(self):
         return self.code
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprRawTypescript(Expr):
     code: str
 
-    def to_python(self):
+    def _to_python(self):
         raise NotImplementedError("Raw Typescript cannot be converted to Python")
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return self.code
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprVar(Expr):  # a special identifier
     var: Var
 
-    def to_python(self):
+    def _to_python(self):
         return self.var.get_name()
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprFuncCall(Expr):
     func_name: Expr
     args: Sequence[Expr]
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.func_name.to_python()}({', '.join([arg.to_python() for arg in self.args])})"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"{self.func_name.to_typescript()}({', '.join([arg.to_typescript() for arg in self.args])})"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprAwait(Expr):
     expr: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"(await {self.expr.to_python()})"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"(await {self.expr.to_typescript()})"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprNewInstance(Expr):
     class_name: Expr
     args: Sequence[Expr]
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.class_name.to_python()}({', '.join([arg.to_python() for arg in self.args])})"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"new {self.class_name.to_typescript()}({', '.join([arg.to_typescript() for arg in self.args])})"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprMethodCall(Expr):
     object: Expr
     method: str
     args: Sequence[Expr]
 
-    def to_python(self):
+    def _to_python(self):
         if self.method == "__contains__" and len(self.args) == 1:
             return f"{self.args[0].to_python()} in {self.object.to_python()}"
         return f"{self.object.to_python()}.{self.method}({', '.join([arg.to_python() for arg in self.args])})"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"{self.object.to_typescript()}.{self.method}({', '.join([arg.to_typescript() for arg in self.args])})"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprNotEqual(Expr):
     left: Expr
     right: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.left.to_python()} != {self.right.to_python()}"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"{self.left.to_typescript()} !== {self.right.to_typescript()}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprLessThanOrEqual(Expr):
     left: Expr
     right: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.left.to_python()} < {self.right.to_python()}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprEqual(Expr):
     left: Expr
     right: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.left.to_python()} == {self.right.to_python()}"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"{self.left.to_typescript()} === {self.right.to_typescript()}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprIs(Expr):
     left: Expr
     right: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.left.to_python()} is {self.right.to_python()}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprNegation(Expr):
     expr: Expr
 
-    def to_python(self):
+    def _to_python(self):
         if isinstance(self.expr, ExprIs):
             return f"{self.expr.left.to_python()} is not {self.expr.right.to_python()}"
         return f"not {self.expr.to_wrapped_python()}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprLogicalAnd(Expr):
     terms: Sequence[Expr]
 
-    def to_python(self):
+    def _to_python(self):
         return f" and ".join([term.to_python() for term in self.terms])
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f" && ".join([term.to_typescript() for term in self.terms])
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprLogicalOr(Expr):
     terms: Sequence[Expr]
 
-    def to_python(self):
+    def _to_python(self):
         return f" or ".join([term.to_python() for term in self.terms])
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f" || ".join([term.to_typescript() for term in self.terms])
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprDivision(Expr):
     left: Expr
     right: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.left.to_python()} / {self.right.to_python()}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExprTernary(Expr):
     condition: Expr
     true_expr: Expr
     false_expr: Expr
 
-    def to_python(self):
+    def _to_python(self):
         return f"{self.true_expr.to_python()} if {self.condition.to_python()} else {self.false_expr.to_python()}"
 
-    def to_typescript(self):
+    def _to_typescript(self):
         return f"{self.condition.to_typescript()} ? {self.true_expr.to_typescript()} : {self.false_expr.to_typescript()}"
 
 
 class PredefinedFn:
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class is_null(Expr):
         expr: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.expr.to_python()} is None"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class tuple(Expr):
         items: Sequence[Expr]
 
-        def to_python(self):
+        def _to_python(self):
             if len(self.items) == 1:
                 return f"({self.items[0].to_python()},)"
             return f"({', '.join([item.to_python() for item in self.items])})"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class set(Expr):
         items: Sequence[Expr]
 
-        def to_python(self):
+        def _to_python(self):
             return f"{{{', '.join([item.to_python() for item in self.items])}}}"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class list(Expr):
         items: Sequence[Expr]
 
-        def to_python(self):
+        def _to_python(self):
             return f"[{', '.join([item.to_python() for item in self.items])}]"
 
-        def to_typescript(self):
+        def _to_typescript(self):
             return f"[{', '.join([item.to_typescript() for item in self.items])}]"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class dict(Expr):
         items: Sequence[tuple[Expr, Expr]]
 
-        def to_python(self):
+        def _to_python(self):
             return (
                 "{"
                 + ", ".join(
@@ -347,7 +439,7 @@ class PredefinedFn:
                 + "}"
             )
 
-        def to_typescript(self):
+        def _to_typescript(self):
             return (
                 "{"
                 + ", ".join(
@@ -359,54 +451,54 @@ class PredefinedFn:
                 + "}"
             )
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class attr_getter(Expr):
         collection: Expr
         attr: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.collection.to_python()}.{self.attr.to_python()}"
 
-        def to_typescript(self):
+        def _to_typescript(self):
             return f"{self.collection.to_typescript()}.{self.attr.to_typescript()}"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class attr_setter(Expr):
         collection: Expr
         attr: Expr
         value: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.collection.to_python()}.{self.attr.to_python()} = {self.value.to_python()}"
 
-        def to_typescript(self):
+        def _to_typescript(self):
             return f"{self.collection.to_typescript()}.{self.attr.to_typescript()} = {self.value.to_typescript()};"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class item_getter(Expr):
         collection: Expr
         item: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.collection.to_python()}[{self.item.to_python()}]"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class item_setter(Expr):
         collection: Expr
         item: Expr
         value: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.collection.to_python()}[{self.item.to_python()}] = {self.value.to_python()}"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class len(Expr):
         collection: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"len({self.collection.to_python()})"
 
-    @dataclass(init=False)
+    @dataclass(init=False, slots=True, eq=False)
     class map_list(Expr):
         collection: Expr
         func: Expr
@@ -418,81 +510,162 @@ class PredefinedFn:
             func: Callable[[ExprIdent], Expr],
             filter: Optional[Callable[[ExprIdent], Expr]] = None,
         ):
+            self._render_cache = None
+            self._hash = None
             self.collection = collection
             self.func = func(ExprIdent("_x"))
             self.filter = filter(ExprIdent("_x")) if filter is not None else None
 
-        def to_python(self):
+        def _to_python(self):
             if self.filter is not None:
                 return f"[{self.func.to_python()} for _x in {self.collection.to_python()} if {self.filter.to_python()}]"
             return f"[{self.func.to_python()} for _x in {self.collection.to_python()}]"
 
-        def to_typescript(self):
+        def _to_typescript(self):
             if self.filter is not None:
                 return f"{self.collection.to_typescript()}.filter((_x: any) => {self.filter.to_typescript()}).map((_x: any) => {self.func.to_typescript()})"
             return f"{self.collection.to_typescript()}.map((_x: any) => {self.func.to_typescript()})"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class range(Expr):
         start: Expr
         end: Expr
         step: Optional[Expr] = None
 
-        def to_python(self):
+        def _to_python(self):
             if self.step is not None:
                 return f"range({self.start.to_python()}, {self.end.to_python()}, {self.step.to_python()})"
             return f"range({self.start.to_python()}, {self.end.to_python()})"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class set_contains(Expr):
         set_: Expr
         item: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.item.to_wrapped_python()} in {self.set_.to_wrapped_python()}"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class list_append(Expr):
         lst: Expr
         item: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.lst.to_wrapped_python()}.append({self.item.to_python()})"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class has_item(Expr):
         collection: Expr
         item: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.item.to_wrapped_python()} in {self.collection.to_wrapped_python()}"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class not_has_item(Expr):
         collection: Expr
         item: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.item.to_wrapped_python()} not in {self.collection.to_wrapped_python()}"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class base_error(ExceptionExpr):
         msg: str
 
-        def to_python(self):
+        def _to_python(self):
             return f"Exception('{self.msg}')"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class key_error(ExceptionExpr):
         msg: str
 
-        def to_python(self):
+        def _to_python(self):
             return f"KeyError('{self.msg}')"
 
-    @dataclass
+    @dataclass(slots=True, eq=False)
     class keyword_assignment(Expr):
         keyword: str
         value: Expr
 
-        def to_python(self):
+        def _to_python(self):
             return f"{self.keyword}={self.value.to_python()}"
+
+
+ExprT = TypeVar("ExprT", bound=Expr)
+
+
+class ExprPool:
+    """A pool of interned expressions: structurally equal expressions are represented by a single shared instance,
+    so that they can be compared by identity and do not take extra memory.
+
+    Interned expressions are shared, hence they must not be modified after interning.
+    """
+
+    __slots__ = ("exprs", "render_cache")
+
+    def __init__(self, render_cache: bool = False):
+        # mapping from an expression to its interned instance (which is structurally equal to it)
+        self.exprs: dict[Expr, Expr] = {}
+        # whether to cache the rendered code of interned expressions (see `Expr.to_python`)
+        self.render_cache = render_cache
+
+    def __len__(self):
+        return len(self.exprs)
+
+    def __getstate__(self):
+        # hashes of the interned expressions differ between processes, so the pool is rebuilt when loading
+        return list(self.exprs.values()), self.render_cache
+
+    def __setstate__(self, state: tuple[list[Expr], bool]):
+        exprs, render_cache = state
+        self.exprs = {}
+        self.render_cache = render_cache
+        # sub-expressions are always interned before their parents, so they are in the pool before they are needed
+        for expr in exprs:
+            self.intern(expr)
+
+    def intern(self, expr: ExprT) -> ExprT:
+        """Get the interned instance of the given expression. If the expression is not in the pool yet, its
+        sub-expressions are replaced by their interned instances and the expression is added to the pool.
+        """
+        if expr._hash is not None:
+            # the expression is interned, by this pool or another one, so it is found in O(1)
+            interned = self.exprs.get(expr)
+            if interned is not None:
+                return interned  # type: ignore
+
+        # the sub-expressions are interned first, so that hashing the expression only hashes its own fields
+        for f in dataclass_fields(expr):
+            if not f.compare:
+                continue
+            value = getattr(expr, f.name)
+            new_value = self._intern_value(value)
+            if new_value is not value:
+                setattr(expr, f.name, new_value)
+
+        expr._hash = hash((expr.__class__, structural_fields(expr)))
+        interned = self.exprs.get(expr)
+        if interned is not None:
+            # the expression is not interned, so its hash must not be cached
+            expr._hash = None
+            return interned  # type: ignore
+        self.exprs[expr] = expr
+        if self.render_cache:
+            expr._render_cache = {}
+        return expr
+
+    def _intern_value(self, value: Any) -> Any:
+        """Intern the expressions in a value of an expression's field, returning the (possibly replaced) value"""
+        if isinstance(value, Expr):
+            return self.intern(value)
+        if isinstance(value, (list, tuple)):
+            items = []
+            changed = False
+            for item in value:
+                new_item = self._intern_value(item)
+                changed = changed or new_item is not item
+                items.append(new_item)
+            if changed:
+                value = value.__class__(items)
+        return value
@@ -0,0 +1,1073 @@
+"""Optimization passes over programs, which make the generated code faster to run.
+
+The passes modify the program in place and should be run after the program is built and before it is rendered.
+Frozen ASTs are never modified.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Collection, Iterable, Iterator, Optional
+
+from codegen.models.ast import AST, NEW_AST_ID
+from codegen.models.expr import (
+    Expr,
+    ExprConstant,
+    ExprDivision,
+    ExprEqual,
+    ExprIdent,
+    ExprIs,
+    ExprLessThanOrEqual,
+    ExprLogicalAnd,
+    ExprLogicalOr,
+    ExprNegation,
+    ExprNotEqual,
+    ExprRawPython,
+    ExprRawTypescript,
+    ExprTernary,
+    ExprVar,
+    PredefinedFn,
+)
+from codegen.models.program import Program, VarRegister
+from codegen.models.statement import (
+    AssertionStatement,
+    AssignStatement,
+    BlockStatement,
+    BreakStatement,
+    Comment,
+    ContinueStatement,
+    DefClassLikeStatement,
+    DefClassStatement,
+    DefFuncStatement,
+    ElseStatement,
+    ExceptionStatement,
+    ForLoopStatement,
+    IfStatement,
+    ImportBlockStatement,
+    ImportStatement,
+    LineBreak,
+    NoStatement,
+    PythonStatement,
+    ReturnStatement,
+    SingleExprStatement,
+    Statement,
+    TypescriptStatement,
+)
+from codegen.models.structural import (
+    ClassKinds,
+    compare_fields,
+    copy_with,
+    iter_pre_order,
+)
+from codegen.models.var import Var, VarScope
+from codegen.models.visitor import SKIP, ASTVisitor, visit
+
+# expressions that are pure by default: evaluating them has no side effects and their values only change when
+# the variables they read are reassigned, or the objects they read are modified
+DEFAULT_PURE_EXPRS: frozenset[type[Expr]] = frozenset(
+    {
+        ExprConstant,
+        ExprIdent,
+        ExprVar,
+        ExprEqual,
+        ExprNotEqual,
+        ExprLessThanOrEqual,
+        ExprIs,
+        ExprNegation,
+        ExprLogicalAnd,
+        ExprLogicalOr,
+        ExprDivision,
+        ExprTernary,
+        PredefinedFn.is_null,
+        PredefinedFn.tuple,
+        PredefinedFn.range,
+        PredefinedFn.keyword_assignment,
+        PredefinedFn.attr_getter,
+        PredefinedFn.item_getter,
+        PredefinedFn.len,
+        PredefinedFn.has_item,
+        PredefinedFn.not_has_item,
+        PredefinedFn.set_contains,
+    }
+)
+
+# pure expressions that only combine the values of their sub-expressions, other pure expressions may read
+# the content of objects, which is changed by setters and impure expressions (e.g., function calls)
+_VALUE_EXPRS = (
+    ExprEqual,
+    ExprNotEqual,
+    ExprLessThanOrEqual,
+    ExprIs,
+    ExprNegation,
+    ExprDivision,
+    PredefinedFn.is_null,
+    PredefinedFn.tuple,
+    PredefinedFn.range,
+)
+# expressions that never raise exceptions if their sub-expressions do not, only they are moved out of loops
+# as the loops may have no iteration
+_NON_RAISING_EXPRS = frozenset(
+    {
+        ExprConstant,
+        ExprIdent,
+        ExprVar,
+        ExprEqual,
+        ExprNotEqual,
+        ExprIs,
+        ExprNegation,
+        ExprLogicalAnd,
+        ExprLogicalOr,
+        ExprTernary,
+        PredefinedFn.is_null,
+        PredefinedFn.tuple,
+        PredefinedFn.keyword_assignment,
+    }
+)
+_OBJECT_READ_EXPRS = (
+    PredefinedFn.item_getter,
+    PredefinedFn.len,
+    PredefinedFn.has_item,
+    PredefinedFn.not_has_item,
+    PredefinedFn.set_contains,
+)
+# fields of statements that are evaluated when the statements are executed
+_EVALUATED_FIELDS: dict[type[Statement], tuple[str, ...]] = {
+    AssignStatement: ("expr",),
+    SingleExprStatement: ("expr",),
+    ReturnStatement: ("expr",),
+    IfStatement: ("cond",),
+    ForLoopStatement: ("iter",),
+    AssertionStatement: ("expr",),
+    ExceptionStatement: ("expr",),
+}
+_CLASS_STATEMENTS = (DefClassStatement, DefClassLikeStatement)
+# statements that leave the block that contains them
+_EXIT_STATEMENTS = (
+    ReturnStatement,
+    ExceptionStatement,
+    ContinueStatement,
+    BreakStatement,
+)
+# fields of statements whose values are only tested for truthiness
+_CONDITION_FIELDS: dict[type[Statement], str] = {
+    IfStatement: "cond",
+    AssertionStatement: "expr",
+}
+# comparisons that are evaluated if their operands are constants
+_COMPARISON_EXPRS = {ExprEqual, ExprNotEqual, ExprIs, PredefinedFn.is_null}
+# statements that do not execute anything
+_PLACEHOLDER_STATEMENTS = (NoStatement, Comment, LineBreak)
+
+
+def eliminate_common_subexprs(
+    program: Program,
+    pure: Collection[type[Expr]] = DEFAULT_PURE_EXPRS,
+    hoist_loop_invariants: bool = True,
+) -> int:
+    """Store pure expressions that are evaluated more than once in temporary variables, and return the number
+    of temporary variables created. The optimization is done inside functions only.
+
+    - common subexpressions: an expression that is evaluated more than once in statements of a block, without
+      its variables being reassigned in between, is assigned to a temporary variable before its first use.
+    - loop-invariant expressions: an expression in the body of a for-loop whose variables are not assigned in
+      the loop is assigned to a temporary variable before the loop.
+
+    Args:
+        program: the program to optimize
+        pure: classes of expressions that are pure, an expression is optimized only if it and all of its
+            sub-expressions are pure. See `DEFAULT_PURE_EXPRS`.
+        hoist_loop_invariants: whether to move loop-invariant expressions out of for-loops. As they are evaluated
+            even if the loop has no iteration, only expressions that cannot raise exceptions are moved (e.g., not
+            divisions, attribute or item reads).
+    """
+    return _CommonSubexprEliminator(program, frozenset(pure)).run(hoist_loop_invariants)
+
+
+def fold_constants(program: Program) -> int:
+    """Evaluate constant expressions and remove unreachable statements, return the number of statements that
+    are simplified or removed.
+
+    - expressions: negations, logical and/or, ternaries, equalities and null checks of constants are evaluated,
+      and constant terms that do not change the result of logical and/or are removed.
+    - if-statements with constant conditions are replaced by the body of the branch that is taken (or removed if
+      there is none). The body is kept in a block so that the scopes of its variables do not change.
+    - statements after return, raise, continue and break statements in the same block are removed.
+    - assertions of constants that are true and `NoStatement` placeholders in blocks with other statements
+      are removed.
+
+    Only constants that have the same truthiness in Python and Typescript are folded: booleans, None, numbers
+    and strings. Frozen ASTs are never modified.
+    """
+    return _ConstantFolder(program).run()
+
+
+@dataclass(slots=True)
+class _ExprInfo:
+    expr: Expr
+    is_pure: bool
+    # whether the expression is pure and worth storing in a temporary variable
+    is_candidate: bool
+    # names of variables (or identifiers) that the expression reads
+    names: frozenset[str]
+    # whether the expression reads the content of objects (e.g., attributes, items)
+    reads_objects: bool
+    # whether evaluating the expression may modify objects (e.g., setters, function calls) or variables (raw code)
+    modifies_objects: bool
+    modifies_all: bool
+    # sub-expressions that are evaluated every time the expression is evaluated
+    children: tuple[Expr, ...]
+    # whether the expression or its unconditional sub-expressions are candidates
+    has_candidates: bool
+    # whether evaluating the expression may raise an exception (e.g., division by zero, missing attributes)
+    may_raise: bool
+    # key of the expression in dictionaries, created when it is needed (see `_CommonSubexprEliminator.get_key`)
+    key: Optional[_ExprKey] = None
+
+
+class _ExprKey:
+    """Key of an expression in dictionaries. Hashes of expressions that are not interned are not cached, so the
+    hash is computed once and stored in the key instead of hashing the expression for every lookup."""
+
+    __slots__ = ("expr", "hash")
+
+    def __init__(self, expr: Expr):
+        self.expr = expr
+        self.hash = hash(expr)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other: _ExprKey):
+        return self.hash == other.hash and self.expr == other.expr
+
+
+@dataclass(slots=True)
+class _Kills:
+    """Variables that are assigned and objects that are modified by statements"""
+
+    names: set[str] = field(default_factory=set)
+    # whether the content of any object may be modified (we do not track aliases of objects)
+    objects: bool = False
+    # whether every expression may be affected (e.g., raw statements)
+    all: bool = False
+
+    def affects(self, info: _ExprInfo) -> bool:
+        return (
+            self.all
+            or (self.objects and info.reads_objects)
+            or not self.names.isdisjoint(info.names)
+        )
+
+    def update(self, other: _Kills):
+        self.names.update(other.names)
+        self.objects = self.objects or other.objects
+        self.all = self.all or other.all
+
+    def is_empty(self) -> bool:
+        return not self.all and not self.objects and len(self.names) == 0
+
+
+class _CommonSubexprEliminator:
+    def __init__(self, program: Program, pure: frozenset[type[Expr]]):
+        self.program = program
+        self.pure = pure
+        self.infos: dict[int, _ExprInfo] = {}
+        # kills of statements and subtrees by their ids, the objects are kept so that their ids are not reused
+        self.kills: dict[int, tuple[Statement, _Kills]] = {}
+        self.subtree_kills: dict[int, tuple[AST, _Kills]] = {}
+        self.candidates: dict[int, tuple[Statement, list[Expr]]] = {}
+        # temporary variables and their assignments, which are registered once the ids of ASTs are updated
+        self.temps: list[tuple[Var, AST]] = []
+        # identifiers of temporary variables by the ids of their assignments
+        self.temp_idents: dict[int, ExprIdent] = {}
+
+    def run(self, hoist_loop_invariants: bool) -> int:
+        bodies = [
+            ast
+            for ast in iter_pre_order(self.program.root)
+            if isinstance(ast.stmt, DefFuncStatement) and not ast._is_frozen
+        ]
+        if hoist_loop_invariants:
+            for body in bodies:
+                # outer loops first so that expressions are moved out of as many loops as possible
+                for ast in _iter_function_asts(body):
+                    if isinstance(ast.stmt, ForLoopStatement) and not ast._is_frozen:
+                        while self.hoist_loop_invariants(ast):
+                            pass
+        for body in bodies:
+            for ast in _iter_function_asts(body):
+                if not ast._is_frozen:
+                    while self.eliminate_in_block(ast):
+                        pass
+
+        if len(self.temps) > 0:
+            self.program.update_ast_ids()
+            for var, ast in self.temps:
+                var.scope = VarScope.from_ast_id(ast.id)
+                self.program.vars.add_register(
+                    VarRegister(var.register_id, var.name, var.key, var.scope)
+                )
+        return len(self.temps)
+
+    def eliminate_in_block(self, block: AST) -> bool:
+        """Replace the common subexpressions of the statements of the block, return whether another round is
+        needed"""
+        # expression -> [index of the first statement, index of the last statement, number of occurrences]
+        active: dict[_ExprKey, list[int]] = {}
+        groups: list[tuple[_ExprKey, int, int]] = []
+
+        def close(key: _ExprKey):
+            first, last, count = active.pop(key)
+            if count > 1:
+                groups.append((key, first, last))
+
+        for i, child in enumerate(block.children):
+            if not child._is_frozen:
+                for expr in self.get_candidates(child.stmt):
+                    key = self.get_key(expr)
+                    group = active.get(key)
+                    if group is None:
+                        active[key] = [i, i, 1]
+                    else:
+                        group[1] = i
+                        group[2] += 1
+
+            kills = self.get_subtree_kills(child)
+            if not kills.is_empty():
+                for key in [
+                    key for key in active if kills.affects(self.infos[id(key.expr)])
+                ]:
+                    close(key)
+        for key in list(active):
+            close(key)
+
+        outermost = self.keep_outermost(groups)
+        if len(outermost) == 0:
+            return False
+
+        children = list(block.children)
+        replacements: list[dict[_ExprKey, Expr]] = [{} for _ in children]
+        # insert from the last position so that the positions of the previous groups do not change
+        for key, first, last in sorted(outermost, key=lambda g: g[1], reverse=True):
+            expr = key.expr
+            index = _index_of(block.children, children[first])
+            # reuse a temporary variable that is assigned the expression (e.g., by hoisting loop invariants)
+            # instead of creating a copy of it
+            temp = next(
+                (
+                    i
+                    for i in range(first, last + 1)
+                    if id(children[i]) in self.temp_idents
+                    and children[i].stmt.expr == expr
+                ),
+                None,
+            )
+            if temp is None:
+                ident = self.insert_temp(block, index, expr)
+            else:
+                ident = self.temp_idents[id(children[temp])]
+                if temp != first:
+                    del block.children[_index_of(block.children, children[temp])]
+                    block.children.insert(index, children[temp])
+                    block.mark_dirty()
+            for i in range(first, last + 1):
+                if i != temp:
+                    replacements[i][key] = ident
+        for child, replacement in zip(children, replacements):
+            if len(replacement) > 0:
+                self.replace_in_stmt(child, replacement)
+        # the sub-expressions of the replaced expressions may still be common
+        return len(outermost) < len(groups)
+
+    def hoist_loop_invariants(self, loop: AST) -> bool:
+        """Move the loop-invariant expressions in the body of the loop out of the loop, return whether another
+        round is needed"""
+        parent = loop.parent
+        assert parent is not None
+        if parent._is_frozen:
+            return False
+
+        kills = self.get_subtree_kills(loop)
+        if kills.all:
+            return False
+
+        invariants: dict[_ExprKey, None] = {}
+        # statements in the body that are evaluated in every iteration (including the bodies of nested loops)
+        stack = list(reversed(loop.children))
+        while len(stack) > 0:
+            ast = stack.pop()
+            if ast._is_frozen:
+                continue
+            for expr in self.get_candidates(ast.stmt):
+                info = self.infos[id(expr)]
+                # expressions that may raise (e.g., division by zero) are only evaluated if the loop has an iteration
+                if not info.may_raise and not kills.affects(info):
+                    invariants[self.get_key(expr)] = None
+            if isinstance(ast.stmt, ForLoopStatement):
+                stack.extend(reversed(ast.children))
+
+        outermost = self.keep_outermost([(key, 0, 0) for key in invariants])
+        if len(outermost) == 0:
+            return False
+
+        replacement = {}
+        for key, _, _ in outermost:
+            replacement[key] = self.insert_temp(
+                parent, _index_of(parent.children, loop), key.expr
+            )
+        for ast in _iter_function_asts(loop):
+            if ast is not loop and not ast._is_frozen:
+                self.replace_in_stmt(ast, replacement)
+        # the sub-expressions of the hoisted expressions may still be invariants of the loop
+        return len(outermost) < len(invariants)
+
+    def keep_outermost(
+        self, groups: list[tuple[_ExprKey, int, int]]
+    ) -> list[tuple[_ExprKey, int, int]]:
+        """Remove groups of expressions that are sub-expressions of other groups, they are replaced in the next
+        round, after the expressions that contain them are replaced"""
+        inner = set()
+        for key, _, _ in groups:
+            for child in self.infos[id(key.expr)].children:
+                for subexpr in self.iter_candidates_in_expr(child):
+                    inner.add(self.get_key(subexpr))
+        return [group for group in groups if group[0] not in inner]
+
+    def insert_temp(self, block: AST, index: int, expr: Expr) -> ExprIdent:
+        """Insert an assignment of the expression to a new temporary variable at the given position of the block,
+        return the identifier of the variable"""
+        register_id = len(self.program.vars.registers) + len(self.temps)
+        var = Var(
+            name="tmp",
+            key=("tmp", register_id),
+            register_id=register_id,
+            scope=VarScope(NEW_AST_ID, 0),
+        )
+        ast = AST(NEW_AST_ID, self.program, AssignStatement(var, expr), parent=block)
+        if block._render_cache is not None:
+            ast._render_cache = {}
+        block.children.insert(index, ast)
+        block.mark_dirty()
+        self.temps.append((var, ast))
+        ident = self.temp_idents[id(ast)] = ExprIdent(var.get_name())
+
+        # the block and its ancestors assign one more variable
+        parent = block
+        while parent is not None:
+            self.subtree_kills.pop(id(parent), None)
+            parent = parent.parent
+        return ident
+
+    def replace_in_stmt(self, ast: AST, replacement: dict[_ExprKey, Expr]):
+        """Replace the candidates of the statement of the AST (see `get_candidates`) by their replacements"""
+        stmt = ast.stmt
+        # other occurrences of the expressions (e.g., after a function call) are not replaced
+        targets = {}
+        for expr in self.get_candidates(stmt):
+            new_expr = replacement.get(self.get_key(expr))
+            if new_expr is not None:
+                targets[id(expr)] = new_expr
+        if len(targets) == 0:
+            return
+
+        changes = {}
+        for name in _EVALUATED_FIELDS.get(stmt.__class__, ()):
+            value = getattr(stmt, name)
+            new_value = _replace_in_value(value, targets)
+            if new_value is not value:
+                changes[name] = new_value
+        if len(changes) > 0:
+            # statements and expressions are copied as they may be shared
+            ast.stmt = copy_with(stmt, changes)
+            ast.mark_dirty()
+
+    def get_candidates(self, stmt: Statement) -> list[Expr]:
+        """Get pure, non-trivial expressions that are evaluated every time the statement is executed.
+
+        Expressions are visited in the order of evaluation, those that may be affected by evaluating other
+        parts of the statement (e.g., reading an object after calling a function) are skipped.
+        """
+        item = self.candidates.get(id(stmt))
+        if item is not None:
+            return item[1]
+
+        candidates = []
+        # ids of the candidates that are skipped, as the same object may occur more than once
+        skipped = set()
+        modified_objects = False
+        modified_all = False
+        for name in _EVALUATED_FIELDS.get(stmt.__class__, ()):
+            for expr in _iter_exprs(getattr(stmt, name)):
+                info = self.get_info(expr)
+                if not info.has_candidates:
+                    modified_objects = modified_objects or info.modifies_objects
+                    modified_all = modified_all or info.modifies_all
+                    continue
+                stack = [(expr, False)]
+                while len(stack) > 0:
+                    expr, visited = stack.pop()
+                    info = self.get_info(expr)
+                    if visited:
+                        modified_objects = modified_objects or info.modifies_objects
+                        modified_all = modified_all or info.modifies_all
+                        continue
+                    if info.is_candidate:
+                        if modified_all or (modified_objects and info.reads_objects):
+                            skipped.add(id(expr))
+                        else:
+                            candidates.append(expr)
+                    elif _expr_kinds[expr.__class__] == _SETTER_EXPR and any(
+                        self.infos[id(child)].modifies_objects
+                        for child in info.children
+                    ):
+                        # the value is evaluated before the object in Python, but after it in Typescript
+                        modified_objects = True
+                        modified_all = modified_all or info.modifies_all
+                    stack.append((expr, True))
+                    stack.extend((child, False) for child in reversed(info.children))
+
+        if len(skipped) > 0:
+            candidates = [expr for expr in candidates if id(expr) not in skipped]
+        self.candidates[id(stmt)] = (stmt, candidates)
+        return candidates
+
+    def iter_candidates_in_expr(self, expr: Expr) -> Iterator[Expr]:
+        stack = [expr]
+        while len(stack) > 0:
+            expr = stack.pop()
+            info = self.get_info(expr)
+            if info.is_candidate:
+                yield expr
+            if info.has_candidates:
+                stack.extend(reversed(info.children))
+
+    def get_key(self, expr: Expr) -> _ExprKey:
+        info = self.infos.get(id(expr)) or self.get_info(expr)
+        key = info.key
+        if key is None:
+            key = info.key = _ExprKey(expr)
+        return key
+
+    def get_info(self, expr: Expr) -> _ExprInfo:
+        info = self.infos.get(id(expr))
+        if info is not None:
+            return info
+
+        cls = expr.__class__
+        kind = _expr_kinds[cls]
+        is_pure = cls in self.pure
+        reads_objects = kind in (_OBJECT_READ_EXPR, _ATTR_GETTER_EXPR) or (
+            is_pure and kind == _OTHER_EXPR
+        )
+        modifies_objects = not is_pure
+        modifies_all = kind == _RAW_EXPR
+        may_raise = cls not in _NON_RAISING_EXPRS
+        has_candidates = False
+        if kind == _IDENT_EXPR:
+            names = frozenset((expr.ident,))
+        elif kind == _VAR_EXPR:
+            names = frozenset((expr.var.get_name(),))
+        else:
+            names = _NO_NAMES
+
+        children = []
+        for name in compare_fields(cls):
+            for child in _iter_exprs(getattr(expr, name)):
+                child_info = self.infos.get(id(child)) or self.get_info(child)
+                children.append(child)
+                if not child_info.is_pure:
+                    is_pure = False
+                    modifies_objects = True
+                    modifies_all = modifies_all or child_info.modifies_all
+                reads_objects = reads_objects or child_info.reads_objects
+                may_raise = may_raise or child_info.may_raise
+                has_candidates = has_candidates or child_info.has_candidates
+                if name != "attr" or kind != _ATTR_GETTER_EXPR:
+                    # the attribute of attr_getter is a name, not a variable
+                    names = names | child_info.names
+
+        if kind in (_SHORT_CIRCUIT_EXPR, _TERNARY_EXPR, _MAP_LIST_EXPR):
+            if kind == _SHORT_CIRCUIT_EXPR:
+                children = children[:1]
+            elif kind == _TERNARY_EXPR:
+                children = [expr.condition]
+            else:
+                # the function and the filter are evaluated for each item
+                children = [expr.collection]
+            has_candidates = any(
+                self.infos[id(child)].has_candidates for child in children
+            )
+
+        is_candidate = is_pure and kind not in _LEAF_EXPR_KINDS
+        info = self.infos[id(expr)] = _ExprInfo(
+            expr,
+            is_pure,
+            is_candidate,
+            names,
+            reads_objects,
+            modifies_objects,
+            modifies_all,
+            tuple(children),
+            is_candidate or has_candidates,
+            may_raise,
+        )
+        return info
+
+    def get_subtree_kills(self, ast: AST) -> _Kills:
+        """Get variables that are assigned and objects that are modified by the statements of the subtree when
+        it is executed. Bodies of functions and classes defined in the subtree are not executed."""
+        item = self.subtree_kills.get(id(ast))
+        if item is not None:
+            return item[1]
+
+        # compute the kills of the descendants first, without recursion as the tree may be deep
+        stack = [(ast, False)]
+        while len(stack) > 0:
+            node, visited = stack.pop()
+            if id(node) in self.subtree_kills:
+                continue
+            kills = self.get_kills(node.stmt)
+            if isinstance(node.stmt, (DefFuncStatement, *_CLASS_STATEMENTS)):
+                self.subtree_kills[id(node)] = (node, kills)
+            elif not visited and len(node.children) > 0:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children)
+            else:
+                subtree_kills = _Kills()
+                subtree_kills.update(kills)
+                for child in node.children:
+                    subtree_kills.update(self.subtree_kills[id(child)][1])
+                self.subtree_kills[id(node)] = (node, subtree_kills)
+        return self.subtree_kills[id(ast)][1]
+
+    def get_kills(self, stmt: Statement) -> _Kills:
+        """Get variables that are assigned and objects that are modified by the statement"""
+        item = self.kills.get(id(stmt))
+        if item is not None:
+            return item[1]
+
+        kills = _Kills()
+        self.kills[id(stmt)] = (stmt, kills)
+        if isinstance(stmt, (PythonStatement, TypescriptStatement)):
+            kills.all = True
+            return kills
+
+        if isinstance(stmt, AssignStatement):
+            if isinstance(stmt.var, Var):
+                kills.names.add(stmt.var.get_name())
+            else:
+                # the target is an expression, e.g., an attribute or an item of an object
+                info = self.get_info(stmt.var)
+                kills.names.update(info.names)
+                kills.objects = _expr_kinds[stmt.var.__class__] not in (
+                    _IDENT_EXPR,
+                    _VAR_EXPR,
+                )
+                kills.all = info.modifies_all
+        elif isinstance(stmt, ForLoopStatement):
+            kills.names.add(stmt.item.get_name())
+        elif isinstance(stmt, (DefFuncStatement, *_CLASS_STATEMENTS)):
+            kills.names.add(stmt.name)
+        elif isinstance(stmt, ImportStatement):
+            if stmt.alias is not None:
+                kills.names.add(stmt.alias)
+            elif stmt.is_import_attr:
+                kills.names.add(stmt.module.rsplit(".", 1)[-1])
+            else:
+                kills.names.add(stmt.module.split(".", 1)[0])
+        elif isinstance(stmt, ImportBlockStatement):
+            for module, attr, alias, _ in stmt.imports:
+                if alias is not None:
+                    kills.names.add(alias)
+                elif attr is not None:
+                    kills.names.add(attr)
+                else:
+                    kills.names.add(module.split(".", 1)[0])
+
+        for name in _EVALUATED_FIELDS.get(stmt.__class__, ()):
+            for expr in _iter_exprs(getattr(stmt, name)):
+                info = self.get_info(expr)
+                kills.objects = kills.objects or info.modifies_objects
+                kills.all = kills.all or info.modifies_all
+        return kills
+
+
+class _ConstantFolder(ASTVisitor):
+    # expressions are folded with the statements that contain them, as folding depends on how their values are used
+    visit_statements_only = True
+
+    def __init__(self, program: Program):
+        self.program = program
+        self.n_changes = 0
+        # whether ASTs have been removed, hence their ids need to be updated
+        self.has_removed_asts = False
+        # ids of blocks that become empty after their statements are removed
+        self.emptied_blocks: set[int] = set()
+
+    def run(self) -> int:
+        visit(self.program.root, self)
+        if self.has_removed_asts:
+            self.program.update_ast_ids()
+        return self.n_changes
+
+    def visit_AST(self, ast: AST):
+        if ast._is_frozen:
+            return SKIP
+        self.fold_stmt(ast)
+
+    def leave_AST(self, ast: AST):
+        # children are simplified before their parents so that the parents know which children are left
+        if not ast._is_frozen:
+            self.simplify_children(ast)
+
+    def fold_stmt(self, ast: AST):
+        """Fold the expressions of the statement of the AST"""
+        stmt = ast.stmt
+        changes = {}
+        condition = _CONDITION_FIELDS.get(stmt.__class__)
+        for name in compare_fields(stmt.__class__):
+            value = getattr(stmt, name)
+            new_value = self.fold_value(value, name == condition)
+            if new_value is not value:
+                changes[name] = new_value
+        if len(changes) > 0:
+            ast.stmt = copy_with(stmt, changes)
+            ast.mark_dirty()
+            self.n_changes += 1
+
+    def fold_value(self, value: Any, is_condition: bool) -> Any:
+        cls = value.__class__
+        if cls is list or cls is tuple:
+            items = [self.fold_value(item, False) for item in value]
+            if any(new is not old for new, old in zip(items, value)):
+                return cls(items)
+        elif _expr_kinds[cls] != _NOT_EXPR:
+            return self.fold_expr(value, is_condition)
+        return value
+
+    def fold_expr(self, expr: Expr, is_condition: bool) -> Expr:
+        """Fold the expression, `is_condition` tells whether only the truthiness of its value is used"""
+        kind = _expr_kinds[expr.__class__]
+        if kind == _SHORT_CIRCUIT_EXPR:
+            return self.fold_logical(expr, is_condition)
+
+        if kind == _TERNARY_EXPR:
+            condition = self.fold_expr(expr.condition, True)
+            truthiness = _get_truthiness(condition)
+            if truthiness is not None:
+                return self.fold_expr(
+                    expr.true_expr if truthiness else expr.false_expr, is_condition
+                )
+            changes = {"condition": condition}
+            changes["true_expr"] = self.fold_expr(expr.true_expr, is_condition)
+            changes["false_expr"] = self.fold_expr(expr.false_expr, is_condition)
+        elif expr.__class__ is ExprNegation:
+            operand = self.fold_expr(expr.expr, True)
+            truthiness = _get_truthiness(operand)
+            if truthiness is not None:
+                return ExprConstant(not truthiness)
+            changes = {"expr": operand}
+        else:
+            changes = {}
+            for name in compare_fields(expr.__class__):
+                changes[name] = self.fold_value(getattr(expr, name), False)
+
+        if expr.__class__ in _COMPARISON_EXPRS:
+            folded = _fold_comparison(expr, changes)
+            if folded is not None:
+                return folded
+        changes = {
+            name: value
+            for name, value in changes.items()
+            if value is not getattr(expr, name)
+        }
+        if len(changes) == 0:
+            return expr
+        return copy_with(expr, changes)
+
+    def fold_logical(self, expr: Expr, is_condition: bool) -> Expr:
+        """Fold a logical and/or, which returns the value of the term that stops the evaluation"""
+        is_and = expr.__class__ is ExprLogicalAnd
+        terms = [self.fold_expr(term, is_condition) for term in expr.terms]
+        new_terms = []
+        for i, term in enumerate(terms):
+            truthiness = _get_truthiness(term)
+            if truthiness is None:
+                new_terms.append(term)
+            elif truthiness != is_and:
+                # the evaluation stops at this term
+                new_terms.append(term)
+                break
+            elif i == len(terms) - 1 and not is_condition:
+                # the value of the last term is returned if the evaluation does not stop before it
+                new_terms.append(term)
+
+        if len(new_terms) == 0:
+            # every term is true (and) or false (or)
+            return ExprConstant(is_and) if len(terms) > 0 else expr
+        if len(new_terms) == 1:
+            return new_terms[0]
+        if len(new_terms) == len(expr.terms) and all(
+            new is old for new, old in zip(new_terms, expr.terms)
+        ):
+            return expr
+        return copy_with(expr, {"terms": new_terms})
+
+    def simplify_children(self, ast: AST):
+        """Remove unreachable children of the AST and replace if-statements with constant conditions"""
+        old_children = ast.children
+        if len(old_children) == 0:
+            return
+        children = []
+        i = 0
+        while i < len(old_children):
+            child = old_children[i]
+            i += 1
+            if len(children) > 0 and _always_exits(children[-1]):
+                # unreachable
+                continue
+            if child._is_frozen:
+                children.append(child)
+                continue
+
+            stmt = child.stmt
+            if isinstance(stmt, IfStatement):
+                truthiness = _get_truthiness(stmt.cond)
+                else_ast = None
+                if i < len(old_children) and isinstance(
+                    old_children[i].stmt, ElseStatement
+                ):
+                    else_ast = old_children[i]
+                if truthiness is not None and (
+                    else_ast is None or not else_ast._is_frozen
+                ):
+                    if else_ast is not None:
+                        i += 1
+                    branch = child if truthiness else else_ast
+                    if branch is not None and not all(
+                        isinstance(c.stmt, NoStatement) for c in branch.children
+                    ):
+                        branch.stmt = BlockStatement()
+                        branch.mark_dirty()
+                        children.append(branch)
+                    continue
+            elif isinstance(stmt, AssertionStatement):
+                if _get_truthiness(stmt.expr) is True:
+                    continue
+            elif isinstance(stmt, BlockStatement):
+                if len(child.children) == 0 and id(child) in self.emptied_blocks:
+                    continue
+            children.append(child)
+
+        if not all(_is_placeholder(c) for c in children):
+            children = [c for c in children if not isinstance(c.stmt, NoStatement)]
+        if len(children) == len(old_children):
+            return
+
+        self.n_changes += len(old_children) - len(children)
+        if len(children) == 0 and not ast.is_root():
+            if isinstance(ast.stmt, BlockStatement):
+                self.emptied_blocks.add(id(ast))
+            else:
+                # bodies of statements cannot be empty
+                placeholder = AST(NEW_AST_ID, self.program, NoStatement(), parent=ast)
+                if ast._render_cache is not None:
+                    placeholder._render_cache = {}
+                children.append(placeholder)
+        ast.children[:] = children
+        ast.mark_dirty()
+        self.has_removed_asts = True
+
+
+# kinds of expressions that are handled differently by the pass
+_OTHER_EXPR = 0
+_NOT_EXPR = 1
+_IDENT_EXPR = 2
+_VAR_EXPR = 3
+_CONSTANT_EXPR = 4
+_RAW_EXPR = 5
+_VALUE_EXPR = 6
+_OBJECT_READ_EXPR = 7
+_ATTR_GETTER_EXPR = 8
+_SHORT_CIRCUIT_EXPR = 9
+_TERNARY_EXPR = 10
+_MAP_LIST_EXPR = 11
+_KEYWORD_EXPR = 12
+_SETTER_EXPR = 13
+
+# expressions that are not worth (or cannot be) stored in temporary variables
+_LEAF_EXPR_KINDS = (_IDENT_EXPR, _VAR_EXPR, _CONSTANT_EXPR, _RAW_EXPR, _KEYWORD_EXPR)
+_NOT_EXPR_TYPES = {str, int, float, bool, type(None)}
+_NO_NAMES: frozenset[str] = frozenset()
+
+
+def _get_expr_kind(cls: type) -> int:
+    """Get the kind of a class of expressions"""
+    if not issubclass(cls, Expr):
+        kind = _NOT_EXPR
+    elif issubclass(cls, ExprIdent):
+        kind = _IDENT_EXPR
+    elif issubclass(cls, ExprVar):
+        kind = _VAR_EXPR
+    elif issubclass(cls, ExprConstant):
+        kind = _CONSTANT_EXPR
+    elif issubclass(cls, (ExprRawPython, ExprRawTypescript)):
+        kind = _RAW_EXPR
+    elif issubclass(cls, (ExprLogicalAnd, ExprLogicalOr)):
+        kind = _SHORT_CIRCUIT_EXPR
+    elif issubclass(cls, ExprTernary):
+        kind = _TERNARY_EXPR
+    elif issubclass(cls, PredefinedFn.map_list):
+        kind = _MAP_LIST_EXPR
+    elif issubclass(cls, PredefinedFn.attr_getter):
+        kind = _ATTR_GETTER_EXPR
+    elif issubclass(cls, PredefinedFn.keyword_assignment):
+        kind = _KEYWORD_EXPR
+    elif issubclass(cls, (PredefinedFn.attr_setter, PredefinedFn.item_setter)):
+        kind = _SETTER_EXPR
+    elif issubclass(cls, _OBJECT_READ_EXPRS):
+        kind = _OBJECT_READ_EXPR
+    elif issubclass(cls, _VALUE_EXPRS):
+        kind = _VALUE_EXPR
+    else:
+        kind = _OTHER_EXPR
+    return kind
+
+
+_expr_kinds = ClassKinds(_get_expr_kind)
+
+
+def _get_truthiness(expr: Expr) -> Optional[bool]:
+    """Get the truthiness of a constant expression, None if it is unknown or differs between languages"""
+    if expr.__class__ is not ExprConstant or not _is_foldable(expr.constant):
+        return None
+    return bool(expr.constant)
+
+
+def _is_foldable(value: Any) -> bool:
+    cls = value.__class__
+    if cls is float:
+        # NaN is true in Python but false in Typescript
+        return value == value
+    # the string "undefined" is rendered as `undefined` in Typescript
+    return value is None or cls is bool or cls is int or (
+        cls is str and value != "undefined"
+    )
+
+
+def _fold_comparison(expr: Expr, fields: dict[str, Any]) -> Optional[Expr]:
+    """Evaluate comparisons of constants given the folded fields of the expression, None if it cannot be evaluated"""
+    cls = expr.__class__
+    if cls is PredefinedFn.is_null:
+        operand = fields["expr"]
+        if operand.__class__ is ExprConstant and _is_foldable(operand.constant):
+            return ExprConstant(operand.constant is None)
+        return None
+
+    left, right = fields["left"], fields["right"]
+    if left.__class__ is not ExprConstant or right.__class__ is not ExprConstant:
+        return None
+    lvalue, rvalue = left.constant, right.constant
+    if not _is_foldable(lvalue) or not _is_foldable(rvalue):
+        return None
+    if cls is ExprIs:
+        if lvalue is not None and rvalue is not None:
+            # identities of other objects are implementation details
+            return None
+        return ExprConstant(lvalue is rvalue)
+    if lvalue.__class__ is not rvalue.__class__ or lvalue.__class__ is float:
+        # e.g., 1 == 1.0 or 1 == True are true in Python but not in Typescript
+        return None
+    if cls is ExprEqual:
+        return ExprConstant(lvalue == rvalue)
+    return ExprConstant(lvalue != rvalue)
+
+
+def _is_placeholder(ast: AST) -> bool:
+    """Check if the AST does not execute anything (e.g., comments)"""
+    if isinstance(ast.stmt, BlockStatement):
+        return all(_is_placeholder(child) for child in ast.children)
+    return isinstance(ast.stmt, _PLACEHOLDER_STATEMENTS)
+
+
+def _always_exits(ast: AST) -> bool:
+    """Check if executing the AST always leaves the block that contains it"""
+    if isinstance(ast.stmt, _EXIT_STATEMENTS):
+        return True
+    if isinstance(ast.stmt, BlockStatement):
+        return any(_always_exits(child) for child in ast.children)
+    return False
+
+
+def _index_of(children: list[AST], ast: AST) -> int:
+    """Get the position of the AST among the children by identity, as different statements may be equal"""
+    return next(i for i, child in enumerate(children) if child is ast)
+
+
+def _iter_function_asts(root: AST) -> Iterator[AST]:
+    """Iterate over ASTs of the tree in pre-order, without entering functions and classes defined inside it"""
+    stack = [root]
+    while len(stack) > 0:
+        ast = stack.pop()
+        yield ast
+        if ast is root or not isinstance(
+            ast.stmt, (DefFuncStatement, *_CLASS_STATEMENTS)
+        ):
+            stack.extend(reversed(ast.children))
+
+
+def _iter_exprs(value: Any) -> Iterable[Expr]:
+    """Iterate over the expressions in a field's value"""
+    cls = value.__class__
+    if cls is list or cls is tuple:
+        if all(_expr_kinds[item.__class__] != _NOT_EXPR for item in value):
+            return value
+        return [expr for item in value for expr in _iter_exprs(item)]
+    if cls in _NOT_EXPR_TYPES or _expr_kinds[cls] == _NOT_EXPR:
+        return ()
+    return (value,)
+
+
+def _replace_in_value(value: Any, targets: dict[int, Expr]) -> Any:
+    """Replace expressions in a field's value by their replacements, which are given by the ids of the
+    expressions to replace"""
+    cls = value.__class__
+    if cls is list or cls is tuple:
+        items = [_replace_in_value(item, targets) for item in value]
+        if any(new is not old for new, old in zip(items, value)):
+            return cls(items)
+    elif _expr_kinds[cls] != _NOT_EXPR:
+        return _replace_in_expr(value, targets)
+    return value
+
+
+def _replace_in_expr(expr: Expr, targets: dict[int, Expr]) -> Expr:
+    new_expr = targets.get(id(expr))
+    if new_expr is not None:
+        return new_expr
+
+    changes = {}
+    kind = _expr_kinds[expr.__class__]
+    if kind == _SHORT_CIRCUIT_EXPR:
+        if len(expr.terms) > 0:
+            first = _replace_in_expr(expr.terms[0], targets)
+            if first is not expr.terms[0]:
+                changes["terms"] = [first, *expr.terms[1:]]
+    elif kind == _TERNARY_EXPR:
+        condition = _replace_in_expr(expr.condition, targets)
+        if condition is not expr.condition:
+            changes["condition"] = condition
+    elif kind == _MAP_LIST_EXPR:
+        collection = _replace_in_expr(expr.collection, targets)
+        if collection is not expr.collection:
+            changes["collection"] = collection
+    else:
+        for name in compare_fields(expr.__class__):
+            value = getattr(expr, name)
+            new_value = _replace_in_value(value, targets)
+            if new_value is not value:
+                changes[name] = new_value
+
+    if len(changes) == 0:
+        return expr
+    return copy_with(expr, changes)
@@ -1,35 +1,403 @@
 from __future__ import annotations
 
-import ast
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Iterator, Literal, Optional, Sequence, TextIO
 
-from codegen.models.ast import AST
-from codegen.models.expr import ExprIdent  # You may need to adjust this import path
-from codegen.models.statement import BlockStatement, IfStatement
+from codegen.models.ast import AST, NEW_AST_ID
+from codegen.models.expr import Expr, ExprIdent, ExprPool, ExprT
+from codegen.models.statement import (
+    IMPORT_KEY,
+    BlockStatement,
+    DefFuncStatement,
+    ImportBlockStatement,
+    Statement,
+)
+from codegen.models.structural import ClassKinds, compare_fields
 from codegen.models.types import AST_ID, KEY
+from codegen.models.utils import map_in_processes, should_parallelize
 from codegen.models.var import Var, VarScope
 
+if TYPE_CHECKING:
+    from pathlib import Path
 
-@dataclass(init=False)
+    from codegen.models.build_cache import BuildCache
+    from codegen.models.writer import OutputWriter
+
+
+@dataclass(init=False, slots=True)
 class Program:
     root: AST
     vars: VarRegisters
     import_area: AST
+    # the AST of the imports in the import area (see `Program.import_`), created when the first import is added
+    import_block: Optional[AST]
     imported_modules: set[str]
+    # pool of interned expressions, use it to share structurally equal expressions
+    expr_pool: ExprPool
+    # indentation of a level of the rendered code
+    indent: str
+    # whether ASTs store only their indices and derive their ids from their parents
+    lazy_ids: bool
 
-    def __init__(self):
+    def __init__(
+        self,
+        render_cache: bool = False,
+        incremental_render: bool = False,
+        indent: str = "\t",
+        lazy_ids: bool = False,
+    ):
+        """
+        Args:
+            render_cache: whether to cache the rendered code of expressions interned by `Program.intern`
+            incremental_render: whether to cache the rendered code of every AST so that rendering the program
+                again only re-renders the ASTs that have been modified since (see `AST.mark_dirty`)
+            indent: indentation of a level of the rendered code, a tab or a number of spaces (e.g., "    "). Lines
+                of multi-line statements that are indented with tabs (e.g., docstrings) are re-indented with it.
+            lazy_ids: whether ASTs store only their indices among the children of their parents instead of their
+                full ids, which are computed from the parents when needed (see `AST.id`). It saves memory in deep
+                programs, while the ids of ASTs that hold variables are cached (see `AST.cache_id`).
+        """
+        if indent != "\t" and (indent == "" or indent.strip(" ") != ""):
+            raise ValueError(f"Indentation must be a tab or spaces, got {indent!r}")
+        self.indent = indent
+        self.lazy_ids = lazy_ids
         self.vars = VarRegisters(self)
         self.root = AST.root(self)
+        if incremental_render:
+            self.root._render_cache = {}
         self.import_area = self.root._add_stmt(BlockStatement(has_owned_env=False))
+        self.import_block = None
         self.imported_modules = set()
+        self.expr_pool = ExprPool(render_cache)
+
+    def __getstate__(self):
+        # ASTs are pickled before the root, descendants before their ancestors, so that pickle never recurses
+        # through the tree (ASTs are pickled without their parents, see `AST.__getstate__`)
+        asts = []
+        stack = [self.root]
+        while len(stack) > 0:
+            ast = stack.pop()
+            asts.append(ast)
+            stack.extend(ast.children)
+        asts.reverse()
+        return asts, {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: tuple[list[AST], dict[str, Any]]):
+        for name, value in state[1].items():
+            setattr(self, name, value)
+
+    def intern(self, expr: ExprT) -> ExprT:
+        """Get the shared instance of the given expression from the program's expression pool"""
+        return self.expr_pool.intern(expr)
+
+    def import_(
+        self,
+        module: str,
+        is_import_attr: bool,
+        alias: Optional[str] = None,
+        type_checking: bool = False,
+        lazy: bool = False,
+        at: Optional[AST] = None,
+        python_only: bool = False,
+    ):
+        """Import a module (e.g., `import a.b`) or an attribute of a module (e.g., `from a import b` when
+        is_import_attr is True) in the import area. Imports are deduplicated in constant time and rendered as a
+        canonical block, where the attributes of the same module are imported by a single line (see
+        `ImportBlockStatement`).
+
+        Args:
+            module: the dotted path of the module or the attribute
+            is_import_attr: whether the last part of the path is an attribute imported from its module
+            alias: name to import the module or the attribute as
+            type_checking: whether it is only needed for type checking (e.g., to avoid circular imports in python),
+                then it is imported in an `if TYPE_CHECKING:` block unless it is also imported normally
+            lazy: whether to import it lazily in python, so that importing the generated module does not load it
+                (e.g., a heavy library that is rarely used). It is imported at the start of the function that
+                contains `at` when the function is called. Typescript modules import it normally.
+            at: the AST that uses the lazily imported module or attribute, which must be in a function
+            python_only: whether it is only imported by python modules (e.g., `dataclasses.dataclass` for the
+                layouts of python classes), typescript modules skip it
+        """
+        if type_checking + lazy + python_only > 1:
+            raise ValueError(
+                "An import can only be one of lazy, only for type checking or only for python"
+            )
+        self.imported_modules.add(module)
+
+        if lazy:
+            func = at
+            while func is not None and not isinstance(func.stmt, DefFuncStatement):
+                func = func.parent
+            if func is None:
+                # module-level code is executed when the module is imported, the import cannot be deferred
+                raise ValueError(
+                    f"A lazy import of {module} must be used in a function, given by `at`"
+                )
+            func_stmt: DefFuncStatement = func.stmt  # type: ignore
+            if func_stmt.imports is None:
+                func_stmt.imports = ImportBlockStatement()
+            self._add_import(
+                func,
+                func_stmt.imports,
+                ImportBlockStatement.get_key(module, is_import_attr, alias),
+            )
+            # also added to the import area, where typescript modules import it
+
+        block = self.import_block
+        if block is None or block.parent is not self.import_area:
+            block = self.import_block = self._find_import_block()
+        self._add_import(
+            block,
+            block.stmt,  # type: ignore
+            ImportBlockStatement.get_key(
+                module,
+                is_import_attr,
+                alias,
+                "type_checking"
+                if type_checking
+                else "lazy"
+                if lazy
+                else "python"
+                if python_only
+                else "eager",
+            ),
+        )
+
+    def _add_import(self, ast: AST, block: ImportBlockStatement, key: IMPORT_KEY):
+        """Add an import to an import block, which is the statement of the AST or a part of it"""
+        if key not in block.imports:
+            if ast._is_frozen:
+                raise Exception("The AST is frozen and cannot be modified")
+            block.imports.add(key)
+            ast.mark_dirty()
+
+    def _find_import_block(self) -> AST:
+        """Find the AST of the imports in the import area (e.g., after the program is loaded from a snapshot),
+        creating it if it does not exist"""
+        for child in self.import_area.children:
+            if isinstance(child.stmt, ImportBlockStatement):
+                return child
+        return self.import_area._add_stmt(ImportBlockStatement())
+
+    def to_python(self, parallel: int = 1, cache: Optional[BuildCache] = None) -> str:
+        """Convert the program to python code.
+
+        Args:
+            parallel: number of processes to render top-level statements (e.g., classes and functions) concurrently.
+                The output is the same as rendering sequentially. Small programs are rendered sequentially, which
+                is faster (see `should_parallelize`).
+            cache: cache of the code of frozen top-level statements, only the statements that are not frozen or
+                not in the cache are rendered.
+        """
+        if cache is None and not self._should_parallelize(parallel):
+            return self.root.to_python()
+        return "\n".join(self._render_top_level_asts("python", parallel, cache))
+
+    def to_typescript(
+        self, parallel: int = 1, cache: Optional[BuildCache] = None
+    ) -> str:
+        """Convert the program to typescript code.
+
+        Args:
+            parallel: number of processes to render top-level statements (e.g., classes and functions) concurrently.
+                The output is the same as rendering sequentially. Small programs are rendered sequentially, which
+                is faster (see `should_parallelize`).
+            cache: cache of the code of frozen top-level statements, only the statements that are not frozen or
+                not in the cache are rendered.
+        """
+        if cache is None and not self._should_parallelize(parallel):
+            return self.root.to_typescript()
+        # the root block does not have leading empty lines (see AST.iter_typescript_lines)
+        return "\n".join(
+            self._render_top_level_asts("typescript", parallel, cache)
+        ).lstrip("\n")
+
+    def _should_parallelize(self, parallel: int) -> bool:
+        return len(self.root.children) > 1 and should_parallelize(
+            self.root.children, parallel
+        )
+
+    def _render_top_level_asts(
+        self,
+        lang: Literal["python", "typescript"],
+        parallel: int,
+        cache: Optional[BuildCache] = None,
+    ) -> list[str]:
+        """Render the children of the root AST, returning their code in order"""
+        if cache is not None:
+            return cache.render(
+                self.root.children,
+                lang,
+                lambda asts: self._render_asts(lang, [ast.id[0] for ast in asts], parallel),
+            )
+        return self._render_asts(lang, list(range(len(self.root.children))), parallel)
+
+    def _render_asts(
+        self, lang: Literal["python", "typescript"], indices: list[int], parallel: int
+    ) -> list[str]:
+        """Render the children of the root AST at the given indices, in a pool of processes if parallel > 1 and
+        they are large enough (see `should_parallelize`)"""
+        children = self.root.children
+        if len(indices) <= 1 or not should_parallelize(
+            (children[i] for i in indices), parallel
+        ):
+            if lang == "python":
+                return [children[i].to_python() for i in indices]
+            return [children[i].to_typescript() for i in indices]
+
+        return map_in_processes(
+            _render_top_level_ast,
+            [lang] * len(indices),
+            indices,
+            parallel=parallel,
+            initializer=_init_render_worker,
+            initargs=(self,),
+        )
+
+    def write_python(self, fp: TextIO):
+        """Stream the python code of the program to a file-like object"""
+        self.root.write_python(fp)
+
+    def write_typescript(self, fp: TextIO):
+        """Stream the typescript code of the program to a file-like object"""
+        self.root.write_typescript(fp)
+
+    def write_to_file(
+        self,
+        path: str | Path,
+        lang: Literal["python", "typescript"] = "python",
+        writer: Optional[OutputWriter] = None,
+    ) -> bool:
+        """Write the code of the program to a file, returning whether it has been written. The file is not
+        written if its content is unchanged, otherwise it is written atomically (see `codegen.models.writer`).
+
+        Args:
+            path: the file to write to
+            lang: the language to render the program to
+            writer: a writer to report the written and skipped files to (see `OutputWriter.report`)
+        """
+        # imported lazily as writing files is not needed to build and render programs
+        from codegen.models.writer import OutputWriter
+
+        code = self.to_python() if lang == "python" else self.to_typescript()
+        if writer is None:
+            writer = OutputWriter()
+        return writer.write(path, code)
 
-    def import_(self, module: str, is_import_attr: bool, alias: Optional[str] = None):
-        if module not in self.imported_modules:
-            self.import_area.import_(module, is_import_attr, alias)
-            self.imported_modules.add(module)
+    def dump(self, path: str | Path):
+        """Save the program to a snapshot file, which can be loaded back with `Program.load`"""
+        # imported lazily as snapshots are not needed to build and render programs
+        from codegen.models.snapshot import dump
+
+        dump(self, path)
+
+    @staticmethod
+    def load(path: str | Path) -> Program:
+        """Load a program from a snapshot file created by `Program.dump`. To load only some of the top-level
+        ASTs of the program, use `codegen.models.snapshot.ProgramSnapshot`."""
+        from codegen.models.snapshot import load
+
+        return load(path)
+
+    def update_ast_ids(self):
+        """Update the ids of ASTs and the scopes of variables after ASTs have been inserted, removed or moved by
+        modifying `AST.children` directly (e.g., by optimization passes), which is much faster than updating
+        them after every modification. Inserted ASTs must have `NEW_AST_ID` as their ids.
+
+        Variables whose scopes have been removed keep their names but cannot be found anymore.
+        """
+        # surviving ASTs by their ids before the update
+        old_asts: dict[AST_ID, AST] = {}
+        old_ids: dict[int, AST_ID] = {}
+        stack = [self.root]
+        while len(stack) > 0:
+            ast = stack.pop()
+            # lazy ids are still derived from the old parents and indices here
+            ast_id = ast.id
+            if ast_id != NEW_AST_ID:
+                old_asts[ast_id] = ast
+                old_ids[id(ast)] = ast_id
+            stack.extend(ast.children)
+
+        stack = [self.root]
+        while len(stack) > 0:
+            ast = stack.pop()
+            for i, child in enumerate(ast.children):
+                child._id = i if self.lazy_ids else ast._id + (i,)  # type: ignore
+                child.parent = ast
+            stack.extend(ast.children)
+
+        # mapping from the old indices of children of an AST (that are still its children) to their new indices
+        index_maps: dict[AST_ID, list[tuple[int, int]]] = {}
+
+        def map_index(ast: AST, old_id: AST_ID, index: int, at_child: bool) -> int:
+            if old_id not in index_maps:
+                index_maps[old_id] = [
+                    (old_ids[id(child)][-1], i)
+                    for i, child in enumerate(ast.children)
+                    if old_ids.get(id(child), NEW_AST_ID)[:-1] == old_id
+                ]
+            if at_child:
+                # the first remaining child at or after the old index
+                for old_index, new_index in index_maps[old_id]:
+                    if old_index >= index:
+                        return new_index
+                return len(ast.children)
+            # right after the last remaining child before the old index
+            position = 0
+            for old_index, new_index in index_maps[old_id]:
+                if old_index >= index:
+                    break
+                position = new_index + 1
+            return position
+
+        scopes: list[Optional[VarScope]] = []
+        for reg in self.vars.registers:
+            scope = reg.scope
+            ast = old_asts.get(scope.ast)
+            if ast is not None:
+                # a variable is either defined by a child (e.g., assignment) and visible from this child, or
+                # defined by the AST itself (e.g., function arguments) and visible from the start of its body
+                defining_child = old_asts.get(scope.ast + (scope.child_index_start,))
+                is_defined_by_child = defining_child is not None and any(
+                    var.register_id == reg.id for var in _iter_vars(defining_child.stmt)
+                )
+                scopes.append(
+                    VarScope(
+                        ast.id,
+                        map_index(
+                            ast, scope.ast, scope.child_index_start, is_defined_by_child
+                        ),
+                        (
+                            map_index(ast, scope.ast, scope.child_index_end, True)
+                            if scope.child_index_end is not None
+                            else None
+                        ),
+                    )
+                )
+                continue
+            # the AST of the scope has been removed, but the AST that defines the variable may have been moved
+            ast = old_asts.get(scope.ast + (scope.child_index_start,))
+            if ast is not None:
+                scopes.append(VarScope.from_ast_id(ast.id))
+            else:
+                scopes.append(None)
+        self.vars.update_scopes(scopes)
+
+        # variables in statements are copies of their registers' information
+        registers = self.vars.registers
+        stack = [self.root]
+        while len(stack) > 0:
+            ast = stack.pop()
+            for var in _iter_vars(ast.stmt):
+                if var.register_id < len(registers):
+                    reg = registers[var.register_id]
+                    if reg.name == var.name and reg.key == var.key:
+                        var.scope = reg.scope
+            stack.extend(ast.children)
 
     def get_ast_by_id(self, id: AST_ID) -> AST:
+        """Get the AST with the given id by following its path from the root"""
         ast = self.root
         for item in id:
             ast = ast.children[item]
@@ -70,6 +438,18 @@ class Program:
             type=type,
         )
 
+    def create_vars(
+        self,
+        parent: AST_ID,
+        vars: Sequence[tuple[str, KEY, int, Optional[str], Optional[ExprIdent]]],
+    ) -> list[Var]:
+        """Create variables assigned by children of the same AST at once, given their (name, key, index of the
+        child, force_name, type), see `VarRegisters.register_many`"""
+        return [
+            Var(reg.name, reg.key, reg.id, reg.scope, reg.force_name, reg.type)
+            for reg in self.vars.register_many(parent, vars)
+        ]
+
     def get_var(
         self,
         *,
@@ -85,7 +465,44 @@ class Program:
         )
 
 
-@dataclass
+# the program that a render worker process works on (see Program.to_python)
+_worker_program: Optional[Program] = None
+
+
+def _init_render_worker(program: Program):
+    global _worker_program
+    _worker_program = program
+
+
+def _render_top_level_ast(lang: Literal["python", "typescript"], index: int) -> str:
+    assert _worker_program is not None
+    ast = _worker_program.root.children[index]
+    if lang == "python":
+        return ast.to_python()
+    return ast.to_typescript()
+
+
+def _iter_vars(value: Any) -> Iterator[Var]:
+    """Iterate over variables in a statement or an expression"""
+    cls = value.__class__
+    if cls in _NO_VAR_TYPES:
+        return
+    if cls is list or cls is tuple:
+        for item in value:
+            yield from _iter_vars(item)
+    elif cls is Var:
+        yield value
+    elif _node_classes[cls]:
+        for name in compare_fields(cls):
+            yield from _iter_vars(getattr(value, name))
+
+
+_NO_VAR_TYPES = {str, int, float, bool, type(None)}
+# whether classes are statements or expressions
+_node_classes = ClassKinds(lambda cls: issubclass(cls, (Statement, Expr)))
+
+
+@dataclass(slots=True)
 class VarRegister:
     id: int
     name: str
@@ -95,11 +512,23 @@ class VarRegister:
     type: Optional[ExprIdent] = None
 
 
-@dataclass
+@dataclass(slots=True)
+class VarScopeNode:
+    """A node in the trie of variable scopes. The path from the root of the trie to a node is the
+    AST_ID of the AST that holds the variables (i.e., `VarScope.ast`)."""
+
+    children: dict[int, VarScopeNode] = field(default_factory=dict)
+    # mapping from key to the registers (in the order of registration) whose scope's ast is this node
+    key2registers: dict[KEY, list[int]] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
 class VarRegisters:
     program: Program
     registers: list[VarRegister] = field(default_factory=list)
     key2registers: dict[KEY, list[int]] = field(default_factory=dict)
+    # index of the registers by their scopes so that finding a register is proportional to the depth of the ast
+    scope_index: VarScopeNode = field(default_factory=VarScopeNode)
 
     def register(
         self,
@@ -131,61 +560,136 @@ class VarRegisters:
             force_name=force_name,
             type=type,
         )
-        self.registers.append(reg)
-        self.key2registers.setdefault(key, []).append(reg.id)
+        self.add_register(reg)
         return reg
 
+    def add_register(self, reg: VarRegister):
+        """Add a register (whose id is the next register id) without checking for conflicts, and index it"""
+        assert reg.id == len(self.registers)
+        self.registers.append(reg)
+        self.key2registers.setdefault(reg.key, []).append(reg.id)
+
+        node = self.scope_index
+        for i in reg.scope.ast:
+            if i not in node.children:
+                node.children[i] = VarScopeNode()
+            node = node.children[i]
+        node.key2registers.setdefault(reg.key, []).append(reg.id)
+
+    def update_scopes(self, scopes: list[Optional[VarScope]]):
+        """Update the scopes of the registers and rebuild the index. Registers without scopes (None) are kept so
+        that the ids of other registers do not change, but they are not indexed, hence cannot be found."""
+        registers = self.registers
+        self.registers = []
+        self.key2registers = {}
+        self.scope_index = VarScopeNode()
+        for reg, scope in zip(registers, scopes):
+            if scope is None:
+                self.registers.append(reg)
+                continue
+            reg.scope = scope
+            self.add_register(reg)
+
+    def register_many(
+        self,
+        parent: AST_ID,
+        vars: Sequence[tuple[str, KEY, int, Optional[str], Optional[ExprIdent]]],
+    ) -> list[VarRegister]:
+        """Register new variables assigned by children of the same AST at once, given their (name, key, index of
+        the child, force_name, type). It is the same as calling `register` for each of them, but the index of the
+        scopes is walked once, and nothing is registered if any of the variables conflicts with an existing one.
+        """
+        nodes = self._get_scope_nodes(parent, create=True)
+        key2registers = self.key2registers
+        new_keys = set()
+        for name, key, index, _, _ in vars:
+            if key in new_keys or (
+                key in key2registers
+                and self._find(nodes, key, parent + (index,)) is not None
+            ):
+                raise ValueError(
+                    f"Variable {name} with key {key} is already registered in the current scope"
+                )
+            new_keys.add(key)
+
+        registers = self.registers
+        node_registers = nodes[-1].key2registers
+        regs = [
+            VarRegister(id, name, key, VarScope(parent, index, None), force_name, type)
+            for id, (name, key, index, force_name, type) in enumerate(vars, len(registers))
+        ]
+        registers.extend(regs)
+        for reg in regs:
+            key2registers.setdefault(reg.key, []).append(reg.id)
+            node_registers.setdefault(reg.key, []).append(reg.id)
+        return regs
+
     def find(self, key: KEY, ast: AST_ID) -> Optional[VarRegister]:
         """Find the most specific register by name, key that is available in the given ast. If
         there are multiple matches, the most specific register is the one with the largest depth.
         """
-        if key not in self.key2registers:
+        if key not in self.key2registers or len(ast) == 0:
             return None
+        return self._find(self._get_scope_nodes(ast[:-1], create=False), key, ast)
 
-        matched_regid = None
-        matched_regid_depth = -1
-        for regid in self.key2registers[key]:
-            reg = self.registers[regid]
-            if self.program.is_within_scope(ast, reg.scope):
-                regscope_depth = reg.scope.get_depth()
-                if regscope_depth > matched_regid_depth:
-                    matched_regid = reg.id
-                    matched_regid_depth = regscope_depth
-
-        if matched_regid is None:
-            return None
-        return self.registers[matched_regid]
+    def _get_scope_nodes(self, ast: AST_ID, create: bool) -> list[VarScopeNode]:
+        """Get the nodes of the scopes that may contain the children of the ast, from the shallowest to the
+        deepest one. The path stops at the first missing node unless the missing nodes are created."""
+        nodes = [self.scope_index]
+        for i in ast:
+            node = nodes[-1].children.get(i)
+            if node is None:
+                if not create:
+                    break
+                node = nodes[-1].children[i] = VarScopeNode()
+            nodes.append(node)
+        return nodes
 
+    def _find(
+        self, nodes: list[VarScopeNode], key: KEY, ast: AST_ID
+    ) -> Optional[VarRegister]:
+        for depth in range(len(nodes) - 1, -1, -1):
+            regids = nodes[depth].key2registers.get(key)
+            if regids is None:
+                continue
+            child_index = ast[depth]
+            for regid in regids:
+                scope = self.registers[regid].scope
+                if child_index >= scope.child_index_start and (
+                    scope.child_index_end is None or child_index < scope.child_index_end
+                ):
+                    return self.registers[regid]
+        return None
 
-@dataclass
+
+@dataclass(slots=True)
 class ImportHelper:
     """Helper class to manage imports in the program."""
 
     program: Program
     # mapping from identifiers to their imported paths
     idents: dict[str, str] = field(default_factory=dict)
+    # dotted name of the program's module, identifiers defined in the module itself are not imported
+    module: Optional[str] = None
+    # identifiers that are imported lazily (see `Program.import_`), e.g., from heavy libraries
+    lazy: set[str] = field(default_factory=set)
+
+    def use(self, ident: str, at: Optional[AST] = None):
+        """Import an identifier and return it.
 
-    def use(self, ident: str):
+        Args:
+            ident: the identifier, which must be in `idents`
+            at: the AST that uses the identifier, required for lazily imported identifiers, which are imported in
+                the function that contains it
+        """
         assert ident in self.idents, ident
-        self.program.import_(self.idents[ident], True)
+        path = self.idents[ident]
+        if self.module is None or path.rsplit(".", 1)[0] != self.module:
+            self.program.import_(path, True, lazy=ident in self.lazy, at=at)
         return ExprIdent(ident)
 
     def python_import_for_hint(
         self, module: str, is_import_attr: bool, alias: Optional[str] = None
     ):
         """A specific function only for Python to import identifiers that causing circular import error into a same TYPE_CHECKING condition"""
-        if module in self.program.imported_modules:
-            return
-        self.program.imported_modules.add(module)
-
-        self.program.import_("typing.TYPE_CHECKING", True)
-        for child in self.program.import_area.children:
-            if isinstance(child.stmt, IfStatement) and child.stmt.cond == ExprIdent(
-                "TYPE_CHECKING"
-            ):
-                child.import_(module, is_import_attr, alias)
-                break
-        else:
-            self.program.import_area.if_(ExprIdent("TYPE_CHECKING"))(
-                lambda ast: ast.import_(module, is_import_attr, alias)
-            )
+        self.program.import_(module, is_import_attr, alias, type_checking=True)
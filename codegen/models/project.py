@@ -0,0 +1,207 @@
+"""A project of many modules (programs) that reference each other and are rendered and written to a directory
+together.
+
+Each module is a `Program` named by its dotted path (e.g., "pkg.models"). Identifiers defined in a module are
+registered once in the project (`Project.define`), so that the `ImportHelper` of every module resolves them without
+re-declaring them, and the imports between the modules form the module graph (`Project.dependencies`).
+
+Usage:
+    from codegen.models.project import Project
+
+    project = Project()
+    models = project.module("pkg.models")
+    models.root.class_("User", [])
+    project.define("pkg.models", "User")
+
+    api = project.module("pkg.api")
+    user = project.import_helper("pkg.api").use("User")  # from pkg.models import User
+    ...
+    report = project.write("out", "python", parallel=8)
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+from codegen.models.program import ImportHelper, Program
+from codegen.models.utils import map_in_processes, should_parallelize
+from codegen.models.writer import WriteReport, write_file
+
+_EXTENSIONS = {"python": ".py", "typescript": ".ts"}
+# files of modules that have submodules, i.e., packages
+_PACKAGE_FILES = {"python": "__init__.py", "typescript": "index.ts"}
+
+
+@dataclass(init=False, slots=True)
+class Project:
+    # mapping from the dotted names of modules to their programs
+    modules: dict[str, Program]
+    # mapping from identifiers defined in the modules to their imported paths, shared by the import helpers
+    idents: dict[str, str]
+    # arguments of `Program` to create new modules
+    program_options: dict[str, Any]
+
+    def __init__(self, **program_options: Any):
+        """
+        Args:
+            program_options: arguments of `Program` (e.g., indent, lazy_ids) to create the modules with
+        """
+        self.modules = {}
+        self.idents = {}
+        self.program_options = program_options
+
+    def module(self, name: str) -> Program:
+        """Get the program of a module, creating it if it does not exist"""
+        program = self.modules.get(name)
+        if program is None:
+            program = self.modules[name] = Program(**self.program_options)
+        return program
+
+    def add_module(self, name: str, program: Program):
+        """Add an existing program as a module"""
+        if name in self.modules:
+            raise ValueError(f"Module {name} already exists in the project")
+        self.modules[name] = program
+
+    def define(self, module: str, ident: str):
+        """Register an identifier defined in a module so that other modules can import it with their import
+        helpers"""
+        if module not in self.modules:
+            raise KeyError(f"Module {module} is not in the project")
+        path = f"{module}.{ident}"
+        if self.idents.setdefault(ident, path) != path:
+            raise ValueError(
+                f"Identifier {ident} is already defined in {self.idents[ident].rsplit('.', 1)[0]}"
+            )
+
+    def import_helper(self, module: str) -> ImportHelper:
+        """Get an import helper of a module that resolves the identifiers defined in the project"""
+        return ImportHelper(self.module(module), self.idents, module)
+
+    def dependencies(self, module: str) -> set[str]:
+        """Get the modules of the project that a module imports"""
+        deps = set()
+        for imported in self.modules[module].imported_modules:
+            # the longest prefix of the imported path that is a module, e.g., pkg.models of pkg.models.User
+            name = imported
+            while name not in self.modules and "." in name:
+                name = name.rsplit(".", 1)[0]
+            if name in self.modules and name != module:
+                deps.add(name)
+        return deps
+
+    def graph(self) -> dict[str, set[str]]:
+        """Get the module graph: mapping from every module to the modules it imports"""
+        return {name: self.dependencies(name) for name in self.modules}
+
+    def get_paths(self, lang: Literal["python", "typescript"]) -> dict[str, Path]:
+        """Get the relative file paths of the modules. A module that has submodules is a package, whose file is
+        `__init__.py` (or `index.ts`) in its directory."""
+        packages = set()
+        for name in self.modules:
+            parts = name.split(".")
+            for i in range(1, len(parts)):
+                packages.add(".".join(parts[:i]))
+
+        paths = {}
+        for name in self.modules:
+            path = Path(*name.split("."))
+            if name in packages:
+                paths[name] = path / _PACKAGE_FILES[lang]
+            else:
+                paths[name] = path.with_name(path.name + _EXTENSIONS[lang])
+        return paths
+
+    def render(
+        self, lang: Literal["python", "typescript"], parallel: int = 1
+    ) -> dict[str, str]:
+        """Render the modules to the given language, in a pool of `parallel` processes if parallel > 1 and the
+        modules are large enough (see `should_parallelize`)"""
+        names = list(self.modules)
+        codes = self._map(lang, names, None, parallel)
+        return dict(zip(names, codes))
+
+    def write(
+        self,
+        directory: str | Path,
+        lang: Literal["python", "typescript"],
+        parallel: int = 1,
+    ) -> WriteReport:
+        """Render the modules and write them to their files (see `Project.get_paths`) in the directory, returning
+        the files that have been written or skipped. Files whose content is unchanged are not written again, so
+        that their modification times (used by incremental tools such as mypy or tsc) are kept, and the other files
+        are written atomically (see `codegen.models.writer`).
+
+        Args:
+            directory: the root directory of the modules
+            lang: the language to render the modules to
+            parallel: number of processes to render and write the modules concurrently. Every process renders and
+                writes batches of modules, so the code is not sent back to the main process. Small projects are
+                rendered sequentially, which is faster (see `should_parallelize`).
+        """
+        directory = Path(directory)
+        paths = self.get_paths(lang)
+        names = list(self.modules)
+        files = [directory / paths[name] for name in names]
+        report = WriteReport()
+        for file, is_written in zip(files, self._map(lang, names, files, parallel)):
+            report.add(file, is_written)
+        return report
+
+    def _map(
+        self,
+        lang: Literal["python", "typescript"],
+        names: list[str],
+        paths: Optional[list[Path]],
+        parallel: int,
+    ) -> list[Any]:
+        """Render the modules (and write them to the paths if given) with `_render_module`"""
+        if paths is None:
+            paths = [None] * len(names)  # type: ignore
+        if len(names) <= 1 or not should_parallelize(
+            (self.modules[name].root for name in names), parallel
+        ):
+            return [
+                _render_module(self.modules[name], lang, path)
+                for name, path in zip(names, paths)  # type: ignore
+            ]
+
+        # the project is given to the workers when they start, only the names of the modules are sent to them
+        return map_in_processes(
+            _render_worker_module,
+            [lang] * len(names),
+            names,
+            paths,  # type: ignore
+            parallel=parallel,
+            initializer=_init_worker,
+            initargs=(self,),
+        )
+
+
+# the project that a worker process works on (see Project.write)
+_worker_project: Optional[Project] = None
+
+
+def _init_worker(project: Project):
+    global _worker_project
+    _worker_project = project
+
+
+def _render_worker_module(
+    lang: Literal["python", "typescript"], name: str, path: Optional[Path]
+) -> str | bool:
+    assert _worker_project is not None
+    return _render_module(_worker_project.modules[name], lang, path)
+
+
+def _render_module(
+    program: Program, lang: Literal["python", "typescript"], path: Optional[Path]
+) -> str | bool:
+    """Render a module, returning its code if path is None, otherwise writing it to the file (see `write_file`)
+    and returning whether it has been written"""
+    code = program.to_python() if lang == "python" else program.to_typescript()
+    if path is None:
+        return code
+    return write_file(path, code)
@@ -0,0 +1,652 @@
+"""Binary snapshot of a Program, so that a built program can be reloaded without rebuilding it.
+
+The file starts with a magic string and a header (encoded with `marshal`), followed by sections:
+
+- the global section contains the objects (statements, expressions, variables, ...) that are used by the
+  program itself (e.g., types of variable registers, interned expressions) or by more than one top-level AST.
+- the section of the variable registers of the program.
+- one section per top-level AST (i.e., child of the program's root), which contains the objects only used by
+  this AST and the structure of its subtree.
+
+Objects are stored in a table as tuples of their class and field values, and are referred to by their
+positions in the table, so that shared objects (e.g., interned expressions) are stored only once. Ids of ASTs
+are not stored as they are derived from their positions in the tree. Sections are compressed separately (with
+zlib, at its fastest level) as the tables of statements and expressions are very repetitive.
+
+Sections are read from a memory-mapped file, so a single top-level AST can be loaded without reading the
+rest of the program (see `ProgramSnapshot.load_ast`).
+
+Compared to pickle (see `benchmarks/bench_snapshot.py`), a snapshot is about 7 times smaller, and it is dumped
+about 1.3 times and loaded about twice as fast on large programs.
+"""
+
+from __future__ import annotations
+
+import importlib
+import marshal
+import mmap
+import struct
+import zlib
+from dataclasses import fields, is_dataclass
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from codegen.models.ast import AST
+from codegen.models.expr import Expr, ExprPool
+from codegen.models.program import Program, VarRegister, VarRegisters
+from codegen.models.statement import Statement
+from codegen.models.structural import ClassKinds, iter_pre_order
+from codegen.models.utils import gc_paused
+from codegen.models.var import Var, VarScope
+
+MAGIC = b"CGSNAP"
+VERSION = 4
+
+# tags of encoded values that are not object references (see `_Encoder.encode_value`)
+T_INT = 0
+T_TUPLE = 1
+T_LIST = 2
+T_DICT = 3
+T_SET = 4
+T_FROZENSET = 5
+# tuple of primitive values (e.g., AST_ID or KEY), stored as is
+T_PRIMITIVES = 6
+T_VAR_SCOPE = 7
+
+# positions of the sections in a snapshot, followed by the sections of the top-level ASTs
+GLOBAL_SECTION = 0
+REGISTERS_SECTION = 1
+N_PROGRAM_SECTIONS = 2
+
+# class ids and field values of objects
+ObjectTable = tuple[list[int], list[tuple]]
+
+
+def dump(program: Program, path: Union[str, Path]):
+    """Write the snapshot of the program to the given file"""
+    encoder = _Encoder()
+    with gc_paused():
+        # sections are compressed separately, so that a section can be read without decompressing the others
+        sections = [
+            zlib.compress(marshal.dumps(section), 1)
+            for section in encoder.encode_program(program)
+        ]
+
+    offsets = []
+    offset = 0
+    for section in sections:
+        offsets.append((offset, len(section)))
+        offset += len(section)
+
+    header = marshal.dumps(
+        (VERSION, [_class_name(cls) for cls in encoder.classes], offsets)
+    )
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for section in sections:
+            f.write(section)
+
+
+def load(path: Union[str, Path]) -> Program:
+    """Load a program from its snapshot"""
+    with ProgramSnapshot(path) as snapshot:
+        return snapshot.load()
+
+
+class ProgramSnapshot:
+    """A snapshot file of a program opened for reading.
+
+    Only the header and the global section are read when the snapshot is opened, which gives `self.program`:
+    the program without its top-level ASTs and variables. They are read on demand, either all at once with
+    `load` or only the top-level AST needed with `load_ast` (e.g., to render a single class).
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.file = open(path, "rb")
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be memory-mapped
+            self.file.close()
+            raise ValueError(f"{path} is not a program snapshot")
+
+        if self.buffer[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a program snapshot")
+        (header_size,) = struct.unpack_from("<Q", self.buffer, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        version, class_names, self.offsets = marshal.loads(
+            self.buffer[header_start : header_start + header_size]
+        )
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        self.data_start = header_start + header_size
+        self.decoder = _Decoder([_resolve_class(name) for name in class_names])
+
+        # the program without its top-level ASTs
+        with gc_paused():
+            self.program = self.decoder.decode_program(
+                self._read_section(GLOBAL_SECTION)
+            )
+
+    def __len__(self):
+        """Number of top-level ASTs in the snapshot"""
+        return len(self.offsets) - N_PROGRAM_SECTIONS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def load(self) -> Program:
+        """Load the whole program. The returned program is the same object as `self.program`."""
+        root = self.program.root
+        if len(root.children) == 0:
+            with gc_paused():
+                self.decoder.decode_registers(
+                    self._read_section(REGISTERS_SECTION), self.program
+                )
+                for i in range(len(self)):
+                    root.children.append(
+                        self.decoder.decode_subtree(
+                            self._read_section(N_PROGRAM_SECTIONS + i), self.program, i
+                        )
+                    )
+            self.program.import_area = root.children[self.decoder.import_area_index]
+        return self.program
+
+    def load_ast(self, index: int) -> AST:
+        """Load the top-level AST at the given index (i.e., `program.root.children[index]`) and its subtree.
+
+        Unless it is loaded by `load`, the AST is not added to the children of the program's root.
+        """
+        if len(self.program.root.children) > 0:
+            return self.program.root.children[index]
+        with gc_paused():
+            return self.decoder.decode_subtree(
+                self._read_section(N_PROGRAM_SECTIONS + index), self.program, index
+            )
+
+    def _read_section(self, index: int) -> Any:
+        offset, size = self.offsets[index]
+        start = self.data_start + offset
+        return marshal.loads(zlib.decompress(self.buffer[start : start + size]))
+
+
+class _Encoder:
+    def __init__(self):
+        self.classes: list[type] = []
+        self.class2id: dict[type, int] = {}
+        # mapping from ids of objects to their positions in the object table, which has the objects of the global
+        # section and of the section that is being encoded
+        self.refs: dict[int, int] = {}
+        # mapping from ids of the objects of the sections of top-level ASTs to the indices of their sections
+        self.owners: dict[int, int] = {}
+        # objects used by more than one top-level AST, which must be in the global section
+        self.shared: list[Any] = []
+
+    def encode_program(self, program: Program) -> list[Any]:
+        """Encode the program into sections: the global section, the registers section and the sections of
+        the top-level ASTs"""
+        sections = self._encode_program(program, [])
+        if len(self.shared) > 0:
+            # encode again with the shared objects in the global section, which is rarely needed
+            shared = self.shared
+            self.refs = {}
+            self.owners = {}
+            self.shared = []
+            sections = self._encode_program(program, shared)
+            assert len(self.shared) == 0
+        return sections
+
+    def _encode_program(self, program: Program, shared: list[Any]) -> list[Any]:
+        root = program.root
+        pool = program.expr_pool
+        registers = program.vars.registers
+        refs = self.refs
+
+        # objects used by the program itself
+        global_table = self.encode_objects(
+            [
+                root.stmt,
+                *pool.exprs.values(),
+                *(reg.type for reg in registers if reg.type is not None),
+                *shared,
+            ],
+            0,
+            -1,
+        )
+        n_globals = len(global_table[0])
+
+        global_section = (
+            global_table,
+            (
+                refs[id(root.stmt)],
+                root._is_frozen,
+                root._render_cache is not None,
+                root.children.index(program.import_area),
+                sorted(program.imported_modules),
+                [refs[id(expr)] for expr in pool.exprs.values()],
+                pool.render_cache,
+                program.indent,
+                program.lazy_ids,
+            ),
+        )
+        registers_section = [
+            (
+                reg.name,
+                self.encode_value(reg.key),
+                self.encode_value(reg.scope),
+                reg.force_name,
+                self.encode_value(reg.type),
+            )
+            for reg in registers
+        ]
+
+        subtree_sections = []
+        for i, child in enumerate(root.children):
+            asts = list(iter_pre_order(child))
+            table = self.encode_objects([ast.stmt for ast in asts], n_globals, i)
+            structure = []
+            for ast in asts:
+                structure.append(refs[id(ast.stmt)])
+                structure.append(len(ast.children))
+                structure.append(ast._is_frozen)
+            subtree_sections.append((table, structure))
+            # objects of the section are referred to by their positions only in the section, and they are the
+            # last ones added to the refs
+            for _ in range(len(table[0])):
+                refs.popitem()
+
+        return [global_section, registers_section, *subtree_sections]
+
+    def encode_objects(self, roots: list[Any], start: int, section: int) -> ObjectTable:
+        """Encode objects reachable from the roots, which are not encoded yet, into a table such that an object
+        comes after the objects it refers to. The section is the index of the top-level AST that the objects are
+        used by, or -1 for the global section."""
+        refs = self.refs
+        owners = self.owners
+        class2id = self.class2id
+        encode_value = self.encode_value
+        class_ids = []
+        records = []
+        # entries are (object, None) when entering an object and (object, (its record, positions of the values in
+        # the record that refer to objects not encoded yet)) when leaving it. Objects do not refer to their
+        # ancestors, so an object is never entered again before it is encoded.
+        stack: list[tuple[Any, Any]] = [(root, None) for root in reversed(roots)]
+        while len(stack) > 0:
+            obj, entry = stack.pop()
+            if entry is None:
+                key = id(obj)
+                if key in refs:
+                    continue
+                if section != -1 and owners.setdefault(key, section) != section:
+                    self.shared.append(obj)
+                # the values are encoded when entering the object, except the ones that refer to objects that are
+                # not encoded yet, which are encoded when leaving it
+                record = []
+                pending = []
+                stack.append((obj, (record, pending)))
+                for value in _field_values[obj.__class__](obj):
+                    vcls = value.__class__
+                    if vcls is str or value is None or vcls is bool or vcls is float:
+                        record.append(value)
+                    elif vcls is int:
+                        record.append((T_INT, value))
+                    elif _object_classes[vcls]:
+                        ref = refs.get(id(value))
+                        if ref is None:
+                            stack.append((value, None))
+                            pending.append(len(record))
+                            record.append(value)
+                        else:
+                            record.append(ref)
+                    elif vcls is VarScope:
+                        record.append((T_VAR_SCOPE, *value))
+                    else:
+                        n = len(stack)
+                        _add_objects_in_value(value, stack, refs)
+                        if len(stack) > n:
+                            pending.append(len(record))
+                            record.append(value)
+                        else:
+                            record.append(encode_value(value))
+                if len(pending) > 0:
+                    continue
+                stack.pop()
+            else:
+                record, pending = entry
+                for i in pending:
+                    record[i] = encode_value(record[i])
+
+            cls = obj.__class__
+            class_id = class2id.get(cls)
+            if class_id is None:
+                class_id = self.add_class(obj)
+            class_ids.append(class_id)
+            refs[id(obj)] = start + len(records)
+            records.append(tuple(record))
+        return class_ids, records
+
+    def add_class(self, obj: Any) -> int:
+        cls = obj.__class__
+        if len(_field_names(cls)) == 0 and getattr(obj, "__dict__", None):
+            raise TypeError(
+                f"Cannot store {cls} in a snapshot as it is neither a dataclass nor a NamedTuple"
+            )
+        self.class2id[cls] = len(self.classes)
+        self.classes.append(cls)
+        return self.class2id[cls]
+
+    def encode_value(self, value: Any) -> Any:
+        """Encode a value into a marshallable value. Objects are encoded as their positions in the object table,
+        hence other integers and containers are tagged to be distinguished from them."""
+        cls = value.__class__
+        if cls is str or cls is bool or cls is float or value is None:
+            return value
+        if _object_classes[cls]:
+            return self.refs[id(value)]
+        if cls is int:
+            return (T_INT, value)
+        if cls is VarScope:
+            return (T_VAR_SCOPE, *value)
+        if cls is list or cls is tuple:
+            if cls is tuple and all(v.__class__ in _PRIMITIVE_TYPES for v in value):
+                return (T_PRIMITIVES, value)
+            refs = self.refs
+            items: list[Any] = [T_LIST if cls is list else T_TUPLE]
+            for v in value:
+                vcls = v.__class__
+                if _object_classes[vcls]:
+                    items.append(refs[id(v)])
+                elif vcls is str or vcls is bool or vcls is float or v is None:
+                    items.append(v)
+                else:
+                    items.append(self.encode_value(v))
+            return tuple(items)
+        if isinstance(value, (bool, str, float)):
+            return value
+        if isinstance(value, int):
+            return (T_INT, int(value))
+        if isinstance(value, tuple):
+            if all(v.__class__ in _PRIMITIVE_TYPES for v in value):
+                return (T_PRIMITIVES, tuple(value))
+            return (T_TUPLE, *(self.encode_value(v) for v in value))
+        if isinstance(value, list):
+            return (T_LIST, *(self.encode_value(v) for v in value))
+        if isinstance(value, dict):
+            items = []
+            for k, v in value.items():
+                items.append(self.encode_value(k))
+                items.append(self.encode_value(v))
+            return (T_DICT, *items)
+        if isinstance(value, frozenset):
+            return (T_FROZENSET, *(self.encode_value(v) for v in value))
+        if isinstance(value, set):
+            return (T_SET, *(self.encode_value(v) for v in value))
+        raise TypeError(f"Cannot store value of type {type(value)} in a snapshot")
+
+
+class _Decoder:
+    def __init__(self, classes: list[type]):
+        self.classes = classes
+        self.constructors = [_constructor(cls) for cls in classes]
+        self.global_objects: list[Any] = []
+        self.import_area_index = 0
+
+    def decode_program(self, section: tuple) -> Program:
+        table, meta = section
+        (
+            root_stmt,
+            root_is_frozen,
+            incremental_render,
+            self.import_area_index,
+            imported_modules,
+            pool_exprs,
+            render_cache,
+            indent,
+            lazy_ids,
+        ) = meta
+
+        self.global_objects = objects = self.decode_objects(table, [])
+
+        program = Program.__new__(Program)
+        program.indent = indent
+        program.lazy_ids = lazy_ids
+        program.root = AST(
+            (),
+            program,
+            objects[root_stmt],
+            [],
+            root_is_frozen,
+            None,
+            {} if incremental_render else None,
+        )
+        # set to the actual import area when the top-level ASTs are loaded
+        program.import_area = program.root
+        program.import_block = None
+        program.imported_modules = set(imported_modules)
+        # registers are loaded with the top-level ASTs (see `decode_registers`)
+        program.vars = VarRegisters(program)
+        program.expr_pool = ExprPool(render_cache)
+        for ref in pool_exprs:
+            program.expr_pool.intern(objects[ref])
+        return program
+
+    def decode_registers(self, section: list[tuple], program: Program):
+        objects = self.global_objects
+        for i, (name, key, scope, force_name, type) in enumerate(section):
+            program.vars.add_register(
+                VarRegister(
+                    i,
+                    name,
+                    self.decode_value(key, objects),
+                    self.decode_value(scope, objects),
+                    force_name,
+                    self.decode_value(type, objects),
+                )
+            )
+
+    def decode_subtree(self, section: tuple, program: Program, index: int) -> AST:
+        table, structure = section
+        # objects of the section are appended to the global objects temporarily to avoid copying them
+        objects = self.global_objects
+        n_globals = len(objects)
+        try:
+            self.decode_objects(table, objects)
+            return self._decode_structure(structure, objects, program, index)
+        finally:
+            del objects[n_globals:]
+
+    def _decode_structure(
+        self, structure: list, objects: list[Any], program: Program, index: int
+    ) -> AST:
+        incremental_render = program.root._render_cache is not None
+
+        root = program.root
+        ast = AST(
+            (index,),
+            program,
+            objects[structure[0]],
+            [],
+            structure[2],
+            root,
+            {} if incremental_render else None,
+        )
+        # stack of ASTs and the number of their children that are not decoded yet
+        stack = [[ast, structure[1]]]
+        for i in range(3, len(structure), 3):
+            while stack[-1][1] == 0:
+                stack.pop()
+            parent = stack[-1][0]
+            stack[-1][1] -= 1
+            child = AST(
+                (
+                    len(parent.children)
+                    if program.lazy_ids
+                    else parent.id + (len(parent.children),)
+                ),
+                program,
+                objects[structure[i]],
+                [],
+                structure[i + 2],
+                parent,
+                {} if incremental_render else None,
+            )
+            parent.children.append(child)
+            stack.append([child, structure[i + 1]])
+        return ast
+
+    def decode_objects(self, table: ObjectTable, objects: list[Any]) -> list[Any]:
+        """Decode the objects in the table, appending them to the given list of objects that they may refer to"""
+        constructors = self.constructors
+        decode_value = self.decode_value
+        class_ids, records = table
+        for class_id, record in zip(class_ids, records):
+            objects.append(
+                constructors[class_id](
+                    *[
+                        (
+                            objects[value]
+                            if value.__class__ is int
+                            else (
+                                value
+                                if value.__class__ is not tuple
+                                else decode_value(value, objects)
+                            )
+                        )
+                        for value in record
+                    ]
+                )
+            )
+        return objects
+
+    def decode_value(self, value: Any, objects: list[Any]) -> Any:
+        type_ = value.__class__
+        if type_ is int:
+            return objects[value]
+        if type_ is not tuple:
+            return value
+        tag = value[0]
+        if tag == T_INT or tag == T_PRIMITIVES:
+            return value[1]
+        if tag == T_VAR_SCOPE:
+            return VarScope(value[1], value[2], value[3])
+        if tag == T_TUPLE:
+            return tuple(self.decode_value(v, objects) for v in value[1:])
+        if tag == T_LIST:
+            return [self.decode_value(v, objects) for v in value[1:]]
+        if tag == T_DICT:
+            return {
+                self.decode_value(value[i], objects): self.decode_value(
+                    value[i + 1], objects
+                )
+                for i in range(1, len(value), 2)
+            }
+        if tag == T_FROZENSET:
+            return frozenset(self.decode_value(v, objects) for v in value[1:])
+        assert tag == T_SET
+        return {self.decode_value(v, objects) for v in value[1:]}
+
+
+_PRIMITIVE_TYPES = {str, int, float, bool, type(None)}
+# classes whose instances are stored as objects in a snapshot
+_OBJECT_CLASSES = (Statement, Expr, Var)
+# whether instances of classes are stored as objects (instead of values) in a snapshot
+_object_classes = ClassKinds(lambda cls: issubclass(cls, _OBJECT_CLASSES))
+
+
+def _add_objects_in_value(
+    value: Any, stack: list[tuple[Any, Optional[tuple]]], refs: dict[int, int]
+):
+    """Add the objects in a value that are not encoded yet to the stack of `_Encoder.encode_objects`"""
+    cls = value.__class__
+    if cls is str or value is None or cls is bool:
+        return
+    if _object_classes[cls]:
+        if id(value) not in refs:
+            stack.append((value, None))
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        for item in value:
+            if item.__class__ not in _PRIMITIVE_TYPES:
+                _add_objects_in_value(item, stack, refs)
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            _add_objects_in_value(k, stack, refs)
+            _add_objects_in_value(v, stack, refs)
+
+
+_field_names_cache: dict[type, tuple[str, ...]] = {}
+
+
+def _field_names(cls: type) -> tuple[str, ...]:
+    """Get names of the fields of a class that are stored in a snapshot"""
+    names = _field_names_cache.get(cls)
+    if names is None:
+        if issubclass(cls, tuple) and hasattr(cls, "_fields"):
+            names = cls._fields
+        elif is_dataclass(cls):
+            names = tuple(f.name for f in fields(cls) if f.init)
+        else:
+            names = ()
+        _field_names_cache[cls] = names
+    return names
+
+
+def _get_field_values(cls: type) -> Callable[[Any], tuple]:
+    names = _field_names(cls)
+    if len(names) == 0:
+        return lambda obj: ()
+    if len(names) == 1:
+        get = attrgetter(names[0])
+        return lambda obj: (get(obj),)
+    return attrgetter(*names)
+
+
+# functions to get the values of the stored fields of objects by their classes
+_field_values = ClassKinds(_get_field_values)
+
+
+def _constructor(cls: type) -> Callable[..., Any]:
+    """Get a function that creates an object of the class from the values of its stored fields"""
+    if not is_dataclass(cls) or cls.__dataclass_params__.init:  # type: ignore
+        return cls
+
+    # dataclasses with custom constructors (e.g., PredefinedFn.map_list)
+    names = _field_names(cls)
+    defaults = [
+        (f.name, f.default) for f in fields(cls) if not f.init and f.name not in names
+    ]
+
+    def construct(*values):
+        obj = cls.__new__(cls)
+        for name, value in zip(names, values):
+            setattr(obj, name, value)
+        for name, value in defaults:
+            setattr(obj, name, value)
+        return obj
+
+    return construct
+
+
+def _class_name(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve_class(name: str) -> type:
+    module, qualname = name.split(":")
+    obj: Any = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    if not (isinstance(obj, type) and issubclass(obj, _OBJECT_CLASSES)):
+        raise ValueError(f"{name} is not a class that can be stored in a snapshot")
+    return obj
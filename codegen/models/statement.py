@@ -2,14 +2,28 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from multiprocessing import Value
 from typing import Literal, Optional, Sequence
 
 from codegen.models.expr import ExceptionExpr, Expr, ExprFuncCall
+from codegen.models.structural import structural_fields
 from codegen.models.var import Var
 
 
+@dataclass(slots=True)
 class Statement(ABC):
+    """Base class of statements. Like expressions, statements are compared structurally, so subclasses must be
+    declared with `eq=False` to inherit the comparison. Statements may be modified in place (e.g., imports are
+    added to import blocks), so their hashes are not cached."""
+
+    def __hash__(self):
+        return hash((self.__class__, structural_fields(self)))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return structural_fields(self) == structural_fields(other)
 
     @abstractmethod
     def to_python(self):
@@ -20,6 +34,8 @@ class Statement(ABC):
 
 
 class NoStatement(Statement):
+    __slots__ = ()
+
     def __repr__(self):
         return "NoStatement()"
 
@@ -30,7 +46,7 @@ class NoStatement(Statement):
         return "{}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class BlockStatement(Statement):
     # whether the block has its own environment or not -- meaning any variables declared inside the block will be
     # only visible inside the block
@@ -48,6 +64,8 @@ class BlockStatement(Statement):
 
 
 class LineBreak(Statement):
+    __slots__ = ()
+
     def to_python(self):
         return ""
 
@@ -55,7 +73,7 @@ class LineBreak(Statement):
         return ""
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ImportStatement(Statement):
     module: str
     is_import_attr: bool
@@ -83,7 +101,129 @@ class ImportStatement(Statement):
             raise NotImplementedError(self)
 
 
-@dataclass
+# how the instances of a python class are represented (see `DefClassStatement`)
+CLASS_LAYOUT = Literal["plain", "slots", "dataclass", "namedtuple"]
+# how a module or an attribute is imported (see `Program.import_`): normally, only for type checking, lazily by the
+# python functions that use it (typescript modules import it normally), or only by python modules
+IMPORT_KIND = Literal["eager", "type_checking", "lazy", "python"]
+# (module, attribute or None to import the module itself, alias, kind)
+IMPORT_KEY = tuple[str, Optional[str], Optional[str], IMPORT_KIND]
+# the maximum length of a line of imported attributes before they are wrapped in parentheses
+MAX_IMPORT_LINE_LENGTH = 88
+
+
+@dataclass(slots=True, eq=False)
+class ImportBlockStatement(Statement):
+    """Imports of a module (see `Program.import_`) or a function, rendered as a canonical block regardless of the
+    order they are added: `import m` lines, then `from m import a, b as c` lines grouped by module, sorted by modules
+    then names. In python, the imports that are only needed for type checking are in an `if TYPE_CHECKING:` block,
+    and the lazy imports are left to the functions that use them."""
+
+    imports: set[IMPORT_KEY] = field(default_factory=set)
+
+    @staticmethod
+    def get_key(
+        module: str,
+        is_import_attr: bool,
+        alias: Optional[str] = None,
+        kind: IMPORT_KIND = "eager",
+    ) -> IMPORT_KEY:
+        """Get the key of an import of a module or an attribute of a module (see `Program.import_`)"""
+        if is_import_attr and module.find(".") != -1:
+            module, attr = module.rsplit(".", 1)
+            return (module, attr, alias, kind)
+        return (module, None, alias, kind)
+
+    def to_python(self):
+        eager, type_checking = self._split("python")
+        if len(type_checking) > 0:
+            eager.add(("typing", "TYPE_CHECKING", None, "eager"))
+        lines = self._group(eager, "python")
+        if len(type_checking) > 0:
+            lines.append("if TYPE_CHECKING:")
+            lines.extend(
+                "\t" + line.replace("\n", "\n\t")
+                for line in self._group(type_checking, "python")
+            )
+        return "\n".join(lines)
+
+    def to_typescript(self):
+        eager, type_checking = self._split("typescript")
+        return "\n".join(
+            self._group(eager, "typescript")
+            + self._group(type_checking, "typescript", "import type")
+        )
+
+    def _split(
+        self, lang: Literal["python", "typescript"]
+    ) -> tuple[set[IMPORT_KEY], set[IMPORT_KEY]]:
+        """Split the imports of the language into those that are imported normally and those that are only imported
+        for type checking, which are skipped if they are also imported normally"""
+        # python functions import the lazy imports themselves, there is no lazy import in typescript as bundlers
+        # load the modules when they are needed
+        normal_kinds = ("eager", "python") if lang == "python" else ("eager", "lazy")
+        eager = set()
+        type_checking = set()
+        for key in self.imports:
+            module, attr, alias, kind = key
+            if kind in normal_kinds:
+                eager.add((module, attr, alias, "eager"))
+            elif kind == "type_checking" and not any(
+                (module, attr, alias, normal_kind) in self.imports
+                for normal_kind in normal_kinds
+            ):
+                type_checking.add(key)
+        return eager, type_checking
+
+    def _group(
+        self,
+        imports: set[IMPORT_KEY],
+        lang: Literal["python", "typescript"],
+        keyword: str = "import",
+    ) -> list[str]:
+        """Render the imports grouped by module and sorted"""
+        modules: list[tuple[str, str]] = []
+        attrs: dict[str, list[tuple[str, str]]] = {}
+        for module, attr, alias, _ in imports:
+            if attr is None:
+                modules.append((module, alias or ""))
+            else:
+                attrs.setdefault(module, []).append((attr, alias or ""))
+
+        lines = []
+        if lang == "python":
+            for module, alias in sorted(modules):
+                lines.append(
+                    f"import {module} as {alias}" if alias else f"import {module}"
+                )
+            for module in sorted(attrs):
+                names = [
+                    f"{attr} as {alias}" if alias else attr
+                    for attr, alias in sorted(attrs[module])
+                ]
+                line = f"from {module} import {', '.join(names)}"
+                if len(line) > MAX_IMPORT_LINE_LENGTH:
+                    line = (
+                        f"from {module} import (\n"
+                        + "".join(f"\t{name},\n" for name in names)
+                        + ")"
+                    )
+                lines.append(line)
+            return lines
+
+        if len(modules) > 0:
+            raise NotImplementedError(self)
+        for module in sorted(attrs):
+            names = [
+                f"{attr} as {alias}" if alias else attr
+                for attr, alias in sorted(attrs[module])
+            ]
+            path = module.replace(".", "/")
+            lines.append(f"{keyword} {{ {', '.join(names)} }} from '{path}';")
+        return lines
+
+
+@dataclass(slots=True, eq=False)
 class DefFuncStatement(Statement):
     name: str
     args: Sequence[Var | tuple[Var, Expr]] = field(default_factory=list)
@@ -94,6 +234,9 @@ class DefFuncStatement(Statement):
     # to mark this function as a getter or setter.
     modifiers: Sequence[Literal["get", "set"]] = field(default_factory=list)
     comment: str = ""
+    # imports at the start of the function body, which are imported when the function is called (python only, see
+    # `Program.import_`). Typescript modules import them in the import area.
+    imports: Optional[ImportBlockStatement] = None
 
     def to_python(self):
         sig = f"def {self.name}({', '.join([arg[0].to_python() + ' = ' + arg[1].to_python() if isinstance(arg, tuple) else arg.to_python() for arg in self.args])})"
@@ -114,6 +257,8 @@ class DefFuncStatement(Statement):
                 + "\n\t"
                 + '"""'
             )
+        if self.imports is not None and len(self.imports.imports) > 0:
+            sig += "\n\t" + self.imports.to_python().replace("\n", "\n\t")
         return sig
 
     def to_typescript(self):
@@ -143,15 +288,41 @@ class DefFuncStatement(Statement):
         return sig
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DefClassStatement(Statement):
     name: str
     parents: Sequence[Expr] = field(default_factory=list)
+    # how the instances of the class are represented in python (see `AST.class_`): "plain" classes have a
+    # `__dict__` per instance, "slots" classes declare `__slots__`, "dataclass" classes are decorated with
+    # `@dataclass(slots=True)`, and "namedtuple" classes extend `NamedTuple`
+    layout: CLASS_LAYOUT = "plain"
+    # whether the instances of a "dataclass" class are immutable
+    frozen: bool = False
+    # names of the instance variables of a "slots" class (see `AST.class_var`)
+    slot_names: list[str] = field(default_factory=list)
 
     def to_python(self):
-        if len(self.parents) == 0:
-            return f"class {self.name}:"
-        return f"class {self.name}({', '.join(p.to_python() for p in self.parents)}):"
+        parents = [p.to_python() for p in self.parents]
+        if self.layout == "namedtuple":
+            if len(parents) > 0:
+                raise ValueError(f"NamedTuple class {self.name} cannot have other parents")
+            parents = ["NamedTuple"]
+
+        if len(parents) == 0:
+            sig = f"class {self.name}:"
+        else:
+            sig = f"class {self.name}({', '.join(parents)}):"
+
+        if self.layout == "dataclass":
+            if self.frozen:
+                return "@dataclass(slots=True, frozen=True)\n" + sig
+            return "@dataclass(slots=True)\n" + sig
+        if self.layout == "slots":
+            names = ", ".join(f'"{name}"' for name in self.slot_names)
+            if len(self.slot_names) == 1:
+                names += ","
+            return f"{sig}\n\t__slots__ = ({names})"
+        return sig
 
     def to_typescript(self):
         # export by default because we do not have way to make this class private yet.
@@ -162,7 +333,7 @@ class DefClassStatement(Statement):
         return f"export class {self.name}" + extend
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DefClassLikeStatement(Statement):
     """Statement to define a class or interface"""
 
@@ -182,7 +353,7 @@ class DefClassLikeStatement(Statement):
         return f"export {self.keyword} {self.name}" + extend
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DefClassVarStatement(Statement):
     """Statement to define a variable with type"""
 
@@ -194,15 +365,18 @@ class DefClassVarStatement(Statement):
     value: Optional[Expr] = None
     # whether this variable is static
     is_static: bool = False
+    # whether the type is wrapped in `ClassVar` in python, e.g., for static variables of dataclasses
+    is_class_var: bool = False
 
     def to_python(self):
         if self.type is None:
             if self.value is None:
                 return f"{self.name}"
             return f"{self.name} = {self.value.to_python()}"
+        type = f"ClassVar[{self.type}]" if self.is_class_var else self.type
         if self.value is None:
-            return f"{self.name}: {self.type}"
-        return f"{self.name}: {self.type} = {self.value.to_python()}"
+            return f"{self.name}: {type}"
+        return f"{self.name}: {type} = {self.value.to_python()}"
 
     def to_typescript(self):
         mod = ""
@@ -221,7 +395,7 @@ class DefClassVarStatement(Statement):
         return f"{mod}{self.name}{type} = {self.value.to_typescript()};"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DefEnumValueStatement(Statement):
     """Statement to define an enum value"""
 
@@ -239,7 +413,7 @@ class DefEnumValueStatement(Statement):
         return f"{self.name} = {self.value.to_typescript()},"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class AssignStatement(Statement):
     var: Var | Expr
     expr: Expr
@@ -259,7 +433,7 @@ class AssignStatement(Statement):
             return f"{self.var.to_typescript()} = {self.expr.to_typescript()};"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class SingleExprStatement(Statement):
     expr: Expr
 
@@ -274,7 +448,7 @@ class SingleExprStatement(Statement):
         return self.expr.to_typescript()
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ExceptionStatement(Statement):
     expr: ExceptionExpr  # we rely on special exception expr
 
@@ -282,7 +456,7 @@ class ExceptionStatement(Statement):
         return "raise " + self.expr.to_python()
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class AssertionStatement(Statement):
     expr: Expr
     error_msg: Optional[Expr] = None
@@ -300,7 +474,7 @@ class AssertionStatement(Statement):
         )
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ForLoopStatement(Statement):
     item: Var
     iter: Expr
@@ -309,13 +483,13 @@ class ForLoopStatement(Statement):
         return f"for {self.item.get_name()} in {self.iter.to_python()}:"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ContinueStatement(Statement):
     def to_python(self):
         return "continue"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class BreakStatement(Statement):
     def to_python(self):
         return "break"
@@ -324,7 +498,7 @@ class BreakStatement(Statement):
         return "break;"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ReturnStatement(Statement):
     expr: Expr
 
@@ -335,7 +509,7 @@ class ReturnStatement(Statement):
         return f"return {self.expr.to_typescript()};"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class IfStatement(Statement):
     cond: Expr
 
@@ -346,13 +520,13 @@ class IfStatement(Statement):
         return f"if ({self.cond.to_typescript()})"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class TryStatement(Statement):
     def to_python(self):
         return "try:"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class CatchStatement(Statement):
     match: Optional[Expr] = None
 
@@ -362,7 +536,7 @@ class CatchStatement(Statement):
         return f"except {self.match.to_python()}:"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class ElseStatement(Statement):
     def to_python(self):
         return "else:"
@@ -371,7 +545,7 @@ class ElseStatement(Statement):
         return "else"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class Comment(Statement):
     comment: str
 
@@ -379,7 +553,7 @@ class Comment(Statement):
         return f"# {self.comment}"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class PythonStatement(Statement):
     stmt: str
 
@@ -387,7 +561,7 @@ class PythonStatement(Statement):
         return self.stmt
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class TypescriptStatement(Statement):
     stmt: str
 
@@ -398,7 +572,7 @@ class TypescriptStatement(Statement):
         return self.stmt
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class PythonDecoratorStatement(Statement):
     decorator: ExprFuncCall
 
@@ -0,0 +1,228 @@
+"""Helpers for the structural equality and hashing of expressions, statements and ASTs.
+
+Two objects are structurally equal if they have the same class and their fields (that are part of the comparison)
+are structurally equal. Unlike the builtin equality, values of different types are never equal (e.g., `True` and
+`1`, `0.0` and `-0.0` are rendered differently). The hash of an expression is cached in its `_hash` field once it
+is interned, as interned expressions are not modified anymore. Other objects may be modified, so their hashes are
+computed every time.
+
+Cached hashes are not pickled as hashes of strings are different in each process. Stable hashes, which are the same
+across processes (e.g., to be used as keys of on-disk caches), are computed from the tokens of `stable_tokens`.
+"""
+
+from __future__ import annotations
+
+import copy
+import marshal
+from dataclasses import fields, is_dataclass
+from operator import attrgetter
+from typing import Any, Callable, Hashable, Iterator
+
+from codegen.models.var import Var
+
+# names of the fields that are part of the comparison by class
+_compare_fields: dict[type, tuple[str, ...]] = {}
+# names of the fields that are pickled by class
+_state_fields: dict[type, tuple[str, ...]] = {}
+
+
+def compare_fields(cls: type) -> tuple[str, ...]:
+    """Get names of the fields of a dataclass that are part of its structural comparison"""
+    names = _compare_fields.get(cls)
+    if names is None:
+        names = _compare_fields[cls] = tuple(f.name for f in fields(cls) if f.compare)
+    return names
+
+
+class ClassKinds(dict):
+    """Kinds of classes (e.g., whether they are statements), computed once per class by the given function, as
+    isinstance checks of abstract classes are slow. Look up the kind of a class with `kinds[cls]`."""
+
+    __slots__ = ("get_kind",)
+
+    def __init__(self, get_kind: Callable[[type], Any]):
+        super().__init__()
+        self.get_kind = get_kind
+
+    def __missing__(self, cls: type) -> Any:
+        kind = self[cls] = self.get_kind(cls)
+        return kind
+
+
+def structural_key(value: Any) -> Hashable:
+    """Get a hashable key of a field's value, which is equal to the key of another value iff they are
+    structurally equal. Objects that define the structural hash (e.g., expressions) are their own keys.
+    """
+    cls = value.__class__
+    if cls is str or cls is int or value is None:
+        return value
+    if cls is bool:
+        return (bool, value)
+    if cls is float:
+        # 0.0 and -0.0 are equal but rendered differently
+        return (float, repr(value))
+    if cls is list or cls is tuple:
+        return (cls, tuple([structural_key(item) for item in value]))
+    if cls is dict:
+        return (
+            dict,
+            tuple([(structural_key(k), structural_key(v)) for k, v in value.items()]),
+        )
+    if cls is set or cls is frozenset:
+        return (cls, frozenset([structural_key(item) for item in value]))
+    try:
+        hash(value)
+    except TypeError:
+        # unhashable values that we do not know how to compare are compared by identity
+        return (cls, id(value))
+    return value
+
+
+def structural_fields(obj: Any) -> tuple:
+    """Get the keys of the values of the fields of an object that are part of its structural comparison"""
+    return tuple(
+        [structural_key(getattr(obj, name)) for name in compare_fields(obj.__class__)]
+    )
+
+
+def getstate(obj: Any) -> dict[str, Any]:
+    """Get the pickled state of a slotted dataclass, without its cached hash"""
+    cls = obj.__class__
+    names = _state_fields.get(cls)
+    if names is None:
+        names = _state_fields[cls] = tuple(
+            f.name for f in fields(cls) if f.name != "_hash"
+        )
+    return {name: getattr(obj, name) for name in names}
+
+
+def setstate(obj: Any, state: dict[str, Any]):
+    for name, value in state.items():
+        object.__setattr__(obj, name, value)
+    object.__setattr__(obj, "_hash", None)
+
+
+def copy_with(obj: Any, changes: dict[str, Any]) -> Any:
+    """Copy an object (e.g., an expression) with some of its fields replaced, as objects may be shared and must
+    not be modified after they are hashed. The cached hash and rendered code of the copy are reset."""
+    new_obj = copy.copy(obj)
+    for name, value in changes.items():
+        setattr(new_obj, name, value)
+    if getattr(new_obj, "_render_cache", None) is not None:
+        # the copy is not interned
+        new_obj._render_cache = None
+    return new_obj
+
+
+def iter_postorder(obj: Any) -> Iterator[Any]:
+    """Iterate over an object and the dataclasses (e.g., expressions and variables) in its compared fields
+    recursively, children before their parents and shared objects once. It uses an explicit stack, so objects
+    that are too deeply nested to be processed recursively can be processed bottom-up.
+    """
+    seen: set[int] = set()
+    stack: list[tuple[Any, bool]] = [(obj, False)]
+    while len(stack) > 0:
+        node, is_leaving = stack.pop()
+        if is_leaving:
+            yield node
+            continue
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        stack.append((node, True))
+        children: list[Any] = []
+        for name in compare_fields(node.__class__):
+            _add_dataclasses(getattr(node, name), children)
+        stack.extend((child, False) for child in reversed(children))
+
+
+def iter_pre_order(root: Any) -> Iterator[Any]:
+    """Iterate over a tree (e.g., an AST) in pre-order, walking the `children` of nodes with an explicit stack"""
+    stack = [root]
+    while len(stack) > 0:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def _add_dataclasses(value: Any, objs: list[Any]):
+    cls = value.__class__
+    if cls is list or cls is tuple:
+        for item in value:
+            _add_dataclasses(item, objs)
+    elif hasattr(cls, "__dataclass_fields__"):
+        objs.append(value)
+
+
+def stable_tokens(obj: Any) -> list[Any]:
+    """Flatten an object (e.g., a statement) and the objects in its compared fields into a list of tokens that is the
+    same across processes, unlike the builtin hashes: primitive values as is and markers (tuples) for the classes
+    of objects and the lengths of containers, so that different objects never have the same tokens. Variables
+    are flattened into their names and types, which are the only parts of them that are rendered.
+
+    The tokens can be serialized with `marshal` (version 2, which does not depend on the identities of objects) to
+    compute stable hashes. The object is walked with an explicit stack as it may be deeply nested.
+    """
+    tokens: list[Any] = []
+    stack = [obj]
+    while len(stack) > 0:
+        value = stack.pop()
+        cls = value.__class__
+        if cls in _PRIMITIVE_TYPES:
+            tokens.append(value)
+            continue
+        info = _stable_classes.get(cls)
+        if info is None:
+            info = _stable_classes[cls] = _get_stable_class(cls)
+        marker, get_fields, n_fields = info
+        if n_fields > 1:
+            tokens.append(marker)
+            stack.extend(get_fields(value))
+        elif n_fields == 1:
+            tokens.append(marker)
+            stack.append(get_fields(value))
+        elif n_fields == 0:
+            tokens.append(marker)
+        elif cls is list or cls is tuple:
+            tokens.append((cls is list, len(value)))
+            stack.extend(reversed(value))
+        elif cls is Var:
+            tokens.append(marker)
+            tokens.append(value.get_name())
+            stack.append(value.type)
+        elif cls is dict:
+            tokens.append(("dict", len(value)))
+            for k, v in reversed(value.items()):
+                stack.append(v)
+                stack.append(k)
+        else:
+            # the order of items of sets is not stable across processes
+            items = sorted(marshal.dumps(stable_tokens(item), 2) for item in value)
+            tokens.append((cls.__name__, len(items)))
+            tokens.extend(items)
+    return tokens
+
+
+def _get_stable_class(cls: type) -> tuple[Any, Any, int]:
+    """Get the marker of a class, a function to get the values of its compared fields in reverse order and the
+    number of the fields, which is -1 for containers and variables"""
+    if cls in (list, tuple, dict, set, frozenset):
+        return None, None, -1
+    if cls is not Var and not is_dataclass(cls):
+        raise TypeError(f"Cannot compute the stable hash of {cls}")
+    # the marker is a number derived from the name of the class (its FNV-1a hash), which is much shorter to
+    # serialize than the name
+    marker = 0xCBF29CE484222325
+    for byte in f"{cls.__module__}:{cls.__qualname__}".encode():
+        marker = ((marker ^ byte) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    marker = (marker,)
+    if cls is Var:
+        return marker, None, -1
+    names = compare_fields(cls)[::-1]
+    get_fields = attrgetter(*names) if len(names) > 0 else None
+    return marker, get_fields, len(names)
+
+
+_PRIMITIVE_TYPES = {str, int, float, bool, type(None), bytes}
+# classes of objects in `stable_tokens` (see `_get_stable_class`)
+_stable_classes: dict[type, tuple[Any, Any, int]] = {}
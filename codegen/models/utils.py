@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import gc
+from contextlib import contextmanager
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Sequence, TypeVar
+
+from codegen.models.structural import iter_pre_order
+
+if TYPE_CHECKING:
+    from codegen.models.ast import AST
+
+T = TypeVar("T")
+
+# number of ASTs below which rendering in a pool of processes is slower than rendering sequentially: starting the
+# workers and sending the code back take about 30ms, which is the time to render about 6000 ASTs
+MIN_PARALLEL_ASTS = 20_000
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Pause the cyclic garbage collector, which is triggered repeatedly but finds nothing to collect when
+    creating or walking through many objects"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def map_in_processes(
+    fn: Callable[..., T],
+    *iterables: Sequence[Any],
+    parallel: int,
+    initializer: Callable[..., Any],
+    initargs: tuple,
+) -> list[T]:
+    """Map a function over the items of the iterables in a pool of `parallel` processes. The workers are set up
+    with `initializer(*initargs)` when they start, e.g., to receive the program once instead of with every item.
+    Items are sent to the workers in chunks, as sending them one by one is slow."""
+    # imported lazily as it loads multiprocessing, which is slow to import and rarely needed
+    from concurrent.futures import ProcessPoolExecutor
+
+    n_items = len(iterables[0])
+    with ProcessPoolExecutor(
+        max_workers=parallel, initializer=initializer, initargs=initargs
+    ) as executor:
+        return list(
+            executor.map(fn, *iterables, chunksize=max(1, n_items // (parallel * 4)))
+        )
+
+
+def should_parallelize(roots: Iterable[AST], parallel: int) -> bool:
+    """Check if trees are worth rendering in a pool of `parallel` processes, i.e., they have at least
+    `MIN_PARALLEL_ASTS` ASTs. The ASTs are only counted up to the threshold, so that checking is cheap."""
+    if parallel <= 1:
+        return False
+    n_asts = 0
+    for root in roots:
+        n_asts += sum(1 for _ in islice(iter_pre_order(root), MIN_PARALLEL_ASTS - n_asts))
+        if n_asts >= MIN_PARALLEL_ASTS:
+            return True
+    return False
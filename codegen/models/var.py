@@ -25,7 +25,7 @@ class VarScope(NamedTuple):
         return len(self.ast) + 1
 
 
-@dataclass
+@dataclass(slots=True)
 class Var:  # variable
     """To create the variable for the first time, use DeferredVar."""
 
@@ -37,6 +37,10 @@ class Var:  # variable
     # type of the variable
     type: Optional[ExprIdent] = None
 
+    def __hash__(self):
+        # the scope is not part of the hash as it is updated when ASTs are moved (see `Program.update_ast_ids`)
+        return hash((self.name, self.key, self.register_id, self.force_name, self.type))
+
     def get_name(self) -> str:
         if self.force_name is None:
             return f"{self.name}_{self.register_id}"
@@ -55,7 +59,7 @@ class Var:  # variable
         return f"{self.get_name()}: {self.type.to_typescript()}"
 
 
-@dataclass
+@dataclass(slots=True)
 class DeferredVar:
     """Containings the information to create a variable. This is the class to use to create variable."""
 
@@ -0,0 +1,296 @@
+"""Visitors and transformers of ASTs, statements, expressions and variables.
+
+A visitor defines `visit_<ClassName>` methods (e.g., `visit_IfStatement`, `visit_ExprIdent`, `visit_AST`), which are
+called with the nodes of the tree in pre-order, and optionally `leave_<ClassName>` methods, which are called after
+the children of the nodes are visited. The method of the closest class in the MRO of a node is called, so
+`visit_Expr` receives all expressions that do not have their own methods. Nested classes use their own names
+(e.g., `visit_attr_getter` for `PredefinedFn.attr_getter`). Methods are looked up once per class of nodes and
+cached in a dispatch table of the visitor class.
+
+Traversals use an explicit stack, so trees of any depth can be walked. Several visitors can be fused to walk the
+tree once with `visit(root, visitor1, visitor2, ...)`, and several transformers to rebuild it once with
+`transform(root, transformer1, transformer2, ...)`.
+
+Usage:
+    class CountCalls(ASTVisitor):
+        def __init__(self):
+            self.n_calls = 0
+
+        def visit_ExprFuncCall(self, expr):
+            self.n_calls += 1
+
+        def visit_DefClassStatement(self, stmt):
+            # do not count the calls in the parents of classes
+            return SKIP
+
+    class RenameIdent(ASTTransformer):
+        def transform_ExprIdent(self, expr):
+            return ExprIdent("new_name") if expr.ident == "old_name" else expr
+
+    counter = CountCalls()
+    visit(program.root, counter, another_visitor)
+    transform(program.root, RenameIdent())
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, Union
+
+from codegen.models.ast import AST
+from codegen.models.expr import Expr
+from codegen.models.statement import Statement
+from codegen.models.structural import ClassKinds, compare_fields, copy_with
+from codegen.models.var import Var
+
+Node = Union[AST, Statement, Expr, Var]
+
+
+class _Sentinel:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+# returned by a visit method to not visit the children of the node
+SKIP = _Sentinel("SKIP")
+# returned by a transform method to remove the node: the AST of a statement, or an item of a list
+REMOVE = _Sentinel("REMOVE")
+
+
+class ASTVisitor:
+    """Base class of visitors, see the module's documentation"""
+
+    # whether to visit the statements of ASTs only and not their expressions and variables, which is faster
+    visit_statements_only: bool = False
+
+    # dispatch tables from classes of nodes to the methods of the visitor class (None if there is no method)
+    _visit_methods: dict[type, Optional[Callable]] = {}
+    _leave_methods: dict[type, Optional[Callable]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visit_methods = {}
+        cls._leave_methods = {}
+
+    def visit(self, root: Node):
+        """Visit the tree of the node"""
+        visit(root, self)
+
+
+class ASTTransformer:
+    """Base class of transformers. A transformer defines `transform_<ClassName>` methods, which receive statements,
+    expressions or variables and return their replacements (or the same nodes to keep them).
+
+    Nodes are transformed bottom-up: a node is passed to its method after its children are transformed, and a
+    node whose children are replaced is copied with the new children first, so nodes that may be shared are
+    never modified in place. The statements of ASTs are replaced in place, and returning `REMOVE` for a
+    statement removes its AST (and the subtree) from the program. Frozen ASTs are not transformed.
+    """
+
+    _transform_methods: dict[type, Optional[Callable]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._transform_methods = {}
+
+    def transform(self, root: Node) -> Any:
+        """Transform the tree of the node, return the transformed node (the same AST for ASTs)"""
+        return transform(root, self)
+
+
+def visit(root: Node, *visitors: ASTVisitor):
+    """Visit the tree of the node with the visitors in a single walk. Each node is visited by the visitors in
+    order. A visitor whose visit method returns `SKIP` does not visit the children of the node, while the other
+    visitors still do.
+    """
+    stack: list[tuple[Any, tuple[ASTVisitor, ...], bool]] = [(root, visitors, False)]
+    while len(stack) > 0:
+        node, active, is_leaving = stack.pop()
+        cls = node.__class__
+        if is_leaving:
+            for visitor in active:
+                vcls = visitor.__class__
+                fn = _get_method(vcls, vcls._leave_methods, "leave_", cls)
+                if fn is not None:
+                    fn(visitor, node)
+            continue
+
+        has_leave_methods = False
+        next_active = active
+        for visitor in active:
+            vcls = visitor.__class__
+            fn = _get_method(vcls, vcls._visit_methods, "visit_", cls)
+            if fn is not None and fn(visitor, node) is SKIP:
+                next_active = tuple([v for v in next_active if v is not visitor])
+            if _get_method(vcls, vcls._leave_methods, "leave_", cls) is not None:
+                has_leave_methods = True
+        if has_leave_methods:
+            stack.append((node, active, True))
+
+        kind = _node_kinds[cls]
+        if kind == _STATEMENT_NODE:
+            next_active = tuple(
+                [v for v in next_active if not v.visit_statements_only]
+            )
+        if len(next_active) > 0:
+            children = node.children if kind == _AST_NODE else _get_child_nodes(node)
+            stack.extend((child, next_active, False) for child in reversed(children))
+            if kind == _AST_NODE:
+                stack.append((node.stmt, next_active, False))
+
+
+def transform(root: Node, *transformers: ASTTransformer) -> Any:
+    """Transform the tree of the node with the transformers in a single walk. Each node is passed to the
+    transformers in order, i.e., the second transformer receives the result of the first one. Return the
+    transformed node (the same AST for ASTs, whose statements are replaced in place).
+    """
+    if root.__class__ is not AST:
+        return _transform_node(root, transformers)
+
+    # ASTs that are removed because their statements are removed
+    removed: set[int] = set()
+    stack = [(root, False)]
+    while len(stack) > 0:
+        ast, visited = stack.pop()
+        if ast._is_frozen:
+            continue
+        if not visited:
+            stack.append((ast, True))
+            stack.extend((child, False) for child in reversed(ast.children))
+            continue
+
+        if any(id(child) in removed for child in ast.children):
+            ast.children[:] = [
+                child for child in ast.children if id(child) not in removed
+            ]
+            ast.mark_dirty()
+        stmt = _transform_node(ast.stmt, transformers)
+        if stmt is REMOVE:
+            if ast is root:
+                raise ValueError("Cannot remove the root of the transformed tree")
+            removed.add(id(ast))
+        elif stmt is not ast.stmt:
+            ast.stmt = stmt
+            ast.mark_dirty()
+
+    if len(removed) > 0:
+        root.prog.update_ast_ids()
+    return root
+
+
+def _transform_node(root: Any, transformers: tuple[ASTTransformer, ...]) -> Any:
+    # transformed nodes by the ids of the original nodes, which are alive during the transformation
+    results: dict[int, Any] = {}
+    stack = [(root, False)]
+    while len(stack) > 0:
+        node, visited = stack.pop()
+        if id(node) in results:
+            # shared nodes are transformed once
+            continue
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(_get_child_nodes(node)))
+            continue
+
+        changes = {}
+        for name in _node_fields[node.__class__]:
+            value = getattr(node, name)
+            new_value = _rebuild_value(value, results)
+            if new_value is not value:
+                if new_value is REMOVE:
+                    raise ValueError(
+                        f"Cannot remove the field {name} of {node.__class__.__name__}"
+                    )
+                changes[name] = new_value
+        new_node = copy_with(node, changes) if len(changes) > 0 else node
+        for transformer in transformers:
+            tcls = transformer.__class__
+            fn = _get_method(
+                tcls, tcls._transform_methods, "transform_", new_node.__class__
+            )
+            if fn is not None:
+                new_node = fn(transformer, new_node)
+                if new_node is REMOVE:
+                    break
+        results[id(node)] = new_node
+    return results[id(root)]
+
+
+def _rebuild_value(value: Any, results: dict[int, Any]) -> Any:
+    cls = value.__class__
+    if cls is list or cls is tuple:
+        items = [_rebuild_value(item, results) for item in value]
+        if any(new is not old for new, old in zip(items, value)):
+            return cls([item for item in items if item is not REMOVE])
+        return value
+    if _node_kinds[cls] != _NOT_NODE:
+        return results[id(value)]
+    return value
+
+
+def _get_method(
+    owner: type, table: dict[type, Optional[Callable]], prefix: str, cls: type
+) -> Optional[Callable]:
+    """Get the method of the owner (a visitor class) for the closest class in the MRO of a node's class, and cache
+    it in the dispatch table of the owner"""
+    fn = table.get(cls, _MISSING)
+    if fn is not _MISSING:
+        return fn
+    fn = None
+    for base in cls.__mro__:
+        fn = getattr(owner, prefix + base.__name__, None)
+        if fn is not None:
+            break
+    table[cls] = fn
+    return fn
+
+
+_MISSING = _Sentinel("MISSING")
+
+# kinds of classes of nodes
+_NOT_NODE = 0
+_AST_NODE = 1
+_STATEMENT_NODE = 2
+_OTHER_NODE = 3
+
+
+def _get_node_kind(cls: type) -> int:
+    if issubclass(cls, AST):
+        return _AST_NODE
+    if issubclass(cls, Statement):
+        return _STATEMENT_NODE
+    if issubclass(cls, (Expr, Var)):
+        return _OTHER_NODE
+    return _NOT_NODE
+
+
+def _get_node_fields(cls: type) -> tuple[str, ...]:
+    if issubclass(cls, Var):
+        return ("type",)
+    return compare_fields(cls)
+
+
+_node_kinds = ClassKinds(_get_node_kind)
+# names of the fields of nodes that may contain other nodes, by their classes
+_node_fields = ClassKinds(_get_node_fields)
+
+
+def _get_child_nodes(node: Any) -> list[Any]:
+    """Get the child nodes of a statement, an expression or a variable"""
+    children = []
+    for name in _node_fields[node.__class__]:
+        _add_nodes(getattr(node, name), children)
+    return children
+
+
+def _add_nodes(value: Any, nodes: list[Any]):
+    cls = value.__class__
+    if cls is list or cls is tuple:
+        for item in value:
+            _add_nodes(item, nodes)
+    elif _node_kinds[cls] != _NOT_NODE:
+        nodes.append(value)
@@ -0,0 +1,77 @@
+"""Write generated code to files, skipping the files whose content is unchanged.
+
+Rewriting a file with the same content still updates its modification time, which invalidates the caches of
+incremental tools (e.g., mypy, tsc, pytest, bundlers). Unchanged files are left untouched, and changed files are
+written atomically (to a temporary file that replaces the original one), so that these tools never read a
+partially written file.
+
+Usage:
+    writer = OutputWriter()
+    writer.write("out/models.py", program.to_python())
+    print(writer.report)  # written 1 files, skipped 0 unchanged files
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass(slots=True)
+class WriteReport:
+    written: list[Path] = field(default_factory=list)
+    # files that are not written as their content is unchanged
+    skipped: list[Path] = field(default_factory=list)
+
+    def add(self, path: Path, is_written: bool):
+        if is_written:
+            self.written.append(path)
+        else:
+            self.skipped.append(path)
+
+    def __str__(self):
+        return f"written {len(self.written)} files, skipped {len(self.skipped)} unchanged files"
+
+
+@dataclass(slots=True)
+class OutputWriter:
+    """Write files and report the ones that have been written or skipped"""
+
+    report: WriteReport = field(default_factory=WriteReport)
+
+    def write(self, path: str | Path, code: str) -> bool:
+        """Write the code to the file if its content changed, returning whether it has been written"""
+        path = Path(path)
+        is_written = write_file(path, code)
+        self.report.add(path, is_written)
+        return is_written
+
+
+def write_file(path: Path, code: str) -> bool:
+    """Write the code to the file atomically if its content changed, returning whether it has been written.
+    Missing parent directories are created."""
+    data = code.encode()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        stat = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+    else:
+        # files of different sizes are not read
+        if stat.st_size == len(data) and path.read_bytes() == data:
+            return False
+
+    # the thread id is part of the name, so that threads of a process writing the same file do not clash
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        if stat is not None:
+            # keep the permissions of the existing file
+            os.chmod(tmp_path, stat.st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
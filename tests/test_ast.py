@@ -0,0 +1,101 @@
+import dataclasses
+
+import pytest
+
+from codegen.models import DeferredVar, Program
+from codegen.models.ast import AST
+from codegen.models.expr import ExprConstant, ExprIdent
+from codegen.models.statement import SingleExprStatement
+
+
+def build() -> Program:
+    prog = Program()
+    prog.root.expr(ExprIdent("x"))
+    prog.root.expr(ExprIdent("y"))
+    prog.root.expr(ExprIdent("x"))
+    return prog
+
+
+def test_ast_equality_is_identity():
+    children = build().root.children
+    # the first and the last statements are structurally equal, but they are different ASTs
+    assert children[1].structurally_equal(children[3])
+    assert children[1] != children[3]
+    assert children.index(children[3]) == 3
+    assert len({children[1], children[3]}) == 2
+
+
+def test_structural_hash_of_frozen_asts():
+    a = build()
+    b = build()
+    a.root.freeze()
+    b.root.freeze()
+    assert a.root.structural_hash() == b.root.structural_hash()
+    assert a.root.structurally_equal(b.root)
+    assert not a.root.children[1].structurally_equal(b.root.children[2])
+
+
+def test_construct_ast_by_keyword():
+    prog = build()
+    ast = AST(id=(3,), prog=prog, stmt=SingleExprStatement(ExprIdent("z")), parent=prog.root)
+    assert ast.id == (3,) and ast.children == [] and ast.parent is prog.root
+    copy = dataclasses.replace(ast, id=(4,))
+    assert copy.id == (4,) and copy.stmt is ast.stmt and copy.parent is prog.root
+    assert ast.id == (3,)
+
+
+def build_assignments(prog: Program, bulk: bool):
+    func = prog.root.func("f", [DeferredVar.simple("a")])
+    a = func.stmt.args[0]
+    func.assign(DeferredVar("x", ("x",)), ExprIdent("a"))
+    pairs = [(DeferredVar(f"v{i}", (f"v{i}",)), ExprConstant(i)) for i in range(5)]
+    # reassign an existing variable, and a variable of the same name with another key
+    pairs.append((a, ExprConstant(5)))
+    pairs.append((DeferredVar("x", ("x", 1)), ExprConstant(6)))
+    if bulk:
+        asts = func.assign_many(pairs)
+        assert [ast.stmt for ast in asts] == [ast.stmt for ast in func.children[1:]]
+    else:
+        for var, expr in pairs:
+            func.assign(var, expr)
+    func.return_(ExprIdent(pairs[2][0].get_var().get_name()))
+    return func
+
+
+@pytest.mark.parametrize("lazy_ids", [False, True])
+def test_assign_many_equals_assign(lazy_ids):
+    loop = Program(lazy_ids=lazy_ids)
+    bulk = Program(lazy_ids=lazy_ids)
+    loop_func = build_assignments(loop, False)
+    bulk_func = build_assignments(bulk, True)
+    assert bulk.to_python() == loop.to_python()
+    assert bulk.to_typescript() == loop.to_typescript()
+    assert bulk.vars.registers == loop.vars.registers
+    for i in range(1, 6):
+        assert bulk.get_var(key=(f"v{i - 1}",), at=bulk_func.children[-1].id) == loop.get_var(
+            key=(f"v{i - 1}",), at=loop_func.children[-1].id
+        )
+
+
+def test_assign_many_registers_nothing_on_failure():
+    prog = Program()
+    func = prog.root.func("f", [])
+    func.assign(DeferredVar("x", ("x",)), ExprConstant(0))
+    n_registers = len(prog.vars.registers)
+
+    # a conflicting variable
+    new = DeferredVar("y", ("y",))
+    with pytest.raises(ValueError):
+        func.assign_many([(new, ExprConstant(1)), (DeferredVar("x", ("x",)), ExprConstant(2))])
+    assert new.has_not_been_created() and len(prog.vars.registers) == n_registers
+    # the same key twice
+    with pytest.raises(ValueError):
+        func.assign_many([(new, ExprConstant(1)), (DeferredVar("y", ("y",)), ExprConstant(2))])
+    assert new.has_not_been_created() and len(prog.vars.registers) == n_registers
+
+    func.freeze()
+    with pytest.raises(Exception, match="frozen"):
+        func.assign_many([(new, ExprConstant(1))])
+    assert new.has_not_been_created() and len(prog.vars.registers) == n_registers
+    assert prog.vars.find(("y",), func.next_child_id()) is None
+    assert len(func.children) == 1
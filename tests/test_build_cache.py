@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.suite import Config, build
+from codegen.models.build_cache import BuildCache, get_key
+
+
+def build_frozen():
+    prog, _ = build(Config(n_classes=3, n_methods=2))
+    for ast in prog.root.children[1:]:
+        ast.freeze()
+    return prog
+
+
+def test_keys_are_stable_across_processes():
+    keys = [get_key(ast, "python") for ast in build_frozen().root.children[1:]]
+    assert len(set(keys)) == len(keys)
+
+    code = (
+        "from benchmarks.suite import Config, build\n"
+        "from codegen.models.build_cache import get_key\n"
+        "prog, _ = build(Config(n_classes=3, n_methods=2))\n"
+        "for ast in prog.root.children[1:]:\n"
+        "    ast.freeze()\n"
+        "    print(get_key(ast, 'python'))\n"
+    )
+    # hashes of strings are different in each process
+    env = {**os.environ, "PYTHONHASHSEED": "random"}
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=Path(__file__).parent.parent,
+    ).stdout
+    assert output.split() == keys
+
+
+def test_render_with_cache(tmp_path):
+    expected = build_frozen().to_python()
+    prog = build_frozen()
+    cache = BuildCache(tmp_path)
+    assert prog.to_python(cache=cache) == expected
+    assert len(cache) == len(prog.root.children) - 1
+    assert not any(path.name.endswith(".tmp") for path in tmp_path.iterdir())
+    # another build reads the code from the cache
+    prog = build_frozen()
+    cache = BuildCache(tmp_path)
+    cache.put(get_key(prog.root.children[1], "python"), "cached")
+    assert prog.to_python(cache=cache) == expected.replace(
+        build_frozen().root.children[1].to_python(), "cached"
+    )
@@ -0,0 +1,37 @@
+import pytest
+
+from codegen.models import Program
+from codegen.models.expr import ExprConstant, ExprIdent
+
+
+def test_dataclass_static_variables():
+    prog = Program()
+    cls = prog.root.class_("A", [], layout="dataclass")
+    cls.class_var("x", "int")
+    cls.class_var("count", "int", ExprConstant(0), is_static=True)
+
+    code = prog.to_python()
+    assert "\tcount: ClassVar[int] = 0" in code
+    namespace = {}
+    exec(code, namespace)
+    assert namespace["A"](1).x == 1
+    assert namespace["A"].count == 0
+
+    # python helpers are not imported by typescript modules
+    code = prog.to_typescript()
+    assert "import" not in code
+    assert "\tstatic count: int = 0;" in code
+
+
+def test_namedtuple_restrictions():
+    prog = Program()
+    cls = prog.root.class_("A", [], layout="namedtuple")
+    cls.class_var("x", "int")
+    with pytest.raises(ValueError):
+        cls.class_var("count", "int", ExprConstant(0), is_static=True)
+    with pytest.raises(ValueError):
+        prog.root.class_("B", [ExprIdent("A")], layout="namedtuple")
+
+    namespace = {}
+    exec(prog.to_python(), namespace)
+    assert namespace["A"](1) == (1,)
@@ -0,0 +1,76 @@
+"""Deep programs must be processed without exceeding the recursion limit"""
+
+import pickle
+
+import pytest
+
+from codegen.models import Program
+from codegen.models.build_cache import get_key
+from codegen.models.expr import ExprIdent
+from codegen.models import snapshot
+
+DEPTH = 10_000
+
+
+def build_deep(incremental_render: bool = False) -> Program:
+    # the full ids of deep ASTs take quadratic memory
+    prog = Program(incremental_render=incremental_render, lazy_ids=True)
+    ast = prog.root
+    for i in range(DEPTH):
+        ast = ast.if_(ExprIdent(f"c{i}"))
+        if i % 3 == 0:
+            ast = ast.block()
+    ast.return_(ExprIdent("x"))
+    return prog
+
+
+@pytest.mark.parametrize("incremental_render", [False, True])
+def test_render(incremental_render):
+    prog = build_deep(incremental_render)
+    code = prog.to_python()
+    lines = code.split("\n")
+    assert lines[-1] == "\t" * DEPTH + "return x"
+    assert prog.to_typescript().split("\n")[-1] == "}"
+    assert prog.to_python() == code
+
+
+def test_freeze_and_hash():
+    prog = build_deep()
+    prog.root.freeze()
+    other = build_deep()
+    other.root.freeze()
+    assert prog.root.structural_hash() == other.root.structural_hash()
+    assert prog.root.structurally_equal(other.root)
+
+    assert get_key(prog.root, "python") == get_key(other.root, "python")
+
+    # the hashes are computed again after unpickling
+    loaded = pickle.loads(pickle.dumps(prog))
+    assert loaded.root._hash is None
+    assert loaded.root.structural_hash() == prog.root.structural_hash()
+
+
+def test_snapshot(tmp_path):
+    prog = build_deep()
+    code = prog.to_python()
+    snapshot.dump(prog, tmp_path / "program.snapshot")
+    assert snapshot.load(tmp_path / "program.snapshot").to_python() == code
+
+
+def test_pickle():
+    prog = build_deep()
+    code = prog.to_python()
+    loaded = pickle.loads(pickle.dumps(prog))
+    assert loaded.to_python() == code
+
+    # parents are restored from the children
+    ast = loaded.root
+    while len(ast.children) > 0:
+        assert all(child.parent is ast for child in ast.children)
+        ast = ast.children[-1]
+    assert ast.prog is loaded
+
+    # an AST is pickled with its program
+    leaf = pickle.loads(pickle.dumps(prog.root.children[-1]))
+    assert leaf.parent is not None and leaf.parent.parent is None
+    assert leaf.prog.to_python() == code
@@ -0,0 +1,66 @@
+import pickle
+
+from codegen.models import Program
+from codegen.models.expr import Expr, ExprConstant, ExprFuncCall, ExprIdent, render_iteratively
+
+
+def build(prog: Program, depth: int):
+    expr = ExprIdent("x")
+    for i in range(depth):
+        expr = prog.intern(ExprFuncCall(ExprIdent("f"), [expr, ExprConstant(i)]))
+    prog.root.expr(expr)
+    return expr
+
+
+def test_render_cache_of_interned_exprs():
+    prog = Program(render_cache=True)
+    expr = build(prog, 3)
+    code = prog.root.to_python()
+    no_cache = Program()
+    build(no_cache, 3)
+    assert code == no_cache.root.to_python()
+    assert expr._render_cache == {"python": "f(f(f(x, 0), 1), 2)"}
+    assert expr.__class__ is ExprFuncCall
+    assert prog.intern(ExprFuncCall(ExprIdent("f"), [expr.args[0], ExprConstant(2)])) is expr
+    assert prog.root.to_python() == code
+
+
+def test_abandoned_render_with_cache():
+    prog = Program(render_cache=True)
+    expr = build(prog, 3)
+    prog.root.expr(ExprConstant(1))
+    lines = prog.root.iter_python_lines()
+    next(lines)
+    del lines
+    # the expressions are left unchanged, so they are still equal to their copies
+    copy = pickle.loads(pickle.dumps(expr))
+    assert copy == expr and hash(copy) == hash(expr)
+    assert copy.__class__ is ExprFuncCall and expr.__class__ is ExprFuncCall
+    no_cache = Program()
+    assert copy == build(no_cache, 3)
+    assert pickle.loads(pickle.dumps(prog)).root.to_python() == prog.root.to_python()
+
+
+def test_render_iteratively_does_not_patch_classes():
+    expr = ExprIdent("x")
+    for _ in range(5000):
+        expr = ExprFuncCall(ExprIdent("f"), [expr])
+    code = render_iteratively(expr, "python")
+    assert code == "f(" * 5000 + "x" + ")" * 5000
+    assert expr.__class__ is ExprFuncCall and expr._render_cache is None
+    assert ExprFuncCall.to_python is Expr.to_python
+
+
+def test_hashes_of_mutable_exprs_are_not_cached():
+    expr = ExprFuncCall(ExprIdent("f"), [ExprIdent("x")])
+    hash(expr)
+    expr.args.append(ExprConstant(1))
+    other = ExprFuncCall(ExprIdent("f"), [ExprIdent("x"), ExprConstant(1)])
+    assert expr._hash is None
+    assert hash(expr) == hash(other) and expr == other
+
+    prog = Program()
+    interned = prog.intern(expr)
+    assert interned is expr and expr._hash == hash(other)
+    # a structurally equal expression is found in the pool, but it is not interned itself
+    assert prog.intern(other) is expr and other._hash is None
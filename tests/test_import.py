@@ -0,0 +1,14 @@
+from pathlib import Path
+
+from benchmarks.bench_import import LAZY_MODULES, import_times
+
+
+def test_import_does_not_load_lazy_modules():
+    modules = import_times("codegen.models", cwd=str(Path(__file__).parent.parent))
+    assert "codegen.models" in modules
+    unexpected = [
+        name
+        for name in modules
+        if any(name == mod or name.startswith(mod + ".") for mod in LAZY_MODULES)
+    ]
+    assert unexpected == []
@@ -0,0 +1,46 @@
+import pytest
+
+from codegen.models import DeferredVar, Program
+from codegen.models.expr import ExprFuncCall, ExprIdent
+from codegen.models.statement import ImportBlockStatement
+
+
+def test_lazy_imports_in_functions():
+    prog = Program()
+    func = prog.root.func("f", [DeferredVar.simple("x")])
+    prog.import_("json.dumps", True, lazy=True, at=func)
+    prog.import_("decimal", False, lazy=True, at=func)
+    func.return_(ExprFuncCall(ExprIdent("dumps"), [ExprIdent("x")]))
+
+    code = prog.to_python()
+    assert code == (
+        "\ndef f(x):\n\timport decimal\n\tfrom json import dumps\n\treturn dumps(x)"
+    )
+    namespace = {}
+    exec(code, namespace)
+    assert namespace["f"]([1]) == "[1]"
+
+    # typescript modules import them in the import area
+    prog = Program()
+    func = prog.root.func("f", [])
+    prog.import_("lib.dumps", True, lazy=True, at=func)
+    assert prog.to_typescript().startswith("import { dumps } from 'lib';\n")
+
+
+def test_lazy_imports_outside_functions():
+    prog = Program()
+    with pytest.raises(ValueError):
+        prog.import_("decimal", False, lazy=True)
+    with pytest.raises(ValueError):
+        prog.import_("json.dumps", True, lazy=True, at=prog.root.class_("A", []))
+
+
+def test_hash_of_import_block_follows_its_imports():
+    prog = Program()
+    prog.import_("json", False)
+    block = prog.import_area.children[0].stmt
+    before = hash(block)
+    prog.import_("decimal", False)
+    assert hash(block) != before
+    assert hash(block) == hash(ImportBlockStatement(set(block.imports)))
+    assert block == ImportBlockStatement(set(block.imports))
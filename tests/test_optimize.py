@@ -0,0 +1,176 @@
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import pytest
+
+from codegen.models import AST, DeferredVar, PredefinedFn, Program
+from codegen.models.expr import (
+    ExprConstant,
+    ExprDivision,
+    ExprEqual,
+    ExprFuncCall,
+    ExprIdent,
+    ExprLogicalAnd,
+)
+from codegen.models.optimize import eliminate_common_subexprs, fold_constants
+from codegen.models.statement import AssignStatement
+
+
+def build(args: list[str], body: Callable[[AST], Any]) -> Program:
+    """Build a program with a function `f` of the given arguments"""
+    prog = Program()
+    func = prog.root.func("f", [DeferredVar.simple(arg) for arg in args])
+    body(func)
+    return prog
+
+
+def run(prog: Program, *args: Any) -> Any:
+    namespace: dict[str, Any] = {}
+    exec(prog.to_python(), namespace)
+    return namespace["f"](*args)
+
+
+def run_optimized(
+    build_prog: Callable[[], Program], optimize: Callable[[Program], int], *args: Any
+) -> tuple[Any, Any, int]:
+    """Run the function before and after optimizing it, with fresh arguments created by calling `args`"""
+    expected = run(build_prog(), *[arg() for arg in args])
+    prog = build_prog()
+    n_changes = optimize(prog)
+    return expected, run(prog, *[arg() for arg in args]), n_changes
+
+
+def attr(obj: str, name: str):
+    return PredefinedFn.attr_getter(ExprIdent(obj), ExprIdent(name))
+
+
+def test_cse_after_reassignment_with_equal_statements():
+    # a = x.y; g(a); a = x.y; return (a, x.y), where g modifies x.y
+    def body(func: AST):
+        a = DeferredVar.simple("a")
+        func.assign(a, attr("x", "y"))
+        func.expr(ExprFuncCall(ExprIdent("g"), [ExprIdent("a")]))
+        func.assign(a.get_var(), attr("x", "y"))
+        func.return_(PredefinedFn.tuple([ExprIdent("a"), attr("x", "y")]))
+
+    def g(value):
+        namespace.x.y = value + 1
+
+    namespace = SimpleNamespace()
+
+    def make_x():
+        namespace.x = SimpleNamespace(y=1)
+        return namespace.x
+
+    expected, actual, n_temps = run_optimized(
+        lambda: build(["x", "g"], body), eliminate_common_subexprs, make_x, lambda: g
+    )
+    assert expected == actual == (2, 2)
+    assert n_temps == 1
+
+    prog = build(["x", "g"], body)
+    eliminate_common_subexprs(prog)
+    lines = prog.to_python().splitlines()
+    # the temporary variable is assigned after the call to g, not before the first (equal) assignment of a
+    temp = next(i for i, line in enumerate(lines) if line.startswith("\ttmp"))
+    assert lines.index("\tg(a)") < temp
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        attr("x", "y"),
+        PredefinedFn.item_getter(attr("x", "items"), ExprConstant(0)),
+    ],
+)
+def test_cse_with_attribute_and_item_assignments(target):
+    # p = x.y == 1; <target> = 2; q = x.y == 1; return (p, q)
+    def body(func: AST):
+        read = lambda: ExprEqual(target, ExprConstant(1))
+        func.assign(DeferredVar.simple("p"), read())
+        func(AssignStatement(target, ExprConstant(2)))
+        func.assign(DeferredVar.simple("q"), read())
+        func.return_(PredefinedFn.tuple([ExprIdent("p"), ExprIdent("q")]))
+
+    expected, actual, n_temps = run_optimized(
+        lambda: build(["x"], body),
+        eliminate_common_subexprs,
+        lambda: SimpleNamespace(y=1, items=[1]),
+    )
+    assert expected == actual == (True, False)
+    assert n_temps == 0
+
+
+def test_loop_invariants_that_may_raise_are_not_hoisted():
+    # for v in xs: return a / b
+    def body(func: AST):
+        loop = func.for_loop(DeferredVar.simple("v"), ExprIdent("xs"))
+        loop.return_(ExprDivision(ExprIdent("a"), ExprIdent("b")))
+
+    for xs in ([], [1]):
+        prog = build(["xs", "a", "b"], body)
+        eliminate_common_subexprs(prog)
+        if len(xs) == 0:
+            assert run(prog, xs, 1, 0) is None
+        else:
+            assert run(prog, xs, 1, 2) == 0.5
+
+
+def test_loop_invariants_are_hoisted():
+    # for v in xs: out.append((a == b, v))
+    def body(func: AST):
+        loop = func.for_loop(DeferredVar.simple("v"), ExprIdent("xs"))
+        loop.expr(
+            PredefinedFn.list_append(
+                ExprIdent("out"),
+                PredefinedFn.tuple(
+                    [ExprEqual(ExprIdent("a"), ExprIdent("b")), ExprIdent("v")]
+                ),
+            )
+        )
+        func.return_(ExprIdent("out"))
+
+    expected, actual, n_temps = run_optimized(
+        lambda: build(["xs", "a", "b", "out"], body),
+        eliminate_common_subexprs,
+        lambda: [1, 2],
+        lambda: 1,
+        lambda: 1,
+        list,
+    )
+    assert expected == actual == [(True, 1), (True, 2)]
+    assert n_temps == 1
+
+
+def test_fold_constants():
+    # if True: return a; else: return b; return c
+    def body(func: AST):
+        func.if_(ExprConstant(True)).return_(ExprIdent("a"))
+        func.else_().return_(ExprIdent("b"))
+        func.return_(ExprIdent("c"))
+
+    expected, actual, n_changes = run_optimized(
+        lambda: build(["a", "b", "c"], body),
+        fold_constants,
+        lambda: 1,
+        lambda: 2,
+        lambda: 3,
+    )
+    assert expected == actual == 1
+    assert n_changes > 0
+
+
+def test_fold_constants_of_deep_and_frozen_trees():
+    prog = Program(lazy_ids=True)
+    ast = prog.root
+    for i in range(5000):
+        ast = ast.if_(ExprLogicalAnd([ExprConstant(True), ExprIdent(f"c{i}")]))
+    ast.expr(ExprIdent("x"))
+    frozen = prog.root.if_(ExprConstant(False))
+    frozen.expr(ExprIdent("y"))
+    frozen.freeze()
+
+    assert fold_constants(prog) == 5000
+    lines = prog.to_python().split("\n")
+    assert lines[1] == "if c0:" and lines[5000] == "\t" * 4999 + "if c4999:"
+    assert lines[-3:] == ["\t" * 5000 + "x", "if False:", "\ty"]
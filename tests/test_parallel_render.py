@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.suite import Config, build
+from codegen.models import program as program_module, utils
+from codegen.models.build_cache import BuildCache
+
+
+@pytest.mark.parametrize("lang", ["python", "typescript"])
+def test_parallel_output_equals_serial(lang, monkeypatch):
+    prog, _ = build(Config(n_classes=4, n_methods=3, lang=lang))
+    render = prog.to_python if lang == "python" else prog.to_typescript
+    serial = render()
+    # render the small program in processes
+    monkeypatch.setattr(utils, "MIN_PARALLEL_ASTS", 1)
+    assert render(parallel=2) == serial
+
+
+def test_parallel_output_with_cache(tmp_path, monkeypatch):
+    prog, _ = build(Config(n_classes=4, n_methods=3))
+    serial = prog.to_python()
+    for ast in prog.root.children[1:3]:
+        ast.freeze()
+    monkeypatch.setattr(utils, "MIN_PARALLEL_ASTS", 1)
+    cache = BuildCache(tmp_path)
+    assert prog.to_python(parallel=2, cache=cache) == serial
+    assert prog.to_python(parallel=2, cache=cache) == serial
+
+
+def test_small_programs_are_rendered_serially(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("small programs must not start processes")
+
+    monkeypatch.setattr(program_module, "map_in_processes", fail)
+    prog, _ = build(Config(n_classes=4, n_methods=3))
+    assert prog.to_python(parallel=4) == prog.to_python()
+    prog, _ = build(Config(n_classes=4, n_methods=3, lang="typescript"))
+    assert prog.to_typescript(parallel=4) == prog.to_typescript()
@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import pytest
+
+from codegen.models import DeferredVar, project as project_module, utils
+from codegen.models.expr import ExprFuncCall
+from codegen.models.project import Project
+
+
+def build() -> Project:
+    project = Project()
+    project.module("pkg")
+    models = project.module("pkg.models")
+    models.root.class_("User", [])
+    project.define("pkg.models", "User")
+
+    api = project.module("pkg.api")
+    user = project.import_helper("pkg.api").use("User")
+    func = api.root.func("get_user", [])
+    func.return_(ExprFuncCall(user, []))
+
+    # a module that is imported, and a module that imports it and a module of another package
+    project.module("pkg.util.text").root.func("f", [DeferredVar.simple("x")])
+    project.define("pkg.util.text", "f")
+    project.import_helper("other.main").use("f")
+    project.import_helper("other.main").use("User")
+    return project
+
+
+def test_render_modules():
+    project = build()
+    codes = project.render("python")
+    assert list(codes) == ["pkg", "pkg.models", "pkg.api", "pkg.util.text", "other.main"]
+    assert "from pkg.models import User" in codes["pkg.api"]
+    assert "class User" in codes["pkg.models"]
+    assert "import" not in codes["pkg.models"]
+    assert codes["other.main"].startswith(
+        "from pkg.models import User\nfrom pkg.util.text import f"
+    )
+    assert project.render("typescript")["pkg.api"].startswith(
+        "import { User } from 'pkg/models';"
+    )
+
+    with pytest.raises(ValueError):
+        project.define("pkg.api", "User")
+    with pytest.raises(KeyError):
+        project.define("pkg.missing", "g")
+
+
+def test_dependencies_and_paths():
+    project = build()
+    assert project.graph() == {
+        "pkg": set(),
+        "pkg.models": set(),
+        "pkg.api": {"pkg.models"},
+        "pkg.util.text": set(),
+        "other.main": {"pkg.models", "pkg.util.text"},
+    }
+    assert project.get_paths("python") == {
+        "pkg": Path("pkg/__init__.py"),
+        "pkg.models": Path("pkg/models.py"),
+        "pkg.api": Path("pkg/api.py"),
+        "pkg.util.text": Path("pkg/util/text.py"),
+        "other.main": Path("other/main.py"),
+    }
+    assert project.get_paths("typescript")["pkg"] == Path("pkg/index.ts")
+
+
+def test_write(tmp_path):
+    project = build()
+    report = project.write(tmp_path, "python")
+    assert len(report.written) == 5 and len(report.skipped) == 0
+    assert (tmp_path / "pkg/api.py").read_text() == project.render("python")["pkg.api"]
+
+    project.module("pkg.api").root.func("other", [])
+    report = project.write(tmp_path, "python")
+    assert report.written == [tmp_path / "pkg/api.py"] and len(report.skipped) == 4
+
+
+def test_small_projects_are_rendered_sequentially(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("small projects must not start processes")
+
+    monkeypatch.setattr(project_module, "map_in_processes", fail)
+    project = build()
+    assert project.render("python", parallel=4) == project.render("python")
+    assert len(project.write(tmp_path, "python", parallel=4).written) == 5
+
+
+def test_parallel_output_equals_sequential(tmp_path, monkeypatch):
+    project = build()
+    sequential = project.render("python")
+    # render the small project in processes
+    monkeypatch.setattr(utils, "MIN_PARALLEL_ASTS", 1)
+    assert project.render("python", parallel=2) == sequential
+
+    report = project.write(tmp_path / "parallel", "python", parallel=2)
+    assert len(report.written) == 5
+    for name, path in project.get_paths("python").items():
+        assert (tmp_path / "parallel" / path).read_text() == sequential[name]
+    report = project.write(tmp_path / "parallel", "python", parallel=2)
+    assert len(report.skipped) == 5
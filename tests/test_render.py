@@ -0,0 +1,246 @@
+import pytest
+
+from codegen.models import AST, DeferredVar, Program
+from codegen.models.expr import ExprConstant, ExprIdent
+from codegen.models.program import VarRegister
+from codegen.models.statement import (
+    AssignStatement,
+    BlockStatement,
+    ForLoopStatement,
+    IfStatement,
+)
+from codegen.models.var import VarScope
+
+
+def render_recursively(ast: AST, lang: str, level: int = 0) -> str:
+    """The recursive renderer that the iterative one replaces"""
+    if isinstance(ast.stmt, BlockStatement):
+        if lang == "python" or not ast.stmt.has_owned_env:
+            content = "\n".join(
+                [render_recursively(child, lang, level) for child in ast.children]
+            )
+            if lang == "typescript" and ast.is_root():
+                return content.lstrip("\n")
+            return content
+        if len(ast.children) == 0:
+            return ""
+        return (
+            "\t" * level
+            + "{"
+            + "\n".join([render_recursively(child, lang, level + 1) for child in ast.children])
+            + "\n"
+            + "\t" * level
+            + "}"
+        )
+
+    code = ast.stmt.to_python() if lang == "python" else ast.stmt.to_typescript()
+    lines = ["\t" * level + line for line in code.split("\n")]
+    if len(ast.children) > 0:
+        if lang == "typescript":
+            lines.append("\t" * level + "{")
+        lines.extend(render_recursively(child, lang, level + 1) for child in ast.children)
+        if lang == "typescript":
+            lines.append("\t" * level + "}")
+    return "\n".join(lines)
+
+
+def build_nested(prog: Program, depth: int, lang: str):
+    prog.root.linebreak()
+    func = prog.root.func("f", [DeferredVar.simple("a")])
+    if lang == "python":
+        func.comment("Nested blocks.\n\nSecond line.")
+    ast = func
+    for i in range(depth):
+        ast.block()
+        inner = ast.block()
+        inner.block().expr(ExprIdent(f"a{i}"))
+        inner._add_stmt(BlockStatement(has_owned_env=False)).expr(ExprIdent(f"b{i}"))
+        ast.if_(ExprIdent(f"c{i}")).expr(ExprConstant(i))
+        ast.else_().block()
+        ast = ast.if_(ExprIdent(f"d{i}"))
+    ast.return_(ExprIdent("a"))
+    prog.root.block()
+
+
+@pytest.mark.parametrize("incremental_render", [False, True])
+@pytest.mark.parametrize("lang", ["python", "typescript"])
+def test_iterative_rendering_equals_recursive(lang, incremental_render):
+    prog = Program(incremental_render=incremental_render)
+    build_nested(prog, 30, lang)
+    prog.update_ast_ids()
+    expected = render_recursively(prog.root, lang)
+    render = prog.root.to_python if lang == "python" else prog.root.to_typescript
+    assert render() == expected
+    assert "".join(
+        line + "\n" for line in getattr(prog.root, f"iter_{lang}_lines")()
+    ) == expected + "\n"
+    # rendered again from the render caches
+    assert render() == expected
+
+
+@pytest.mark.parametrize("lang", ["python", "typescript"])
+def test_render_deep_tree(lang):
+    depth = 10_000
+    prog = Program(lazy_ids=True)
+    ast = prog.root
+    for i in range(depth):
+        ast = ast.block() if i % 2 else ast.if_(ExprIdent(f"c{i}"))
+    ast.expr(ExprIdent("x"))
+    lines = (prog.to_python() if lang == "python" else prog.to_typescript()).split("\n")
+    if lang == "python":
+        assert sum(line.lstrip().startswith("if ") for line in lines) == depth // 2
+        assert lines[-1] == "\t" * (depth // 2) + "x"
+    else:
+        # the opening brace of a block is followed by its first child without a line break
+        assert lines[-1] == "}" and len(lines) == depth * 2 + 1
+        assert "\t" * (depth - 1) + "{" + "\t" * depth + "x" in lines
+
+
+def find_recursively(prog: Program, dropped: set[int], key, ast):
+    """The linear search of registers that `VarRegisters.find` replaces: the deepest register in scope, the first
+    registered one among the deepest"""
+    matched = None
+    for reg in prog.vars.registers:
+        if reg.key != key or reg.id in dropped or not prog.is_within_scope(ast, reg.scope):
+            continue
+        if matched is None or reg.scope.get_depth() > matched.scope.get_depth():
+            matched = reg
+    return matched
+
+
+def build_scopes() -> tuple[Program, AST]:
+    prog = Program()
+    func = prog.root.func("f", [DeferredVar("x", ("x",))])
+    func.assign(DeferredVar("y", ("y",)), ExprConstant(0))
+    loop = func.for_loop(DeferredVar("item", ("item",)), ExprIdent("items"))
+    loop.assign(DeferredVar("t", ("t",)), ExprIdent("item"))
+    inner = loop.if_(ExprIdent("c"))
+    inner.expr(ExprIdent("x"))
+    inner.expr(ExprIdent("x"))
+    inner.expr(ExprIdent("x"))
+    func.expr(ExprIdent("y"))
+    func.assign(DeferredVar("z", ("z",)), ExprConstant(2))
+    func.expr(ExprIdent("z"))
+    # variables that shadow the ones of the outer scopes
+    for scope in [VarScope(loop.id, 1), VarScope(inner.id, 2)]:
+        prog.vars.add_register(
+            VarRegister(len(prog.vars.registers), "x", ("x",), scope)
+        )
+    # registers of the same key and depth whose scopes overlap: the first one wins
+    for start in (3, 1):
+        prog.vars.add_register(
+            VarRegister(len(prog.vars.registers), "w", ("w",), VarScope(func.id, start))
+        )
+    prog.vars.add_register(
+        VarRegister(len(prog.vars.registers), "w", ("w",), VarScope(func.id, 0, 2))
+    )
+    return prog, func
+
+
+def check_find(prog: Program, dropped: set[int]):
+    keys = [("x",), ("y",), ("item",), ("t",), ("z",), ("w",), ("missing",)]
+    n_found = 0
+    for ast in _iter_asts(prog.root):
+        for at in (ast.id, ast.next_child_id()):
+            for key in keys:
+                expected = find_recursively(prog, dropped, key, at)
+                assert prog.vars.find(key, at) is expected, (key, at)
+                n_found += expected is not None
+    assert n_found > 0
+
+
+def _iter_asts(root: AST):
+    stack = [root]
+    while len(stack) > 0:
+        ast = stack.pop()
+        yield ast
+        stack.extend(ast.children)
+
+
+def test_find_registers():
+    prog, func = build_scopes()
+    check_find(prog, set())
+    w = [reg for reg in prog.vars.registers if reg.key == ("w",)]
+    assert prog.vars.find(("w",), func.id + (4,)) is w[0]
+    assert prog.vars.find(("w",), func.id + (2,)) is w[1]
+    assert prog.vars.find(("w",), func.id + (1,)) is w[1]
+    assert prog.vars.find(("w",), func.id + (0,)) is w[2]
+    # the variable of the if body shadows the one of the loop body, which shadows the argument
+    loop = func.children[1]
+    inner = loop.children[1]
+    assert prog.vars.find(("x",), inner.id + (2,)).scope.ast == inner.id
+    assert prog.vars.find(("x",), inner.id + (1,)).scope.ast == loop.id
+    assert prog.vars.find(("x",), loop.id + (0,)).scope.ast == func.id
+
+    # the scopes are updated: some registers are dropped, and the others are moved
+    scopes = []
+    dropped = set()
+    for reg in prog.vars.registers:
+        if reg.key == ("w",) and reg.scope.child_index_start == 3 or reg.key == ("z",):
+            scopes.append(None)
+            dropped.add(reg.id)
+        else:
+            scopes.append(reg.scope._replace(child_index_start=max(0, reg.scope.child_index_start - 1)))
+    prog.vars.update_scopes(scopes)
+    check_find(prog, dropped)
+    assert prog.vars.find(("w",), func.id + (4,)) is w[1]
+    assert prog.vars.find(("z",), func.id + (5,)) is None
+
+
+def test_statements_between_asts():
+    prog = Program()
+    func = prog.root.func("f", [])
+    loop = func.for_loop(DeferredVar("x", ("x",)), ExprIdent("items"))
+    cond = loop.if_(ExprIdent("c"))
+    cond.assign(DeferredVar("y", ("y",)), ExprConstant(0))
+    assign = cond.children[0]
+
+    assert func.has_statement_between_ast(ForLoopStatement, assign.id)
+    assert func.has_statement_between_ast(IfStatement, assign.id)
+    # both endpoints are excluded
+    assert not loop.has_statement_between_ast(ForLoopStatement, assign.id)
+    assert loop.has_statement_between_ast(IfStatement, assign.id)
+    assert not func.has_statement_between_ast(AssignStatement, assign.id)
+    assert not cond.has_statement_between_ast(IfStatement, assign.id)
+    assert not loop.has_statement_between_ast(ForLoopStatement, loop.id)
+    # ids outside the subtree
+    assert not loop.has_statement_between_ast(ForLoopStatement, func.id)
+    assert not cond.has_statement_between_ast(IfStatement, func.id + (5, 0))
+    assert not func.has_statement_between_ast(IfStatement, func.id + (0, 0, 3))
+    assert [ast.stmt for ast in func.find_ast_to(assign.id)] == [
+        func.stmt,
+        loop.stmt,
+        cond.stmt,
+        assign.stmt,
+    ]
+    assert list(func.find_ast_to(func.id + (1,))) == []
+
+    assert prog.root.find_ast(assign.id) is assign
+    assert func.find_ast(func.id) is func
+    assert func.find_ast(()) is None
+    assert func.find_ast(func.id + (1,)) is None
+    assert func.find_ast(func.id + (0, 0, 0, 0)) is None
+    assert prog.root.find_ast((-1,)) is None
+
+
+def build_indented(indent: str) -> Program:
+    prog = Program(indent=indent)
+    func = prog.root.func(
+        "f", [DeferredVar.simple("a")], comment="Compute a value.\n\n\tIndented line."
+    )
+    loop = func.for_loop(DeferredVar("x", ("x",), force_name="x"), ExprIdent("a"))
+    loop.python_stmt("if x > 1:\n\tif x > 2:\n\t\treturn x\n\treturn -x")
+    func.return_(ExprConstant(0))
+    return prog
+
+
+@pytest.mark.parametrize("indent", ["    ", "  "])
+def test_indent_with_spaces(indent):
+    code = build_indented(indent).to_python()
+    assert code == build_indented("\t").to_python().replace("\t", indent)
+    assert "\t" not in code
+    assert f'{indent}"""Compute a value.\n{indent}\n{indent * 2}Indented line.\n{indent}"""' in code
+    namespace = {}
+    exec(compile(code, "<generated>", "exec"), namespace)
+    assert namespace["f"]([3]) == 3 and namespace["f"]([2]) == -2
+    assert namespace["f"].__doc__.strip().startswith("Compute a value.")
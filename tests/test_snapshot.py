@@ -0,0 +1,89 @@
+import marshal
+import struct
+
+import pytest
+
+from benchmarks.suite import Config, build
+from codegen.models import DeferredVar, Program
+from codegen.models.expr import ExprConstant, ExprIdent
+from codegen.models.snapshot import MAGIC, ProgramSnapshot, dump, load
+
+CONFIG = Config(n_classes=3, n_methods=2, depth=2, n_vars=2)
+
+
+def innermost(ast):
+    while len(ast.children) > 0:
+        ast = ast.children[-1]
+    return ast.parent
+
+
+def test_round_trip(tmp_path):
+    prog, _ = build(CONFIG)
+    path = tmp_path / "program.snapshot"
+    dump(prog, path)
+    loaded = load(path)
+    assert loaded.to_python() == prog.to_python()
+
+    # the loaded program can be extended as the original one
+    names = []
+    for p in (prog, loaded):
+        ast = innermost(p.root.children[-1])
+        names.append(p.get_var(key=("v1", 1), at=ast.next_child_id()).get_name())
+        ast.assign(DeferredVar.simple("total"), ExprIdent("v1"))
+        ast.assign(p.get_var(key=("v0", 1), at=ast.next_child_id()), ExprConstant(0))
+        p.import_("json.dumps", True)
+    assert names[0] == names[1]
+    assert loaded.to_python() == prog.to_python()
+
+
+def test_load_ast(tmp_path):
+    prog, _ = build(CONFIG)
+    prog.root.freeze()
+    path = tmp_path / "program.snapshot"
+    dump(prog, path)
+    with ProgramSnapshot(path) as snapshot:
+        assert len(snapshot) == len(prog.root.children)
+        ast = snapshot.load_ast(2)
+        assert ast.id == (2,)
+        assert ast.to_python() == prog.root.children[2].to_python()
+        assert ast.structurally_equal(prog.root.children[2])
+        # the ASTs are not added to the program
+        assert len(snapshot.program.root.children) == 0
+
+
+def test_invalid_snapshots(tmp_path):
+    prog, _ = build(CONFIG)
+    path = tmp_path / "program.snapshot"
+    dump(prog, path)
+    data = path.read_bytes()
+
+    (header_size,) = struct.unpack_from("<Q", data, len(MAGIC))
+    start = len(MAGIC) + 8
+    version, *rest = marshal.loads(data[start : start + header_size])
+    header = marshal.dumps((version + 1, *rest))
+    path.write_bytes(
+        MAGIC + struct.pack("<Q", len(header)) + header + data[start + header_size :]
+    )
+    with pytest.raises(ValueError, match="Unsupported snapshot version"):
+        load(path)
+
+    path.write_bytes(b"PICKLE" + data[len(MAGIC) :])
+    with pytest.raises(ValueError, match="not a program snapshot"):
+        load(path)
+
+    path.write_bytes(b"")
+    with pytest.raises(ValueError, match="not a program snapshot"):
+        Program.load(path)
+
+
+def test_objects_shared_by_top_level_asts(tmp_path):
+    prog = Program()
+    expr = ExprIdent("shared")
+    for i in range(2):
+        prog.root.func(f"f{i}", []).return_(expr)
+    path = tmp_path / "program.snapshot"
+    dump(prog, path)
+    loaded = load(path)
+    assert loaded.to_python() == prog.to_python()
+    first, second = [ast.children[0].stmt.expr for ast in loaded.root.children[1:]]
+    assert first is second
@@ -0,0 +1,149 @@
+from codegen.models import DeferredVar, Program
+from codegen.models.expr import ExprConstant, ExprFuncCall, ExprIdent
+from codegen.models.statement import Comment, DefClassStatement, SingleExprStatement
+from codegen.models.visitor import REMOVE, SKIP, ASTTransformer, ASTVisitor, visit
+
+
+class CountCalls(ASTVisitor):
+    def __init__(self):
+        self.n = 0
+
+    def visit_ExprFuncCall(self, expr):
+        self.n += 1
+
+
+class CollectIdents(ASTVisitor):
+    def __init__(self):
+        self.idents = []
+
+    def visit_ExprIdent(self, expr):
+        self.idents.append(expr.ident)
+
+
+class SkipClasses(CountCalls):
+    def visit_AST(self, ast):
+        if isinstance(ast.stmt, DefClassStatement):
+            return SKIP
+
+
+class MaxDepth(ASTVisitor):
+    visit_statements_only = True
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+
+    def visit_AST(self, ast):
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def leave_AST(self, ast):
+        self.depth -= 1
+
+
+class RenameIdent(ASTTransformer):
+    def transform_ExprIdent(self, expr):
+        return ExprIdent("y") if expr.ident == "x" else expr
+
+
+class RemoveComments(ASTTransformer):
+    def transform_Comment(self, stmt):
+        return REMOVE
+
+
+class RemoveNoneArgs(ASTTransformer):
+    def transform_ExprConstant(self, expr):
+        return REMOVE if expr.constant is None else expr
+
+
+def build() -> Program:
+    prog = Program()
+    cls = prog.root.class_("A")
+    cls.expr(ExprFuncCall(ExprIdent("f"), [ExprIdent("x")]))
+    func = prog.root.func("g", [DeferredVar.simple("x")])
+    func.comment("call f")
+    func.expr(ExprFuncCall(ExprIdent("f"), [ExprIdent("x"), ExprConstant(None)]))
+    func.return_(ExprFuncCall(ExprIdent("h"), [ExprIdent("z")]))
+    return prog
+
+
+def test_fused_visitors_equal_separate_walks():
+    prog = build()
+    fused = [CountCalls(), CollectIdents(), SkipClasses(), MaxDepth()]
+    visit(prog.root, *fused)
+    separate = [CountCalls(), CollectIdents(), SkipClasses(), MaxDepth()]
+    for visitor in separate:
+        visitor.visit(prog.root)
+    assert fused[0].n == separate[0].n == 3
+    assert fused[1].idents == separate[1].idents == ["f", "x", "f", "x", "h", "z"]
+    assert fused[2].n == separate[2].n == 2
+    assert fused[3].max_depth == separate[3].max_depth == 3
+    assert fused[3].depth == 0
+
+
+def test_skip():
+    prog = build()
+    counter = SkipClasses()
+    idents = CollectIdents()
+    visit(prog.root, counter, idents)
+    # the class body is skipped by the first visitor only
+    assert counter.n == 2
+    assert idents.idents[:2] == ["f", "x"]
+
+
+def test_transform_replaces_nodes_without_modifying_shared_ones():
+    prog = build()
+    shared = prog.root.children[-1].children[1].stmt.expr
+    RenameIdent().transform(prog.root)
+    code = prog.to_python()
+    assert "f(y)" in code and "f(y, None)" in code and "h(z)" in code
+    # the statements and expressions are copied, not modified in place
+    assert shared.args[0].ident == "x"
+    assert RenameIdent().transform(ExprIdent("x")) == ExprIdent("y")
+
+
+def test_transform_removes_statements_and_items():
+    prog = build()
+    func = prog.root.children[-1]
+    n_children = len(func.children)
+    RemoveComments().transform(prog.root)
+    assert len(func.children) == n_children - 1
+    assert not any(isinstance(child.stmt, Comment) for child in func.children)
+    # the ids of the remaining ASTs are updated
+    assert [child.id for child in func.children] == [
+        func.id + (i,) for i in range(n_children - 1)
+    ]
+
+    RemoveNoneArgs().transform(prog.root)
+    stmt = func.children[0].stmt
+    assert isinstance(stmt, SingleExprStatement)
+    assert stmt.expr == ExprFuncCall(ExprIdent("f"), [ExprIdent("x")])
+
+
+def test_deep_tree():
+    depth = 20_000
+    prog = Program(lazy_ids=True)
+    ast = prog.root
+    for i in range(depth):
+        ast = ast.if_(ExprIdent("x"))
+    ast.expr(ExprIdent("x"))
+    depths = MaxDepth()
+    idents = CollectIdents()
+    visit(prog.root, depths, idents)
+    assert depths.max_depth == depth + 2 and len(idents.idents) == depth + 1
+
+    RenameIdent().transform(prog.root)
+    idents = CollectIdents()
+    idents.visit(prog.root)
+    assert set(idents.idents) == {"y"}
+
+    expr = ExprIdent("x")
+    for _ in range(depth):
+        expr = ExprFuncCall(ExprIdent("f"), [expr])
+    counter = CountCalls()
+    counter.visit(expr)
+    assert counter.n == depth
+    renamed = RenameIdent().transform(expr)
+    while isinstance(renamed, ExprFuncCall):
+        renamed = renamed.args[0]
+    assert renamed == ExprIdent("y")
@@ -0,0 +1,67 @@
+import os
+import stat
+
+import pytest
+
+from codegen.models import Program
+from codegen.models import writer as writer_module
+from codegen.models.expr import ExprIdent
+from codegen.models.writer import OutputWriter, WriteReport, write_file
+
+
+def set_old_mtime(path):
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+
+def test_skip_unchanged_file(tmp_path):
+    path = tmp_path / "pkg" / "mod.py"
+    assert write_file(path, "x = 1\n")
+    set_old_mtime(path)
+    assert not write_file(path, "x = 1\n")
+    assert path.stat().st_mtime_ns == 1_000_000_000
+    assert path.read_text() == "x = 1\n"
+
+
+def test_rewrite_file_of_same_size(tmp_path):
+    path = tmp_path / "mod.py"
+    write_file(path, "x = 1\n")
+    set_old_mtime(path)
+    assert write_file(path, "x = 2\n")
+    assert path.read_text() == "x = 2\n"
+    assert path.stat().st_mtime_ns != 1_000_000_000
+
+
+def test_keep_file_mode(tmp_path):
+    path = tmp_path / "run.py"
+    write_file(path, "print(1)\n")
+    os.chmod(path, 0o750)
+    assert write_file(path, "print(2)\n")
+    assert stat.S_IMODE(path.stat().st_mode) == 0o750
+
+
+def test_no_temporary_files_after_failure(tmp_path, monkeypatch):
+    path = tmp_path / "mod.py"
+    write_file(path, "x = 1\n")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer_module.os, "replace", fail)
+    with pytest.raises(OSError):
+        write_file(path, "x = 22\n")
+    assert path.read_text() == "x = 1\n"
+    assert os.listdir(tmp_path) == ["mod.py"]
+
+
+def test_report(tmp_path):
+    writer = OutputWriter()
+    prog = Program()
+    prog.root.expr(ExprIdent("x"))
+    assert prog.write_to_file(tmp_path / "a.py", writer=writer)
+    assert writer.write(tmp_path / "b.py", "y\n")
+    assert not prog.write_to_file(tmp_path / "a.py", writer=writer)
+    assert not writer.write(str(tmp_path / "b.py"), "y\n")
+    assert writer.report.written == [tmp_path / "a.py", tmp_path / "b.py"]
+    assert writer.report.skipped == [tmp_path / "a.py", tmp_path / "b.py"]
+    assert str(writer.report) == "written 2 files, skipped 2 unchanged files"
+    assert str(WriteReport()) == "written 0 files, skipped 0 unchanged files"